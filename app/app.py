@@ -1,21 +1,64 @@
 # app.py
 
 import os
-import streamlit as st
+from functools import partial
+
+import numpy as np
 import pandas as pd
-from pathlib import Path
+import streamlit as st
 
-from src.data_io import read_uploaded_file, read_default_path
+from src.data_io import EMBEDDING_PREFIX, IngestError, path_version, upload_version
+from src.diagnostics import (
+    begin_run, configure_logging, count, enabled as diagnostics_enabled, end_run, render_panel, span,
+    traced_run)
+from src.compiled import load_compiled_legend
+from src.catalog import discover, get_catalog
+from src.dataset import load_default_dataset, load_upload_dataset, memory_report
+from src.episodes import episode_index
+from src.filters import FilterSpec, filter_index, filtered_dataset
+from src.placement import DEFAULT_K as PLACEMENT_DEFAULT_K, placed_dataset
+from src.silhouette import fill_silhouette, get_refiner, needs_silhouette, use_approximate
 from src.silhouette_grid import render_silhouette_grid
-from src.umap_plot import make_umap_plot
+from src.spatial import cell_index, episodes
+from src.umap_plot import (
+    make_disruption_animation, make_overview_plot, make_umap_plot, figure_payload_bytes,
+    with_episode_overlay, with_placed_overlay, DEFAULT_POINT_BUDGET, OVERVIEW_POINT_BUDGET)
+from src.figure_cache import get_figure_cache
 from src.label_meta import (
-    DISRUPTION_META, DISRUPTION_ORDER, DISRUPTION_LEGEND_META, SUBSET_META, SUBSET_ORDER, SUBSET_LEGEND_ORDER, SUBSET_LEGEND_META, full, SHOW_COLORS)
+    DISRUPTION_META, DISRUPTION_ORDER, DISRUPTION_LEGEND_META, SUBSET_META, SUBSET_ORDER, SUBSET_LEGEND_ORDER, SUBSET_LEGEND_META, abbr, full, SHOW_COLORS)
 import streamlit.components.v1 as components
-from src.legend import render_legend_iframe_html
+from src.legend import cached_legend_html, read_asset
+
+
+def _box_range(box: dict):
+    # plotly box selection -> ((x0, x1), (y0, y1))
+    xs, ys = box.get("x", []), box.get("y", [])
+    if len(xs) < 2 or len(ys) < 2:
+        return None
+    return (min(xs), max(xs)), (min(ys), max(ys))
+
+
+def _episode_query(selection: dict):
+    # latest plot selection -> ("box", xr, yr) | ("lasso", xs, ys) | ("point", x, y) | None
+    lassos, boxes, points = (selection.get(k) or [] for k in ("lasso", "box", "points"))
+    if lassos:
+        return ("lasso", tuple(lassos[-1].get("x", [])), tuple(lassos[-1].get("y", [])))
+    if boxes:
+        rng = _box_range(boxes[-1])
+        return ("box", *rng) if rng is not None else None
+    if len(points) == 1 and "x" in points[0] and "y" in points[0]:
+        return ("point", float(points[0]["x"]), float(points[0]["y"]))
+    return None
+
+
+# per-stage timings: JSON log line per rerun, panel with ?diag=1
+configure_logging()
+begin_run("script")
 
 
 def load_css(path: str):
-    st.markdown(f"<style>{Path(path).read_text()}</style>",
+    # read once per file version, not per rerun (edits still show up on the next run)
+    st.markdown(f"<style>{read_asset(path)}</style>",
                 unsafe_allow_html=True)
 
 
@@ -34,35 +77,177 @@ st.markdown("### Semantic Separation Visualization")
 # Data loading
 # -----------------------------
 DEFAULT_PATH = "data/umap_df_for_js_plot_120825.csv"
+# every CSV/TSV/TXT directly under DATA_DIR is offered in the dataset picker (newest first);
+# DEFAULT_PATH is preselected when present
+DATA_DIR = os.environ.get("DATA_DIR", os.path.dirname(DEFAULT_PATH))
+# loaded datasets share an LRU under this budget; ones a session is viewing are never evicted
+DATASET_CACHE_MB = int(os.environ.get("DATASET_CACHE_MB", 2048))
+# > 0: check the open data file every this many seconds and pick up appended rows
+# (only the appended bytes are parsed; see src/refresh.py)
+DATA_POLL_SECONDS = float(os.environ.get("DATA_POLL_SECONDS", 0))
+# uploads are parsed in chunks; rows kept in memory may not exceed this
+UPLOAD_MAX_MB = int(os.environ.get("UPLOAD_MAX_MB", 1024))
+
+# out-of-sample placement: neighbours (in embedding space) each new episode is interpolated from
+PLACEMENT_K = int(os.environ.get("PLACEMENT_K", PLACEMENT_DEFAULT_K))
+PLACEMENT_METRIC = os.environ.get("PLACEMENT_METRIC", "euclidean")  # euclidean | cosine
+
+# SIL_SCORE is optional: when absent (or empty) it's computed in-app per cell
+required_cols = {"UMAP1", "UMAP2", "SHOW_LABEL", "SUBSET", "DISRUPTION"}
+# worker processes for the in-app silhouette (unset => one per CPU)
+SILHOUETTE_WORKERS = int(os.environ["SILHOUETTE_WORKERS"]) if os.environ.get("SILHOUETTE_WORKERS") else None
+# exact | approx | auto (sampled estimates, refined in the background, for very large cells)
+SILHOUETTE_MODE = os.environ.get("SILHOUETTE_MODE", "auto")
+
+catalog = get_catalog(DATASET_CACHE_MB * 1024 * 1024)
+
+
+def _prepare_dataset(p):
+    # exact silhouettes are filled once per load, so the catalog holds (and budgets) the
+    # final dataset; very large cells get sampled estimates below instead
+    if needs_silhouette(p) and not use_approximate(p, SILHOUETTE_MODE):
+        with span("silhouette_fill"):
+            return fill_silhouette(p, SILHOUETTE_WORKERS)
+    return p
 
-df = None
-if os.path.exists(DEFAULT_PATH):
-    df = read_default_path(DEFAULT_PATH)
-else:
-    uploaded_file = st.file_uploader(
-        "Upload a CSV/TSV/TXT", type=["csv", "tsv", "txt"])
-    if uploaded_file is not None:
-        df = read_uploaded_file(uploaded_file)
-
-if df is None:
-    st.info(
-        f"Put your data file at `{DEFAULT_PATH}` (recommended), or upload a file above.")
-    st.stop()
 
 # -----------------------------
-# Validate / filter expected columns
+# Dataset picker: files under DATA_DIR + this process's resident uploads
 # -----------------------------
-required_cols = {"UMAP1", "UMAP2", "SHOW_LABEL",
-                 "SIL_SCORE", "SUBSET", "DISRUPTION"}
-missing = required_cols - set(df.columns)
-if missing:
-    st.error(f"Missing required columns: {sorted(missing)}")
+files = discover(DATA_DIR)
+pick_col, filter_col, upload_col = st.columns([4, 1, 1], vertical_alignment="bottom")
+with upload_col.popover("Upload", width="stretch"):
+    uploaded_file = st.file_uploader("Upload a CSV/TSV/TXT", type=["csv", "tsv", "txt"])
+    placement_file = st.file_uploader(
+        f"Place new episodes into the current layout (needs {EMBEDDING_PREFIX}* embedding columns)",
+        type=["csv", "tsv", "txt"], key="placement_upload")
+if uploaded_file is not None and upload_version(uploaded_file) != st.session_state.get("upload_applied"):
+    # a new upload becomes the current dataset
+    st.session_state.upload_applied = upload_version(uploaded_file)
+    st.session_state.dataset = st.session_state.upload_applied
+
+# files are picked by path, so the selection survives the file growing
+entries = {e.ref: e for e in files}
+entries.update({e.ref: e for e in catalog.resident() if e.kind == "upload"})
+if uploaded_file is not None and upload_version(uploaded_file) not in entries:
+    entries[upload_version(uploaded_file)] = None  # loaded below
+if st.session_state.get("dataset") not in entries:
+    st.session_state.dataset = DEFAULT_PATH if DEFAULT_PATH in entries else next(iter(entries), None)
+
+
+def _dataset_label(key: str) -> str:
+    e = entries.get(key)
+    if e is None:
+        return f"{uploaded_file.name} (upload)"
+    if e.kind == "upload":
+        return f"{e.name} (upload)"
+    return f"{e.name} · {pd.Timestamp(e.mtime_ns, unit='ns'):%Y-%m-%d}"
+
+
+dataset_key = pick_col.selectbox("Dataset", list(entries), key="dataset", format_func=_dataset_label,
+                                 label_visibility="collapsed") if entries else None
+entry = entries.get(dataset_key)
+
+# One read-only copy per process, filtered + sorted by (SUBSET, DISRUPTION); cells are
+# O(1) slices. Sessions hold references only.
+parts = None
+try:
+    with span("load_dataset"):
+        if entry is not None and entry.kind == "file":
+            parts = load_default_dataset(entry.path, tuple(sorted(required_cols)),
+                                         tuple(SUBSET_ORDER), tuple(DISRUPTION_ORDER),
+                                         catalog=catalog, prepare=_prepare_dataset)
+        elif uploaded_file is not None and dataset_key == upload_version(uploaded_file):
+            parts = load_upload_dataset(dataset_key, uploaded_file,
+                                        tuple(sorted(required_cols)), tuple(SUBSET_ORDER),
+                                        tuple(DISRUPTION_ORDER), UPLOAD_MAX_MB * 1024 * 1024,
+                                        catalog=catalog, prepare=_prepare_dataset)
+        elif entry is not None:
+            # another session's upload: served while resident, can't be reloaded from here
+            parts = catalog.lookup(entry.key)
+except (IngestError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+    st.error(str(e))
     st.stop()
 
-df_filtered = df[df["DISRUPTION"].isin(
-    DISRUPTION_ORDER) & df["SUBSET"].isin(SUBSET_ORDER)].copy()
-df_filtered["SIL_SCORE"] = pd.to_numeric(
-    df_filtered["SIL_SCORE"], errors="coerce")
+if parts is None:
+    if entry is not None:
+        st.warning(f"{entry.name} was evicted from memory; upload it again to reopen it.")
+    else:
+        st.info(f"Put your data files under `{DATA_DIR}/` (recommended), or upload a file above.")
+    st.stop()
+
+# New episodes with embeddings, placed into this dataset's layout by kNN interpolation;
+# the placed rows join their cells (plot, grid, silhouettes) for this session
+placement = None
+if placement_file is not None:
+    try:
+        with st.spinner("Placing new episodes…"), span("placement"):
+            placement = placed_dataset(parts.version, upload_version(placement_file), parts, placement_file,
+                                       PLACEMENT_K, PLACEMENT_METRIC)
+        parts = placement.parts
+    except (IngestError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        st.warning(f"Could not place {placement_file.name}: {e}")
+
+
+# -----------------------------
+# Filters: season / episode ranges and shows, for the plot and the grid alike. Backed by
+# per-cell sorted indexes and show bitmaps (src/filters.py); each filter is one shared,
+# cached dataset, with silhouettes redone only for cells whose population changed.
+# -----------------------------
+f_index = filter_index(parts.version, parts)
+
+
+def _range_filter(label: str, col: str, key: str):
+    # None while the slider spans the whole range
+    if col not in f_index.bounds:
+        return None
+    lo, hi = (int(np.floor(f_index.bounds[col][0])), int(np.ceil(f_index.bounds[col][1])))
+    if lo >= hi:
+        return None
+    value = st.session_state.get(key)
+    if value is not None and not (lo <= value[0] <= value[1] <= hi):
+        del st.session_state[key]  # from another dataset
+    value = st.slider(label, lo, hi, (lo, hi), key=key)
+    return None if tuple(value) == (lo, hi) else tuple(value)
+
+
+with filter_col.popover("Filters", width="stretch"):
+    season_range = _range_filter("Seasons", "SEASON", "filter_seasons")
+    episode_range = _range_filter("Episodes", "EPISODE", "filter_episodes")
+    if f_index.shows:
+        st.session_state.filter_shows = [s for s in st.session_state.get("filter_shows", [])
+                                         if s in f_index.shows]
+        shows = st.multiselect("Shows", f_index.shows, key="filter_shows", placeholder="All shows")
+    else:
+        shows = []
+filter_spec = FilterSpec(season_range, episode_range, tuple(shows) if shows else None)
+if filter_spec.active:
+    n_unfiltered = len(parts)
+    with st.spinner("Filtering…"), span("filter"):
+        parts = filtered_dataset(parts.version, filter_spec, parts, SILHOUETTE_WORKERS, SILHOUETTE_MODE)
+    st.caption(f"Filtered to {filter_spec.describe()}: {len(parts):,} of {n_unfiltered:,} episodes.")
+
+sil_refiner = None
+if needs_silhouette(parts):
+    with span("silhouette_fill"):
+        sil_refiner = get_refiner(parts.version, parts)
+
+data_version = parts.version
+
+
+@st.fragment(run_every=DATA_POLL_SECONDS if DATA_POLL_SECONDS > 0 and entry is not None
+             and entry.kind == "file" else None)
+def watch_data_file():
+    # full rerun once the file changes; the loader merges appended rows incrementally
+    try:
+        changed = path_version(entry.path) != entry.key
+    except OSError:
+        return
+    if changed:
+        st.rerun()
+
+
+watch_data_file()
 
 # -----------------------------
 # State
@@ -76,82 +261,366 @@ if "selected_cell" not in st.session_state or st.session_state.selected_cell is
 # -----------------------------
 PLOT_HEIGHT = 500
 RIGHT_PANE_MAX_HEIGHT = PLOT_HEIGHT
+# episodes listed for a box/lasso selection; neighbours listed for a clicked point
+EPISODE_LIST_MAX = 500
+KNN_DEFAULT_K = 10
+# episodes offered by the "Track episode" search
+TRACK_MATCH_MAX = 25
+# max points drawn per cell before the WebGL plot switches to a stratified subsample
+POINT_BUDGET = int(os.environ.get("UMAP_POINT_BUDGET", DEFAULT_POINT_BUDGET))
+# point renderer for the Auto/Points views: webgl, or svg (plotly express; for comparisons)
+UMAP_RENDERER = os.environ.get("UMAP_RENDERER", "webgl")
+# process-wide LRU of built figures, bounded by serialized size
+FIGURE_CACHE_MB = int(os.environ.get("FIGURE_CACHE_MB", 256))
+
+fig_cache = get_figure_cache(FIGURE_CACHE_MB * 1024 * 1024)
+
+
+def build_cell_figure(parts, cell_version, subset_key, disruption_key, render_mode,
+                      x_range=None, y_range=None):
+    fig = make_umap_plot(parts.cell(subset_key, disruption_key), render_mode=render_mode,
+                         point_mode=UMAP_RENDERER, point_budget=POINT_BUDGET, x_range=x_range, y_range=y_range,
+                         cache_key=(cell_version, subset_key, disruption_key))
+    fig.update_layout(height=PLOT_HEIGHT, margin=dict(l=5, r=5, t=30, b=5))
+    return fig
+
+
+def build_overview_figure(parts, data_version):
+    # every non-empty cell as a subplot; cached per dataset version like the cell figures
+    return make_overview_plot(
+        {c: parts.cell(*c) for c in parts.cells}, SUBSET_ORDER, DISRUPTION_ORDER,
+        point_budget=OVERVIEW_POINT_BUDGET,
+        subset_labels={k: abbr(SUBSET_META, k) for k in SUBSET_ORDER},
+        disruption_labels={k: abbr(DISRUPTION_META, k) for k in DISRUPTION_ORDER})
+
+
+def build_disruption_animation(parts, data_version, subset_key, tracked):
+    # every episode present under all disruptions of the subset: one (n, k) gather per axis
+    ep_index = episode_index(data_version, parts)
+    episode_ids, rows = ep_index.complete([(subset_key, d) for d in DISRUPTION_ORDER])
+    labels = parts.frame["SHOW_LABEL"].iloc[rows[:, 0]].astype(str).to_numpy()
+    pos = int(np.searchsorted(episode_ids, tracked)) if tracked is not None else -1
+    fig = make_disruption_animation(
+        parts.frame["UMAP1"].to_numpy()[rows], parts.frame["UMAP2"].to_numpy()[rows], labels,
+        [abbr(DISRUPTION_META, d) for d in DISRUPTION_ORDER],
+        tracked=pos if 0 <= pos < len(episode_ids) and episode_ids[pos] == tracked else None,
+        tracked_name=ep_index.label(tracked) if tracked is not None else "")
+    fig.update_layout(height=PLOT_HEIGHT, margin=dict(l=5, r=5, t=70, b=5), showlegend=False)
+    return fig
+
+
+def track_overlay(fig, subset_key, disruption_key, tracked, trajectory: bool):
+    # the tracked episode under each disruption of this subset, drawn over the current cell
+    ep_index = episode_index(data_version, parts)
+    rows = ep_index.rows(tracked, [(subset_key, d) for d in DISRUPTION_ORDER])
+    present = np.flatnonzero(rows >= 0)
+    current = np.flatnonzero(present == DISRUPTION_ORDER.index(disruption_key))
+    if not len(current):
+        return fig, False
+    return with_episode_overlay(
+        fig, parts.frame["UMAP1"].to_numpy()[rows[present]], parts.frame["UMAP2"].to_numpy()[rows[present]],
+        [abbr(DISRUPTION_META, DISRUPTION_ORDER[i]) for i in present],
+        name=ep_index.label(tracked), current=int(current[0]), trajectory=trajectory), True
+
+
 LEGEND_MAX_HEIGHT = 170
 
-left, right = st.columns([1.5, 1.0], gap="small")
 
+def _select_cell(cell: tuple[str, str]):
+    # grid click callback; runs before the fragment rerun, so the plot sees it immediately
+    st.session_state.selected_cell = cell
 
-# -----------------------------
-# LEFT: Plot (MUST stay entirely inside this block)
-# -----------------------------
-with left:
-    subset_key, disruption_key = st.session_state.selected_cell
-    df_sel = df_filtered[
-        (df_filtered["SUBSET"] == subset_key) &
-        (df_filtered["DISRUPTION"] == disruption_key)
-    ]
 
-    st.markdown(
-        f"**Selection:** {full(SUBSET_META, subset_key)} / {full(DISRUPTION_META, disruption_key)}")
+def _select_from_overview(cells: list[list[str]]):
+    # overview click callback: open the clicked subplot's cell in the last single-cell view
+    points = ((st.session_state.get("umap_overview") or {}).get("selection") or {}).get("points") or []
+    curve = points[-1].get("curve_number") if points else None
+    if curve is not None and 0 <= curve < len(cells):
+        st.session_state.selected_cell = tuple(cells[curve])
+        st.session_state.plot_mode = st.session_state.get("cell_plot_mode", "Auto")
+
+
+def _track_episode(episode: int):
+    st.session_state.tracked_episode = episode
+
+
+def _pick_tracked(key: str):
+    st.session_state.tracked_episode = st.session_state[key]
 
-    fig = make_umap_plot(df_sel)
-    fig.update_layout(height=PLOT_HEIGHT, margin=dict(l=5, r=5, t=30, b=5))
-    st.plotly_chart(fig, width="stretch")
+
+def render_episode_query(subset_key: str, disruption_key: str, query: tuple):
+    index = cell_index(parts.cell_version(subset_key, disruption_key), subset_key, disruption_key, parts)
+    kind = query[0]
+    if kind == "point":
+        k = st.number_input("Nearest episodes", min_value=1, max_value=200, value=KNN_DEFAULT_K,
+                            key="knn_k")
+        with span("spatial_query"):
+            ids, dist = index.knn(query[1], query[2], k)
+            rows = episodes(parts, subset_key, disruption_key, ids, dist)
+        st.caption(f"{len(rows)} nearest episodes to ({query[1]:.3f}, {query[2]:.3f}) in this cell")
+        if len(ids):
+            ep_index = episode_index(data_version, parts)
+            nearest = ep_index.episode_of(parts.cell_range(subset_key, disruption_key)[0] + int(ids[0]))
+            st.button(f"Track {ep_index.label(nearest)} across disruptions", on_click=_track_episode,
+                      args=(nearest,))
+    else:
+        with span("spatial_query"):
+            ids = index.box(query[1], query[2]) if kind == "box" else index.polygon(query[1], query[2])
+            rows = episodes(parts, subset_key, disruption_key, ids[:EPISODE_LIST_MAX])
+        more = f" (first {EPISODE_LIST_MAX:,} listed)" if len(ids) > EPISODE_LIST_MAX else ""
+        st.caption(f"{len(ids):,} episodes in the {kind} selection{more}")
+    st.dataframe(rows, hide_index=True, width="stretch", height=220)
 
 
 # -----------------------------
-# RIGHT: Grid + Legend (balanced wrappers only)
+# Selection pane (fragment): grid clicks, zoom and view toggles rerun only this
+# block, not data loading/validation above.
 # -----------------------------
-with right:
-
-    grid_resp = render_silhouette_grid(
-        df_filtered=df_filtered,
-        subset_order=SUBSET_ORDER,
-        disruption_order=DISRUPTION_ORDER,
-        subset_meta=SUBSET_META,
-        disruption_meta=DISRUPTION_META,
-        selected_cell=st.session_state.selected_cell,
-        transpose=True,     # rows=subsets, cols=disruptions (fits better)
-        display="abbr",     # abbreviations in grid
-        grid_height=400,      # autoHeight handles real height
-        max_width_px=0,     # use container width
-    )
-
-    legend_iframe = render_legend_iframe_html(
-        template_path="src/templates/legend.html",
-        css_path="src/styles/app.css",
-        show_colors=SHOW_COLORS,
-        disruption_meta=DISRUPTION_LEGEND_META,
-        disruption_order=DISRUPTION_ORDER,
-        subset_meta=SUBSET_LEGEND_META,
-        subset_order=SUBSET_LEGEND_ORDER,
-    )
-
-    components.html(legend_iframe, height=300, scrolling=True)
+# while sampled silhouette estimates are still tightening, poll so the grid picks them up
+REFINE_POLL = "2s"
+refining = sil_refiner is not None and not sil_refiner.done
+
+
+@st.fragment(run_every=REFINE_POLL if refining else None)
+@traced_run("selection_pane")
+def selection_pane():
+    left, right = st.columns([1.5, 1.0], gap="small")
 
     # -----------------------------
-    # Click handling (NEW grid writes OG keys; no mapping needed)
+    # LEFT: Plot (MUST stay entirely inside this block)
     # -----------------------------
-    grid_data = grid_resp.get("data", None)
+    with left:
+        subset_key, disruption_key = st.session_state.selected_cell
 
-    if isinstance(grid_data, pd.DataFrame):
-        df_grid = grid_data
-    elif isinstance(grid_data, list):
-        df_grid = pd.DataFrame(grid_data)
-    else:
-        df_grid = None
-
-    if df_grid is not None and not df_grid.empty:
-        if "__clicked_subset" in df_grid.columns and "__clicked_disruption" in df_grid.columns:
-            df_clicked = df_grid[df_grid["__clicked_subset"].astype(
-                str).str.len() > 0]
-            if not df_clicked.empty:
-                last = df_clicked.iloc[-1]
-                clicked_subset = last.get("__clicked_subset")
-                clicked_disruption = last.get("__clicked_disruption")
-
-                if clicked_subset and clicked_disruption:
-                    new_sel = (clicked_subset, clicked_disruption)
-                    if new_sel != st.session_state.selected_cell:
-                        st.session_state.selected_cell = new_sel
-                        st.rerun()
+        st.markdown(
+            f"**Selection:** {full(SUBSET_META, subset_key)} / {full(DISRUPTION_META, disruption_key)}")
+
+        # Zoom refinement: a box selection becomes the viewport for this cell, and the
+        # point budget is then spent on the visible region only.
+        plot_state = st.session_state.get("umap_plot") or {}
+        selection = plot_state.get("selection") or {}
+        boxes = selection.get("box") or []
+        if boxes and boxes[-1] != st.session_state.get("plot_box_applied"):
+            st.session_state.plot_box_applied = boxes[-1]
+            rng = _box_range(boxes[-1])
+            if rng is not None:
+                st.session_state.plot_view = (st.session_state.selected_cell, *rng)
+
+        # Episode lookup: box/lasso list the episodes inside, a clicked point its nearest
+        # neighbours; both query the cell's spatial index over all of its points, not
+        # just the ones drawn.
+        query = _episode_query(selection)
+        if query != st.session_state.get("episode_query_applied"):
+            st.session_state.episode_query_applied = query
+            st.session_state.episode_query = (st.session_state.selected_cell, query) if query else None
+
+        view = st.session_state.get("plot_view")
+        x_range, y_range = (view[1], view[2]) if view and view[0] == st.session_state.selected_cell else (None, None)
+
+        view_mode = st.radio("View", ["Auto", "Points", "Density", "Overview"], horizontal=True,
+                             key="plot_mode", label_visibility="collapsed")
+        # Overview: all cells as small multiples in one figure; a click opens that cell
+        overview = view_mode == "Overview"
+        if not overview:
+            st.session_state.cell_plot_mode = view_mode
+        render_mode = {"Auto": "auto", "Points": UMAP_RENDERER,
+                       "Density": "density"}.get(view_mode, "auto")
+
+        # Episode tracking through the precomputed join index (src/episodes.py)
+        ep_index = episode_index(data_version, parts)
+        tracked, track_view = None, "Highlight"
+        if st.session_state.get("tracked_version", data_version) != data_version:
+            # episode ids are per dataset version (an append renumbers them); follow the label
+            label = st.session_state.get("tracked_label")
+            st.session_state.tracked_episode = ep_index.labels.index(label) if label in ep_index.labels else None
+        if not overview:
+            search_col, pick_col, track_view_col = st.columns([0.9, 1.1, 1.0])
+            query = search_col.text_input("Find episode", key="track_query", placeholder="Find an episode…",
+                                          label_visibility="collapsed")
+            # only search matches (and the tracked episode) go to the browser, never every
+            # episode; a clicked point's "Track …" button seeds the pick too
+            tracked = st.session_state.get("tracked_episode")
+            matches = [e for e in ep_index.search(query, TRACK_MATCH_MAX) if e != tracked]
+            options = [None, *([tracked] if tracked is not None else []), *matches]
+            pick_key = f"track_pick:{tracked}"
+            pick_col.selectbox(
+                "Track episode", options, index=options.index(tracked), key=pick_key,
+                on_change=_pick_tracked, args=(pick_key,),
+                format_func=lambda e: "Track an episode…" if e is None else ep_index.label(e),
+                label_visibility="collapsed")
+            st.session_state.tracked_version = data_version
+            st.session_state.tracked_label = ep_index.label(tracked) if tracked is not None else None
+            track_view = track_view_col.radio(
+                "Tracking", ["Highlight", "Trajectory", "Animate"], horizontal=True, key="track_view",
+                label_visibility="collapsed")
+        animate = track_view == "Animate"
+        if animate and not len(ep_index.complete([(subset_key, d) for d in DISRUPTION_ORDER])[0]):
+            # e.g. a filter or placement left a disruption of this subset empty
+            st.info(f"No episode appears under every disruption of {full(SUBSET_META, subset_key)}; "
+                    "showing the selected cell instead.")
+            animate = False
+
+        # Prewarm this dataset version's cells once per process, in the background. Figures are
+        # keyed by cell version, so only cells whose rows this version changed are queued: all
+        # of them on a fresh load, just the filtered/appended ones otherwise.
+        variant = (render_mode, POINT_BUDGET, PLOT_HEIGHT)
+        fig_cache.prewarm((data_version, *variant), [
+            ((data_version, s, d, *variant), partial(build_cell_figure, parts, data_version, s, d, render_mode))
+            for s in SUBSET_ORDER for d in DISRUPTION_ORDER if parts.cell_version(s, d) == data_version
+        ])
+        cell_version = parts.cell_version(subset_key, disruption_key)
+
+        with span("figure"):
+            if overview:
+                fig_key = ("overview", data_version, OVERVIEW_POINT_BUDGET)
+                fig = fig_cache.get_or_build(fig_key, partial(build_overview_figure, parts, data_version))
+                payload_bytes = fig_cache.entry_bytes(fig_key) or figure_payload_bytes(fig)
+            elif animate:
+                fig_key = ("animation", data_version, subset_key, tracked, PLOT_HEIGHT)
+                fig = fig_cache.get_or_build(
+                    fig_key, partial(build_disruption_animation, parts, data_version, subset_key, tracked))
+                payload_bytes = fig_cache.entry_bytes(fig_key) or figure_payload_bytes(fig)
+            elif x_range is None and y_range is None:
+                fig_key = (cell_version, subset_key, disruption_key, *variant)
+                fig = fig_cache.get_or_build(
+                    fig_key,
+                    partial(build_cell_figure, parts, cell_version, subset_key, disruption_key, render_mode))
+                payload_bytes = fig_cache.entry_bytes(fig_key) or figure_payload_bytes(fig)
+            else:
+                # zoomed views are transient; don't let them push prebuilt cells out
+                fig = build_cell_figure(parts, cell_version, subset_key, disruption_key, render_mode,
+                                        x_range, y_range)
+                payload_bytes = figure_payload_bytes(fig)
+            # placed rows come from the dataset being plotted: counts are per cell, not frame offsets
+            n_placed = parts.placed.get((subset_key, disruption_key), 0)
+            if n_placed and not animate and not overview:
+                placed_rows = parts.placed_rows(subset_key, disruption_key)
+                fig = with_placed_overlay(
+                    fig, placed_rows["UMAP1"].to_numpy(), placed_rows["UMAP2"].to_numpy(),
+                    placed_rows["SHOW_LABEL"].astype(str).tolist())
+            tracked_here = True
+            if tracked is not None and not animate and not overview:
+                fig, tracked_here = track_overlay(fig, subset_key, disruption_key, tracked,
+                                                  trajectory=track_view == "Trajectory")
+        count("plot_payload_bytes", payload_bytes)
+        with span("plot_chart"):
+            if overview:
+                st.plotly_chart(fig, width="stretch", key="umap_overview", selection_mode="points",
+                                on_select=partial(_select_from_overview, fig.layout.meta["cells"]))
+            elif animate:
+                st.plotly_chart(fig, width="stretch", key="umap_animation")
+            else:
+                st.plotly_chart(fig, width="stretch", key="umap_plot",
+                                on_select="rerun", selection_mode=("points", "box", "lasso"))
+
+        n_total, n_shown = fig.layout.meta["n_total"], fig.layout.meta["n_shown"]
+        if not tracked_here:
+            st.caption(f"{ep_index.label(tracked)} is not in this cell.")
+        if overview:
+            st.caption(f"All {len(fig.layout.meta['cells'])} cells, {n_shown:,} of {n_total:,} points "
+                       "(sampled per cell). Click a point to open its cell.")
+        elif animate:
+            st.caption(f"Animating {n_shown:,} of {n_total:,} episodes present under every disruption "
+                       f"of {full(SUBSET_META, subset_key)}.")
+        elif "n_bins" in fig.layout.meta:
+            st.caption(f"Density of {n_total:,} points, aggregated per show.")
+        elif n_shown < n_total:
+            st.caption(
+                f"Showing {n_shown:,} of {n_total:,} points. Box-select a region to load it in full detail.")
+        if placement is not None and not overview and not animate:
+            skipped = f"; {placement.skipped:,} rows couldn't be placed" if placement.skipped else ""
+            st.caption(f"{n_placed:,} new episodes placed in this cell (ringed), {sum(parts.placed.values()):,} "
+                       f"in all, from their {PLACEMENT_K} nearest neighbours in embedding space{skipped}.")
+        if x_range is not None and st.button("Reset zoom"):
+            st.session_state.plot_view = None
+            st.rerun(scope="fragment")
+
+        episode_query = st.session_state.get("episode_query")
+        if not overview and episode_query and episode_query[0] == st.session_state.selected_cell:
+            render_episode_query(subset_key, disruption_key, episode_query[1])
+
+        with st.expander("Memory & figure cache", expanded=False):
+            mem = memory_report(st.session_state, fig_cache, catalog)
+            rss = f"{mem['rss_bytes'] / 2**20:.0f} MB" if mem["rss_bytes"] is not None else "n/a"
+            sessions = mem["active_sessions"] if mem["active_sessions"] is not None else "n/a"
+            st.caption(
+                f"Process: {rss} RSS · shared {mem['shared_bytes'] / 2**20:.1f} MB "
+                f"({len(mem['datasets'])} datasets {mem['dataset_bytes'] / 2**20:.1f} MB, "
+                f"figures {mem['figure_cache_bytes'] / 2**20:.1f} MB) · {sessions} sessions")
+            cat = mem["catalog"]
+            st.caption(
+                f"Datasets: {cat['datasets']} resident, {cat['bytes'] / 2**20:.1f} / "
+                f"{cat['max_bytes'] / 2**20:.0f} MB · loads {cat['loads']} · evictions {cat['evictions']}")
+            st.caption(f"This session: {mem['session_bytes'] / 1024:.1f} KB of state")
+            cs = fig_cache.stats()
+            st.caption(f"This figure: {payload_bytes / 1024:.1f} KB plot payload")
+            st.caption(
+                f"{cs['entries']} figures, {cs['bytes'] / 2**20:.1f} / {cs['max_bytes'] / 2**20:.0f} MB · "
+                f"hits {cs['hits']} · misses {cs['misses']} ({cs['hit_rate']:.0%} hit rate) · "
+                f"evictions {cs['evictions']} · prewarming {cs['pending']}")
+
+    # -----------------------------
+    # RIGHT: Grid + Legend (balanced wrappers only)
+    # -----------------------------
+    with right:
+
+        # Click handling: the grid emits only the clicked (subset, disruption) OG keys
+        # one row per cell: the pivot is O(cells), not O(rows)
+        grid_df, grid_version = parts.cell_frame("SIL_SCORE"), data_version
+        if sil_refiner is not None:
+            revision, _ = sil_refiner.snapshot()
+            grid_df, grid_version = sil_refiner.frame(), f"{data_version}:est{revision}"
+        with span("grid"):
+            render_silhouette_grid(
+                df_filtered=grid_df,
+                subset_order=SUBSET_ORDER,
+                disruption_order=DISRUPTION_ORDER,
+                subset_meta=SUBSET_META,
+                disruption_meta=DISRUPTION_META,
+                selected_cell=st.session_state.selected_cell,
+                data_version=grid_version,
+                on_select=_select_cell,
+                transpose=True,     # rows=subsets, cols=disruptions (fits better)
+                display="abbr",     # abbreviations in grid
+                grid_height=400,      # autoHeight handles real height
+                max_width_px=0,     # use container width
+            )
+
+        if sil_refiner is not None:
+            state = "refining…" if not sil_refiner.done else "final"
+            st.caption(f"Silhouette sampled per show: ±{sil_refiner.max_half_width():.3f} (95% CI), {state}")
+            if refining and sil_refiner.done:
+                st.rerun()  # full rerun drops the polling interval
+        if parts.stale_cells:
+            shown = [c for c in parts.cells if parts.cell_size(*c) > 0]
+            stale = [f"{abbr(SUBSET_META, s)}/{abbr(DISRUPTION_META, d)}" for s, d in shown
+                     if (s, d) in parts.stale_cells]
+            which = ("Every cell's silhouette is" if len(stale) == len(shown)
+                     else f"Silhouette for {', '.join(stale)} is")
+            st.caption(f"{which} the data file's score from before the rows were filtered or appended to; "
+                       "the in-app metric differs, so it isn't recomputed here.")
+
+        # identical bytes on every run, so the frontend keeps the existing iframe
+        with span("legend"):
+            legend_iframe = cached_legend_html(
+                template_path="src/templates/legend.html",
+                css_path="src/styles/app.css",
+                show_colors=SHOW_COLORS,
+                disruption_meta=DISRUPTION_LEGEND_META,
+                disruption_order=DISRUPTION_ORDER,
+                subset_meta=SUBSET_LEGEND_META,
+                subset_order=SUBSET_LEGEND_ORDER,
+                # prebuilt at image build time (src/compiled.py) when the template/CSS match
+                prebuilt=(lambda: load_compiled_legend(entry.path, "src/templates/legend.html",
+                                                       "src/styles/app.css"))
+                if entry is not None and entry.kind == "file" else None,
+            )
+
+            components.html(legend_iframe, height=300, scrolling=True)
+
+    if diagnostics_enabled():
+        render_panel()
+
+
+selection_pane()
+end_run(data_version=data_version)
@@ -0,0 +1,184 @@
+# src/catalog.py
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+import streamlit as st
+
+from src.data_io import file_signature, path_version
+from src.partitions import PartitionedDataset
+
+log = logging.getLogger(__name__)
+
+DATA_SUFFIXES = (".csv", ".tsv", ".txt")
+DEFAULT_MAX_BYTES = 2 * 1024**3
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    """A dataset the user can pick: a file under the data directory or an upload."""
+    key: str        # dataset version (path_version / upload_version)
+    name: str
+    kind: str       # 'file' | 'upload'
+    path: str | None = None
+    mtime_ns: int = 0
+    size: int = 0
+
+    @property
+    def ref(self) -> str:
+        """Stable picker key: the path for files (kept across appends/rewrites), the version for uploads."""
+        return self.path if self.kind == "file" and self.path else self.key
+
+
+def discover(data_dir: str) -> list[CatalogEntry]:
+    """Data files directly under `data_dir`, newest first (hidden/cache dirs skipped)."""
+    entries = []
+    try:
+        names = os.listdir(data_dir)
+    except OSError:
+        return []
+    for name in names:
+        path = os.path.join(data_dir, name)
+        if name.startswith(".") or not name.lower().endswith(DATA_SUFFIXES) or not os.path.isfile(path):
+            continue
+        mtime_ns, size = file_signature(path)
+        entries.append(CatalogEntry(key=path_version(path), name=name, kind="file", path=path,
+                                    mtime_ns=mtime_ns, size=size))
+    return sorted(entries, key=lambda e: (-e.mtime_ns, e.name))
+
+
+class DatasetCatalog:
+    """
+    Process-wide LRU of loaded datasets, bounded by their in-memory size.
+
+    `get` loads lazily (once, even with concurrent callers) and marks the dataset
+    as used by the calling session. Eviction drops least-recently-used datasets
+    until the total fits `max_bytes`, but never one that a live session is viewing:
+    a pinned dataset may push the total over budget until its viewers move on.
+    Downstream caches (grid pivots, figures, indexes) are keyed by the dataset
+    version, so switching back to a dataset reuses them if they're still cached.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._datasets: OrderedDict[str, PartitionedDataset] = OrderedDict()
+        self._entries: dict[str, CatalogEntry] = {}
+        self._viewing: dict[str, str] = {}  # session id -> dataset key
+        self._lock = threading.Lock()
+        self._loading: dict[str, threading.Lock] = {}
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+
+    @property
+    def bytes(self) -> int:
+        return sum(p.nbytes for p in self._datasets.values())
+
+    def resident(self) -> list[CatalogEntry]:
+        with self._lock:
+            return [self._entries[k] for k in reversed(self._datasets)]
+
+    def lookup(self, key: str) -> PartitionedDataset | None:
+        """The resident dataset for `key` (marked recently used), or None; never loads."""
+        with self._lock:
+            parts = self._datasets.get(key)
+            if parts is not None:
+                self._datasets.move_to_end(key)
+                self.hits += 1
+            return parts
+
+    def resident_file(self, path: str) -> tuple[str, PartitionedDataset] | None:
+        """(key, dataset) of the most recently used resident version of the file at `path`."""
+        with self._lock:
+            for key in reversed(self._datasets):
+                if self._entries[key].kind == "file" and self._entries[key].path == path:
+                    return key, self._datasets[key]
+        return None
+
+    def get(
+        self,
+        entry: CatalogEntry,
+        loader: Callable[[], PartitionedDataset],
+        session_id: str | None = None,
+        live_sessions: set[str] | None = None,
+        supersedes: str | None = None,
+    ) -> PartitionedDataset:
+        """
+        Dataset for `entry`, loading it with `loader()` on a miss. `supersedes` is the
+        key of an older version of the same file, dropped once this one is loaded
+        (sessions still holding it keep their reference until their next rerun).
+        """
+        with self._lock:
+            if session_id is not None:
+                self._viewing[session_id] = entry.key
+            parts = self._datasets.get(entry.key)
+            if parts is not None:
+                self._datasets.move_to_end(entry.key)
+                self.hits += 1
+                return parts
+            key_lock = self._loading.setdefault(entry.key, threading.Lock())
+
+        with key_lock:  # one load per key; other sessions wait for it
+            with self._lock:
+                parts = self._datasets.get(entry.key)
+            if parts is None:
+                t0 = time.perf_counter()
+                parts = loader()
+                log.info("Loaded dataset %s (%d rows, %.1f MB) in %.2fs", entry.name, len(parts),
+                         parts.nbytes / 2**20, time.perf_counter() - t0)
+                with self._lock:
+                    self._datasets[entry.key] = parts
+                    self._entries[entry.key] = entry
+                    self.loads += 1
+                    if supersedes is not None and supersedes != entry.key:
+                        self._datasets.pop(supersedes, None)
+                        self._entries.pop(supersedes, None)
+                    self._evict(live_sessions, keep=entry.key)
+        with self._lock:
+            self._loading.pop(entry.key, None)
+        return parts
+
+    def _evict(self, live_sessions: set[str] | None, keep: str) -> None:
+        # caller holds self._lock; `keep` is the dataset just loaded for the caller
+        if live_sessions is not None:
+            self._viewing = {s: k for s, k in self._viewing.items() if s in live_sessions}
+        pinned = set(self._viewing.values()) | {keep}
+        total = self.bytes
+        for key in list(self._datasets):
+            if total <= self.max_bytes:
+                break
+            if key in pinned:
+                continue
+            total -= self._datasets.pop(key).nbytes
+            log.info("Evicted dataset %s (LRU, catalog over %.0f MB)", self._entries[key].name,
+                     self.max_bytes / 2**20)
+            self._entries.pop(key, None)
+            self.evictions += 1
+        if total > self.max_bytes:
+            log.warning("Dataset catalog at %.0f MB, over its %.0f MB budget: all remaining datasets are in use",
+                        total / 2**20, self.max_bytes / 2**20)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"datasets": len(self._datasets), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                    "loads": self.loads, "hits": self.hits, "evictions": self.evictions,
+                    "viewers": len(self._viewing)}
+
+
+@st.cache_resource(show_spinner=False)
+def get_catalog(max_bytes: int = DEFAULT_MAX_BYTES) -> DatasetCatalog:
+    """One catalog per process (per budget)."""
+    return DatasetCatalog(max_bytes)
+
+
+def entry_for_path(path: str) -> CatalogEntry:
+    mtime_ns, size = file_signature(path)
+    return CatalogEntry(key=path_version(path), name=Path(path).name, kind="file", path=path,
+                        mtime_ns=mtime_ns, size=size)
@@ -0,0 +1,201 @@
+# src/compiled.py
+"""
+Build-time compiled dataset artifact (run from the Dockerfile):
+
+    python -m src.compiled data/*.csv
+
+Writes data/.cache/<stem>.compiled/ with one .npy file per column (categorical
+codes for label columns) in partition order, a manifest (source signature, cell
+offsets, categories) and the rendered legend HTML. SIL_SCORE is filled in at build
+time when the source lacks it, so the app never computes it on a cold start.
+At runtime the arrays are memory-mapped read-only, so loading is O(1) in the
+row count and pages are shared between processes.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.data_io import CACHE_DIR_NAME, file_signature, load_columnar, path_version
+from src.partitions import PartitionedDataset, build_partitions
+
+log = logging.getLogger(__name__)
+
+FORMAT = 2  # 2: missing labels are missing, not a "nan" category
+MANIFEST = "manifest.json"
+LEGEND_FILE = "legend.html"
+
+
+def compiled_dir(path: str) -> Path:
+    p = Path(path)
+    return p.parent / CACHE_DIR_NAME / f"{p.stem}.compiled"
+
+
+def _mtime(path: str) -> int:
+    return os.stat(path).st_mtime_ns
+
+
+# -----------------------------
+# Build
+# -----------------------------
+def compile_dataset(
+    path: str,
+    subset_order: tuple[str, ...],
+    disruption_order: tuple[str, ...],
+    *,
+    legend_kwargs: dict | None = None,
+) -> Path:
+    """Partition `path`, fill SIL_SCORE if missing, and write the artifact atomically."""
+    from src.silhouette import needs_silhouette, compute_cell_scores
+
+    signature = file_signature(path)
+    parts = build_partitions(load_columnar(path, signature), subset_order, disruption_order,
+                             version=path_version(path))
+
+    out = compiled_dir(path)
+    tmp = out.with_name(f"{out.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    columns = []
+    for c in parts.frame.columns:
+        s = parts.frame[c]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            np.save(tmp / f"{c}.npy", np.ascontiguousarray(s.cat.codes.to_numpy()))
+            columns.append({"name": c, "kind": "category",
+                            "categories": [str(v) for v in s.cat.categories]})
+        else:
+            np.save(tmp / f"{c}.npy", np.ascontiguousarray(s.to_numpy()))
+            columns.append({"name": c, "kind": "array"})
+    sil_source = "file"
+    if needs_silhouette(parts):
+        sil_source = "app"
+        sil = np.full(len(parts), np.nan, dtype=np.float32)
+        for cell, score in compute_cell_scores(parts).items():
+            start, stop = parts.cell_range(*cell)
+            sil[start:stop] = score
+        np.save(tmp / "SIL_SCORE.npy", sil)
+        columns = [c for c in columns if c["name"] != "SIL_SCORE"] + [{"name": "SIL_SCORE", "kind": "array"}]
+
+    manifest = {
+        "format": FORMAT,
+        "source": {"name": Path(path).name, "mtime_ns": signature[0], "size": signature[1]},
+        "version": parts.version,
+        "rows": len(parts),
+        "subset_order": list(subset_order),
+        "disruption_order": list(disruption_order),
+        "columns": columns,
+        "offsets": [[s, d, start, stop] for (s, d), (start, stop) in parts.offsets.items()],
+        "sil_source": sil_source,
+    }
+
+    if legend_kwargs is not None:
+        from src.legend import render_legend_iframe_html
+        (tmp / LEGEND_FILE).write_text(render_legend_iframe_html(**legend_kwargs), encoding="utf-8")
+        manifest["legend"] = {
+            "file": LEGEND_FILE,
+            "template_mtime_ns": _mtime(legend_kwargs["template_path"]),
+            "css_mtime_ns": _mtime(legend_kwargs["css_path"]),
+        }
+
+    (tmp / MANIFEST).write_text(json.dumps(manifest), encoding="utf-8")
+    shutil.rmtree(out, ignore_errors=True)
+    os.replace(tmp, out)
+    return out
+
+
+# -----------------------------
+# Load
+# -----------------------------
+def _manifest(path: str) -> dict | None:
+    try:
+        m = json.loads((compiled_dir(path) / MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    mtime_ns, size = file_signature(path)
+    src = m.get("source", {})
+    if m.get("format") != FORMAT or (src.get("mtime_ns"), src.get("size")) != (mtime_ns, size):
+        return None
+    return m
+
+
+def load_compiled(
+    path: str,
+    subset_order: tuple[str, ...],
+    disruption_order: tuple[str, ...],
+) -> PartitionedDataset | None:
+    """Memory-mapped dataset if a current artifact exists for `path`, else None."""
+    m = _manifest(path)
+    if m is None or (tuple(m["subset_order"]), tuple(m["disruption_order"])) != (subset_order, disruption_order):
+        return None
+    d = compiled_dir(path)
+    try:
+        cols = {}
+        for c in m["columns"]:
+            arr = np.load(d / f"{c['name']}.npy", mmap_mode="r")  # read-only mapping
+            if c["kind"] == "category":
+                arr = pd.Categorical.from_codes(arr, categories=c["categories"])
+            cols[c["name"]] = pd.Series(arr, name=c["name"], copy=False)
+        frame = pd.DataFrame(cols, copy=False)
+    except (OSError, ValueError) as e:
+        log.warning("Ignoring unreadable compiled artifact %s: %s", d, e)
+        return None
+    return PartitionedDataset(
+        frame=frame,
+        offsets={(s, dd): (start, stop) for s, dd, start, stop in m["offsets"]},
+        subset_order=tuple(m["subset_order"]),
+        disruption_order=tuple(m["disruption_order"]),
+        version=m["version"],
+        sil_source=m.get("sil_source", "file"),
+    )
+
+
+def load_compiled_legend(path: str, template_path: str, css_path: str) -> str | None:
+    """Prebuilt legend HTML, if the artifact has one and the template/CSS are unchanged."""
+    m = _manifest(path)
+    legend = (m or {}).get("legend")
+    if not legend:
+        return None
+    try:
+        if (legend["template_mtime_ns"], legend["css_mtime_ns"]) != (_mtime(template_path), _mtime(css_path)):
+            return None
+        return (compiled_dir(path) / legend["file"]).read_text(encoding="utf-8")
+    except OSError:
+        return None
+
+
+def main(argv: list[str] | None = None) -> None:
+    from src.label_meta import (
+        DISRUPTION_LEGEND_META, DISRUPTION_ORDER, SHOW_COLORS, SUBSET_LEGEND_META,
+        SUBSET_LEGEND_ORDER, SUBSET_ORDER)
+
+    ap = argparse.ArgumentParser(description="Compile a dataset into a memory-mappable artifact.")
+    ap.add_argument("paths", nargs="+", help="source CSVs (as used by app.py); missing ones are skipped")
+    args = ap.parse_args(argv)
+    for path in args.paths:
+        if not os.path.exists(path):
+            print(f"skipping {path}: not found")
+            continue
+        out = compile_dataset(
+            path, tuple(SUBSET_ORDER), tuple(DISRUPTION_ORDER),
+            legend_kwargs=dict(
+                template_path="src/templates/legend.html",
+                css_path="src/styles/app.css",
+                show_colors=SHOW_COLORS,
+                disruption_meta=DISRUPTION_LEGEND_META,
+                disruption_order=DISRUPTION_ORDER,
+                subset_meta=SUBSET_LEGEND_META,
+                subset_order=SUBSET_LEGEND_ORDER,
+            ))
+        print(f"compiled {path} -> {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,254 @@
+# src/data_io.py
+from __future__ import annotations
+
+import logging
+import os
+from pathlib import Path
+
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+from src.diagnostics import span, timed
+
+log = logging.getLogger(__name__)
+
+# -----------------------------
+# Compact dtypes
+# -----------------------------
+CATEGORY_COLS = ["SHOW", "SUBSET", "DISRUPTION", "SHOW_LABEL"]
+FLOAT32_COLS = ["UMAP1", "UMAP2", "SIL_SCORE"]
+INT16_COLS = ["SEASON", "EPISODE"]
+# high-dimensional embedding columns (EMB_0, EMB_1, ...), used to place new episodes
+# into an existing layout (src/placement.py)
+EMBEDDING_PREFIX = "EMB_"
+
+# Parquet artifacts live next to the source file, e.g. data/.cache/<stem>.parquet
+CACHE_DIR_NAME = ".cache"
+_META_MTIME = b"source_mtime_ns"
+_META_SIZE = b"source_size"
+# bumped when compact_dtypes changes what it writes, so older artifacts are rebuilt
+_META_FORMAT = b"dtypes_format"
+DTYPES_FORMAT = 2
+
+
+def as_category(s: pd.Series) -> pd.Series:
+    """Categorical of the values as text; missing values stay missing (no "nan" category)."""
+    values = s.astype(object)
+    return values.where(values.isna(), values.astype(str)).astype("category")
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Downcast the known columns (categoricals, float32, int16); others pass through."""
+    out = {}
+    for c in df.columns:
+        s = df[c]
+        if c in CATEGORY_COLS:
+            s = as_category(s)
+        elif c in FLOAT32_COLS or str(c).startswith(EMBEDDING_PREFIX):
+            s = pd.to_numeric(s, errors="coerce").astype("float32")
+        elif c in INT16_COLS:
+            s = pd.to_numeric(s, errors="coerce")
+            # NaNs or fractional values can't live in int16; keep them as float32
+            if s.notna().all() and (s % 1 == 0).all():
+                s = s.astype("int16")
+            else:
+                s = s.astype("float32")
+        out[c] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+def embedding_columns(columns) -> list[str]:
+    """Embedding columns in file order."""
+    return [c for c in columns if str(c).startswith(EMBEDDING_PREFIX)]
+
+
+def file_signature(path: str) -> tuple[int, int]:
+    """(mtime_ns, size) of the source file; changes whenever the file is rewritten."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def path_version(path: str) -> str:
+    """Dataset version string for a file on disk; used to key downstream caches."""
+    mtime_ns, size = file_signature(path)
+    return f"{Path(path).name}:{mtime_ns}:{size}"
+
+
+def upload_version(uploaded_file) -> str:
+    """Dataset version string for a Streamlit upload (new file_id per upload)."""
+    return f"upload:{uploaded_file.name}:{getattr(uploaded_file, 'file_id', uploaded_file.size)}"
+
+
+def artifact_path(path: str) -> Path:
+    p = Path(path)
+    return p.parent / CACHE_DIR_NAME / f"{p.stem}.parquet"
+
+
+def _read_artifact(art: Path, signature: tuple[int, int]) -> pd.DataFrame | None:
+    if not art.exists():
+        return None
+    try:
+        meta = pq.read_schema(art).metadata or {}
+        if (int(meta.get(_META_MTIME, -1)), int(meta.get(_META_SIZE, -1))) != signature:
+            return None
+        if int(meta.get(_META_FORMAT, 1)) != DTYPES_FORMAT:
+            return None
+        return pq.read_table(art).to_pandas()
+    except Exception as e:  # corrupt / partially written artifact => rebuild
+        log.warning("Ignoring unreadable artifact %s: %s", art, e)
+        return None
+
+
+def _write_artifact(df: pd.DataFrame, art: Path, signature: tuple[int, int]) -> None:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    meta = dict(table.schema.metadata or {})
+    meta[_META_MTIME] = str(signature[0]).encode()
+    meta[_META_SIZE] = str(signature[1]).encode()
+    meta[_META_FORMAT] = str(DTYPES_FORMAT).encode()
+    table = table.replace_schema_metadata(meta)
+
+    try:
+        art.parent.mkdir(parents=True, exist_ok=True)
+        tmp = art.with_suffix(f".{os.getpid()}.tmp")
+        pq.write_table(table, tmp)
+        os.replace(tmp, art)  # atomic: concurrent readers never see a partial file
+    except OSError as e:  # read-only filesystem etc.; in-memory cache still works
+        log.warning("Could not write artifact %s: %s", art, e)
+
+
+def path_sep(name: str) -> str:
+    """Field separator by file name: tab for .tsv/.txt, comma otherwise."""
+    return "\t" if name.lower().endswith((".tsv", ".txt")) else ","
+
+
+def load_columnar(path: str, signature: tuple[int, int]) -> pd.DataFrame:
+    """Parquet artifact if it matches `signature`, otherwise parse the CSV once and write it."""
+    art = artifact_path(path)
+    with span("read_artifact"):
+        df = _read_artifact(art, signature)
+    if df is None:
+        with span("parse_csv"):
+            df = compact_dtypes(pd.read_csv(path, sep=path_sep(path)))
+        with span("write_artifact"):
+            _write_artifact(df, art, signature)
+    return df
+
+
+def _upload_sep(uploaded_file) -> str:
+    return path_sep(uploaded_file.name)
 
 
 def read_uploaded_file(uploaded_file) -> pd.DataFrame:
-    name = uploaded_file.name.lower()
-    if name.endswith(".tsv") or name.endswith(".txt"):
-        return pd.read_csv(uploaded_file, sep="\t")
-    return pd.read_csv(uploaded_file)
+    return pd.read_csv(uploaded_file, sep=_upload_sep(uploaded_file))
+
+
+# -----------------------------
+# Chunked upload ingestion
+# -----------------------------
+DEFAULT_CHUNK_ROWS = 250_000
+DEFAULT_MAX_INGEST_BYTES = 1024 * 1024 * 1024
+
+# Parse-time dtypes, so a raw chunk never materializes object/float64 columns
+READ_DTYPES = {**{c: "category" for c in CATEGORY_COLS},
+               "UMAP1": "float32", "UMAP2": "float32"}
+
+
+class IngestError(ValueError):
+    """An upload that can't be ingested (schema mismatch, over the memory ceiling)."""
+
+
+def _merge_categoricals(parts: list[pd.DataFrame]) -> pd.DataFrame:
+    # chunks carry different category sets; unify them so concat keeps category dtype
+    for c in parts[0].columns:
+        if isinstance(parts[0][c].dtype, pd.CategoricalDtype):
+            cats = pd.api.types.union_categoricals([p[c] for p in parts]).categories
+            for p in parts:
+                p[c] = p[c].cat.set_categories(cats)
+    return pd.concat(parts, ignore_index=True)
+
+
+@timed("ingest_upload")
+def ingest_upload(
+    uploaded_file,
+    required_cols: set[str],
+    subset_order: list[str],
+    disruption_order: list[str],
+    *,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    max_bytes: int = DEFAULT_MAX_INGEST_BYTES,
+    progress=None,
+) -> pd.DataFrame:
+    """
+    Stream an uploaded CSV/TSV in chunks with compact dtypes, keeping only rows in a
+    known (SUBSET, DISRUPTION) cell.
+
+    The schema is checked on the first chunk, before the rest of the file is read.
+    Raises IngestError if columns are missing, no row matches, or the kept rows
+    exceed `max_bytes`. `progress(fraction, rows_kept, rows_read)` is called per chunk.
+    """
+    total = getattr(uploaded_file, "size", 0) or 0
+    uploaded_file.seek(0)
+    reader = pd.read_csv(uploaded_file, sep=_upload_sep(uploaded_file),
+                         dtype=READ_DTYPES, chunksize=chunk_rows)
+
+    parts, kept_bytes, rows_read = [], 0, 0
+    with reader:
+        for i, chunk in enumerate(reader):
+            if i == 0:
+                missing = set(required_cols) - set(chunk.columns)
+                if missing:
+                    raise IngestError(f"Missing required columns: {sorted(missing)}")
+
+            rows_read += len(chunk)
+            keep = chunk["SUBSET"].isin(subset_order) & chunk["DISRUPTION"].isin(disruption_order)
+            if keep.any():
+                chunk = compact_dtypes(chunk[keep.to_numpy()])
+                for c in CATEGORY_COLS:
+                    if c in chunk.columns:
+                        chunk[c] = chunk[c].cat.remove_unused_categories()
+                parts.append(chunk)
+                kept_bytes += int(chunk.memory_usage(deep=True).sum())
+                if kept_bytes > max_bytes:
+                    raise IngestError(
+                        f"Upload exceeds the {max_bytes / 2**20:.0f} MB ingest limit after "
+                        f"{rows_read:,} rows; filter it before uploading.")
+
+            if progress is not None:
+                frac = min(uploaded_file.tell() / total, 1.0) if total else 0.0
+                progress(frac, sum(len(p) for p in parts), rows_read)
+
+    if not parts:
+        raise IngestError("No rows match the known SUBSET / DISRUPTION values.")
+    log.info("Ingested %s: kept %d of %d rows (%.1f MB)", uploaded_file.name,
+             sum(len(p) for p in parts), rows_read, kept_bytes / 2**20)
+    return _merge_categoricals(parts)
+
+
+def load_upload(
+    uploaded_file,
+    required_cols: tuple[str, ...],
+    subset_order: tuple[str, ...],
+    disruption_order: tuple[str, ...],
+    max_bytes: int = DEFAULT_MAX_INGEST_BYTES,
+) -> pd.DataFrame:
+    """`ingest_upload` with a progress bar (cleared when done)."""
+    bar = st.progress(0.0, text="Reading upload…")
+    try:
+        return ingest_upload(
+            uploaded_file, set(required_cols), list(subset_order), list(disruption_order),
+            max_bytes=max_bytes,
+            progress=lambda frac, kept, read: bar.progress(
+                frac, text=f"Reading upload… {read:,} rows read, {kept:,} kept"))
+    finally:
+        bar.empty()
 
 
 def read_default_path(path: str) -> pd.DataFrame:
+    """
+    Default dataset in compact dtypes, via the on-disk Parquet artifact keyed by the
+    file's (mtime, size). Uncached: src.dataset holds the shared, partitioned copy.
+    """
     # Streamlit runs from the project root; keep your default CSV there or use an absolute path.
-    return pd.read_csv(path)
+    return load_columnar(path, file_signature(path))
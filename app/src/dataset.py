@@ -0,0 +1,205 @@
+# src/dataset.py
+from __future__ import annotations
+
+import os
+import pickle
+import sys
+import threading
+import weakref
+from collections.abc import Callable
+
+import numpy as np
+import pandas as pd
+
+from src.catalog import CatalogEntry, DatasetCatalog, entry_for_path, get_catalog
+from src.compiled import load_compiled
+from src.data_io import (
+    DEFAULT_MAX_INGEST_BYTES, IngestError, load_upload, path_version, read_default_path)
+from src.partitions import PartitionedDataset, build_partitions, frame_nbytes
+from src.refresh import refresh_appended, track
+
+# -----------------------------
+# Shared datasets
+# -----------------------------
+# Prefer the build-time artifact (src/compiled.py) when it matches the source file
+USE_COMPILED = os.environ.get("USE_COMPILED_ARTIFACT", "1") not in ("0", "false")
+
+# Every loader below returns a read-only PartitionedDataset held once per process by
+# the dataset catalog (src/catalog.py, LRU under a memory budget); sessions keep only
+# references and their own selection state.
+_live: weakref.WeakValueDictionary[str, PartitionedDataset] = weakref.WeakValueDictionary()
+_live_lock = threading.Lock()
+
+
+def validate_columns(df: pd.DataFrame, required_cols) -> None:
+    missing = set(required_cols) - set(df.columns)
+    if missing:
+        raise IngestError(f"Missing required columns: {sorted(missing)}")
+
+
+def _register(parts: PartitionedDataset) -> PartitionedDataset:
+    with _live_lock:
+        _live[parts.version] = parts
+    return parts
+
+
+def read_path_dataset(
+    path: str,
+    required_cols: tuple[str, ...],
+    subset_order: tuple[str, ...],
+    disruption_order: tuple[str, ...],
+) -> PartitionedDataset:
+    """Uncached: the compiled artifact when current, else the CSV (via its Parquet cache)."""
+    if USE_COMPILED:
+        parts = load_compiled(path, subset_order, disruption_order)
+        if parts is not None:
+            validate_columns(parts.frame, required_cols)
+            return parts
+    # the unpartitioned frame is dropped on return; only the partitioned copy is kept
+    df = read_default_path(path)
+    validate_columns(df, required_cols)
+    return build_partitions(df, subset_order, disruption_order, version=path_version(path))
+
+
+def _session_ids() -> tuple[str | None, set[str] | None]:
+    # (this session, all live sessions) for the catalog's in-use pinning; private API
+    try:
+        from streamlit import runtime
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        if ctx is None or not runtime.exists():
+            return None, None
+        live = {s.session.id for s in runtime.get_instance()._session_mgr.list_active_sessions()}
+        return ctx.session_id, live
+    except Exception:
+        return None, None
+
+
+def _from_catalog(entry: CatalogEntry, load: Callable[[], PartitionedDataset], catalog: DatasetCatalog | None,
+                  prepare: Callable[[PartitionedDataset], PartitionedDataset] | None,
+                  supersedes: str | None = None) -> PartitionedDataset:
+    catalog = catalog if catalog is not None else get_catalog()
+    session_id, live = _session_ids()
+    return catalog.get(entry, lambda: _register(prepare(load()) if prepare else load()), session_id, live,
+                       supersedes=supersedes)
+
+
+def load_default_dataset(
+    path: str,
+    required_cols: tuple[str, ...],
+    subset_order: tuple[str, ...],
+    disruption_order: tuple[str, ...],
+    *,
+    catalog: DatasetCatalog | None = None,
+    prepare: Callable[[PartitionedDataset], PartitionedDataset] | None = None,
+) -> PartitionedDataset:
+    """
+    Shared dataset for a file on disk, loaded lazily into the catalog; changing the
+    file (mtime/size) makes it a new entry that replaces the old one. When the file
+    was only appended to, the new rows are parsed and merged into the resident
+    dataset (src/refresh.py) instead of reloading it. `prepare` runs once per load
+    (e.g. to fill SIL_SCORE), so what the catalog holds and budgets is the final dataset.
+    """
+    catalog = catalog if catalog is not None else get_catalog()
+    entry = entry_for_path(path)
+    previous = catalog.resident_file(path)
+
+    def load() -> PartitionedDataset:
+        if previous is not None and previous[0] != entry.key:
+            parts = refresh_appended(entry, *previous)
+            if parts is not None:
+                return parts
+        parts = read_path_dataset(path, required_cols, subset_order, disruption_order)
+        track(entry)
+        return parts
+
+    return _from_catalog(entry, load, catalog, prepare,
+                         supersedes=previous[0] if previous is not None else None)
+
+
+def load_upload_dataset(
+    version: str,
+    uploaded_file,
+    required_cols: tuple[str, ...],
+    subset_order: tuple[str, ...],
+    disruption_order: tuple[str, ...],
+    max_bytes: int = DEFAULT_MAX_INGEST_BYTES,
+    *,
+    catalog: DatasetCatalog | None = None,
+    prepare: Callable[[PartitionedDataset], PartitionedDataset] | None = None,
+) -> PartitionedDataset:
+    """Shared dataset for an upload, parsed once per `version` (see upload_version)."""
+    def load() -> PartitionedDataset:
+        df = load_upload(uploaded_file, required_cols, subset_order, disruption_order, max_bytes)
+        validate_columns(df, required_cols)
+        return build_partitions(df, subset_order, disruption_order, version=version)
+
+    entry = CatalogEntry(key=version, name=uploaded_file.name, kind="upload", size=uploaded_file.size)
+    return _from_catalog(entry, load, catalog, prepare)
+
+
+# -----------------------------
+# Memory accounting
+# -----------------------------
+def process_rss_bytes() -> int | None:
+    """Resident set size of this process (Linux /proc; peak RSS elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+def shared_datasets() -> list[dict]:
+    """Datasets currently held by this process (evicted ones drop out)."""
+    with _live_lock:
+        items = list(_live.items())
+    return [{"version": v, "rows": len(p), "bytes": p.nbytes} for v, p in items]
+
+
+def _approx_bytes(value) -> int:
+    if isinstance(value, pd.DataFrame):
+        return frame_nbytes(value)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:  # widgets / callables that don't pickle
+        return sys.getsizeof(value)
+
+
+def session_state_bytes(state) -> int:
+    """Approximate bytes owned by one session's state (shared datasets excluded)."""
+    return sum(_approx_bytes(state[k]) for k in list(state.keys()))
+
+
+def active_sessions() -> int | None:
+    try:
+        from streamlit import runtime
+        if not runtime.exists():
+            return None
+        return runtime.get_instance()._session_mgr.num_active_sessions()
+    except Exception:  # private API; accounting degrades to "unknown"
+        return None
+
+
+def memory_report(state, figure_cache=None, catalog: DatasetCatalog | None = None) -> dict:
+    """Per-process and per-session memory figures for sizing instances."""
+    datasets = shared_datasets()
+    report = {
+        "catalog": catalog.stats() if catalog is not None else None,
+        "rss_bytes": process_rss_bytes(),
+        "datasets": datasets,
+        "dataset_bytes": sum(d["bytes"] for d in datasets),
+        "figure_cache_bytes": figure_cache.stats()["bytes"] if figure_cache is not None else 0,
+        "session_bytes": session_state_bytes(state),
+        "active_sessions": active_sessions(),
+    }
+    report["shared_bytes"] = report["dataset_bytes"] + report["figure_cache_bytes"]
+    return report
@@ -0,0 +1,207 @@
+# src/diagnostics.py
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+import numpy as np
+import streamlit as st
+
+# One JSON object per line on stdout: Cloud Run turns these into structured log entries
+# (jsonPayload.*), so log-based metrics can take percentiles of e.g. `figure_ms`.
+log = logging.getLogger("sunny.timing")
+
+QUERY_PARAM = "diag"
+HISTORY_LEN = 500       # per-span durations kept per process, for the panel's percentiles
+SESSION_TRACES = 10     # recent reruns kept per session
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {"severity": record.levelname, "message": record.getMessage()}
+        payload.update(getattr(record, "fields", {}))
+        return json.dumps(payload, default=str)
+
+
+def configure_logging() -> None:
+    """Idempotent: attach the JSON stdout handler once per process."""
+    if any(getattr(h, "_sunny_json", False) for h in log.handlers):
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(_JsonFormatter())
+    handler._sunny_json = True
+    log.addHandler(handler)
+    log.setLevel(os.environ.get("TIMING_LOG_LEVEL", "INFO"))
+    log.propagate = False
+
+
+# -----------------------------
+# Traces (one per script or fragment run)
+# -----------------------------
+@dataclass
+class Trace:
+    kind: str
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+    started: float = field(default_factory=time.perf_counter)
+    spans: list[tuple[str, float]] = field(default_factory=list)
+    counters: dict[str, int] = field(default_factory=dict)
+    total_ms: float | None = None
+
+
+_current: ContextVar[Trace | None] = ContextVar("sunny_trace", default=None)
+_first_run_logged = False
+_history: dict[str, deque] = defaultdict(lambda: deque(maxlen=HISTORY_LEN))
+_history_lock = threading.Lock()
+
+
+def _remember(name: str, ms: float) -> None:
+    with _history_lock:
+        _history[name].append(ms)
+
+
+@contextmanager
+def span(name: str):
+    """Time a block; recorded on the current run's trace (if any) and in process history."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - t0) * 1e3
+        trace = _current.get()
+        if trace is not None:
+            trace.spans.append((name, ms))
+        _remember(name, ms)
+
+
+def timed(name: str):
+    """Decorator form of `span`."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def count(name: str, value: int) -> None:
+    """Record a size (e.g. payload bytes) on the current run."""
+    trace = _current.get()
+    if trace is not None:
+        trace.counters[name] = int(value)
+
+
+def process_age_ms() -> float | None:
+    """Milliseconds since this process started (Linux /proc), e.g. for cold-start time."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return (uptime - start_ticks / os.sysconf("SC_CLK_TCK")) * 1e3
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def begin_run(kind: str = "script") -> Trace:
+    trace = Trace(kind)
+    _current.set(trace)
+    return trace
+
+
+def end_run(**fields) -> Trace | None:
+    """Close the current trace, emit its log line and keep it for this session's panel."""
+    trace = _current.get()
+    if trace is None or trace.total_ms is not None:
+        return trace
+    trace.total_ms = (time.perf_counter() - trace.started) * 1e3
+    _remember(f"{trace.kind}_total", trace.total_ms)
+
+    flat = defaultdict(float)
+    for name, ms in trace.spans:
+        flat[f"{name}_ms"] += ms
+    global _first_run_logged
+    if not _first_run_logged:
+        # first completed run in this process: server start -> first page fully rendered
+        _first_run_logged = True
+        age = process_age_ms()
+        if age is not None:
+            fields["cold_start_ms"] = round(age, 1)
+    log.info("rerun", extra={"fields": {
+        "kind": trace.kind, "run_id": trace.run_id, "total_ms": round(trace.total_ms, 2),
+        **{k: round(v, 2) for k, v in flat.items()}, **trace.counters, **fields}})
+
+    try:
+        traces = st.session_state.setdefault("_diag_traces", deque(maxlen=SESSION_TRACES))
+        traces.append(trace)
+    except Exception:  # outside a script run (bench, bare mode)
+        pass
+    return trace
+
+
+def traced_run(kind: str):
+    """
+    Decorator for fragments: a fragment-only rerun gets its own trace; when the
+    fragment runs as part of a full script run it just adds spans to that trace.
+    """
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            outer = _current.get()
+            if outer is not None and outer.total_ms is None:
+                with span(kind):
+                    return fn(*args, **kwargs)
+            begin_run(kind)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                end_run()
+        return inner
+    return wrap
+
+
+# -----------------------------
+# Panel
+# -----------------------------
+def enabled() -> bool:
+    return st.query_params.get(QUERY_PARAM) not in (None, "", "0", "false")
+
+
+def percentiles() -> dict[str, dict[str, float]]:
+    with _history_lock:
+        items = {k: np.asarray(v) for k, v in _history.items() if v}
+    return {k: {"n": len(v), "p50": float(np.percentile(v, 50)), "p95": float(np.percentile(v, 95)),
+                "p99": float(np.percentile(v, 99))} for k, v in sorted(items.items())}
+
+
+def render_panel() -> None:
+    """Timing breakdown of this session's recent reruns plus process-wide percentiles."""
+    with st.expander("Diagnostics", expanded=True):
+        traces = list(st.session_state.get("_diag_traces", []))
+        current = _current.get()
+        if current is not None and current.total_ms is None:
+            traces.append(current)
+        rows = []
+        for t in reversed(traces):
+            total = f"{t.total_ms:.1f}" if t.total_ms is not None else "(running)"
+            for name, ms in t.spans:
+                rows.append({"run": t.run_id, "kind": t.kind, "name": name, "ms": round(ms, 2),
+                             "bytes": None, "run_total_ms": total})
+            for name, value in t.counters.items():
+                rows.append({"run": t.run_id, "kind": t.kind, "name": name, "ms": None,
+                             "bytes": value, "run_total_ms": total})
+        st.caption("Recent reruns (this session)")
+        st.dataframe(rows, hide_index=True, width="stretch")
+        st.caption("Process-wide, last %d samples per span (ms)" % HISTORY_LEN)
+        st.dataframe([{"span": k, **{m: round(v, 2) if m != "n" else v for m, v in p.items()}}
+                      for k, p in percentiles().items()], hide_index=True, width="stretch")
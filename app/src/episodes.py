@@ -0,0 +1,121 @@
+# src/episodes.py
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from src.diagnostics import timed
+from src.partitions import CellKey, PartitionedDataset
+
+# SHOW is the raw show id; datasets without it fall back to the display label
+EPISODE_KEY_COLS = ("SHOW", "SEASON", "EPISODE")
+FALLBACK_SHOW_COL = "SHOW_LABEL"
+
+
+@dataclass(frozen=True)
+class EpisodeIndex:
+    """
+    Join index from episode (SHOW, SEASON, EPISODE) to its row in every cell.
+
+    `positions[e, c]` is the row (into `parts.frame`) of episode `e` in `cells[c]`,
+    or -1 when the episode is missing there. Following one episode across cells,
+    or all episodes across the disruptions of a subset, is then a single
+    fancy-index gather instead of a per-episode filter.
+    """
+
+    keys: pd.DataFrame          # one row per episode: key columns (+ SHOW_LABEL)
+    positions: np.ndarray       # (n_episodes, n_cells), read-only
+    row_episode: np.ndarray     # (n_rows,) episode id of every frame row, read-only
+    labels: tuple[str, ...]     # "<show> S01E02" per episode, for pickers and hover text
+    cells: tuple[CellKey, ...]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def label(self, episode: int) -> str:
+        return self.labels[episode]
+
+    def cell_columns(self, cells: list[CellKey]) -> np.ndarray:
+        where = {c: i for i, c in enumerate(self.cells)}
+        return np.array([where[c] for c in cells], dtype=np.intp)
+
+    def rows(self, episode: int, cells: list[CellKey]) -> np.ndarray:
+        """Rows of one episode in `cells` (-1 where missing)."""
+        return self.positions[episode, self.cell_columns(cells)]
+
+    def complete(self, cells: list[CellKey]) -> tuple[np.ndarray, np.ndarray]:
+        """(episode ids, (n, len(cells)) rows) for episodes present in every one of `cells`."""
+        pos = self.positions[:, self.cell_columns(cells)]
+        keep = np.flatnonzero((pos >= 0).all(axis=1))
+        return keep, pos[keep]
+
+    def episode_of(self, row: int) -> int:
+        """Episode id of a frame row."""
+        return int(self.row_episode[row])
+
+    @cached_property
+    def _folded_labels(self) -> pd.Series:
+        return pd.Series(self.labels, dtype=object).str.casefold()
+
+    def search(self, query: str, limit: int) -> list[int]:
+        """First `limit` episode ids whose label contains every word of `query`, ignoring case."""
+        words = query.casefold().split()
+        if not words:
+            return []
+        hit = np.ones(len(self), dtype=bool)
+        for w in words:
+            hit &= self._folded_labels.str.contains(w, regex=False).to_numpy()
+        return np.flatnonzero(hit)[:limit].tolist()
+
+
+@timed("episode_index")
+def build_episode_index(parts: PartitionedDataset) -> EpisodeIndex:
+    frame = parts.frame
+    key_cols = [c for c in EPISODE_KEY_COLS if c in frame.columns]
+    if "SHOW" not in key_cols:
+        key_cols.insert(0, FALLBACK_SHOW_COL)
+
+    # one int64 key per row from per-column factor codes (mixed radix)
+    key = np.zeros(len(frame), dtype=np.int64)
+    for c in key_cols:
+        codes, uniques = pd.factorize(frame[c], use_na_sentinel=False)
+        key = key * (len(uniques) + 1) + codes
+    _, first_rows, episode_of_row = np.unique(key, return_index=True, return_inverse=True)
+
+    cells = tuple(parts.cells)
+    cell_of_row = np.repeat(np.arange(len(cells)), [parts.cell_size(*c) for c in cells])
+    dtype = np.int32 if len(frame) < np.iinfo(np.int32).max else np.int64
+    positions = np.full((len(first_rows), len(cells)), -1, dtype=dtype)
+    # an episode repeated within one cell keeps its last row
+    positions[episode_of_row, cell_of_row] = np.arange(len(frame), dtype=dtype)
+    positions.flags.writeable = False
+    episode_of_row = episode_of_row.astype(dtype)
+    episode_of_row.flags.writeable = False
+
+    keep_cols = key_cols + ([FALLBACK_SHOW_COL] if FALLBACK_SHOW_COL in frame.columns
+                            and FALLBACK_SHOW_COL not in key_cols else [])
+    keys = frame[keep_cols].iloc[first_rows].reset_index(drop=True)
+    return EpisodeIndex(keys=keys, positions=positions, row_episode=episode_of_row,
+                        labels=_episode_labels(keys), cells=cells)
+
+
+def _episode_labels(keys: pd.DataFrame) -> tuple[str, ...]:
+    show_col = FALLBACK_SHOW_COL if FALLBACK_SHOW_COL in keys.columns else keys.columns[0]
+    show = keys[show_col].astype(str)
+    if not {"SEASON", "EPISODE"} <= set(keys.columns):
+        return tuple(show + " #" + pd.Series(range(len(keys))).astype(str))
+    season = pd.to_numeric(keys["SEASON"], errors="coerce")
+    episode = pd.to_numeric(keys["EPISODE"], errors="coerce")
+    sxe = ("S" + season.fillna(-1).astype(int).astype(str).str.zfill(2)
+           + "E" + episode.fillna(-1).astype(int).astype(str).str.zfill(2))
+    return tuple(show + " " + sxe.where(season.notna() & episode.notna(), "#" + keys.index.astype(str)))
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def episode_index(data_version: str, _parts: PartitionedDataset) -> EpisodeIndex:
+    """Shared join index, built once per dataset version."""
+    return build_episode_index(_parts)
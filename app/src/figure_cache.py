@@ -0,0 +1,169 @@
+# src/figure_cache.py
+from __future__ import annotations
+
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import plotly.graph_objects as go
+import plotly.io as pio
+import streamlit as st
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class FigureCache:
+    """
+    Process-wide LRU of built Plotly figures, bounded by serialized size.
+
+    Entries are the Figure objects themselves (rebuilding a Figure from JSON costs
+    more than building it from arrays), sized by their JSON length, which is also
+    what st.plotly_chart ships to the browser. Cached figures are shared between
+    sessions: never mutate one after `put`.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, max_workers: int = 2):
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        self._entries: OrderedDict[Hashable, tuple[go.Figure, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: dict[Hashable, Future] = {}
+        self._executor: ThreadPoolExecutor | None = None
+        # prewarmed group -> its figure keys still cached or in flight; a group is
+        # forgotten once all of them are evicted, so the map stays as small as the LRU
+        self._prewarmed: dict[Hashable, set[Hashable]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+
+    # -----------------------------
+    # LRU core
+    # -----------------------------
+    def get(self, key: Hashable) -> go.Figure | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, fig: go.Figure) -> int:
+        nbytes = len(pio.to_json(fig, validate=False))
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            if nbytes > self.max_bytes:
+                self._forget(key)
+                return nbytes  # would evict everything else; serve it uncached
+            self._entries[key] = (fig, nbytes)
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes and self._entries:
+                evicted_key, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+                self._forget(evicted_key)
+        return nbytes
+
+    def _forget(self, key: Hashable) -> None:
+        # caller holds the lock; drop prewarm groups with nothing left to show for them
+        for group in [g for g, keys in self._prewarmed.items() if key in keys]:
+            keys = self._prewarmed[group]
+            keys.discard(key)
+            if not keys:
+                del self._prewarmed[group]
+
+    def entry_bytes(self, key: Hashable) -> int | None:
+        """Serialized (websocket payload) size of a cached figure."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[1] if entry is not None else None
+
+    def get_or_build(self, key: Hashable, build: Callable[[], go.Figure]) -> go.Figure:
+        fig = self.get(key)
+        if fig is not None:
+            return fig
+        # a prewarm job may already be building this key; wait for it instead of duplicating
+        with self._lock:
+            pending = self._inflight.get(key)
+        if pending is not None:
+            fig = pending.result()
+            if fig is not None:
+                return fig
+        fig = build()
+        self.put(key, fig)
+        return fig
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._prewarmed.clear()
+            self.bytes = 0
+
+    # -----------------------------
+    # Background prewarming
+    # -----------------------------
+    def _build_and_put(self, key: Hashable, build: Callable[[], go.Figure]) -> go.Figure | None:
+        try:
+            fig = build()
+            self.put(key, fig)
+            return fig
+        except Exception as e:  # prewarm is best effort; a click rebuilds on demand
+            log.warning("Figure prewarm failed for %s: %s", key, e)
+            with self._lock:
+                self._forget(key)
+            return None
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def prewarm(self, group: Hashable, jobs: Iterable[tuple[Hashable, Callable[[], go.Figure]]]) -> int:
+        """
+        Build `jobs` ((key, build) pairs) on a background thread pool, once per `group`
+        (e.g. dataset version + render settings). Returns the number of jobs queued.
+        """
+        with self._lock:
+            if group in self._prewarmed:
+                return 0
+            keys = self._prewarmed[group] = set()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="fig-prewarm")
+            queued = 0
+            for key, build in jobs:
+                keys.add(key)
+                if key in self._entries or key in self._inflight:
+                    continue
+                self._inflight[key] = self._executor.submit(
+                    self._build_and_put, key, build)
+                queued += 1
+            if not keys:
+                del self._prewarmed[group]
+        return queued
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "pending": len(self._inflight),
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def get_figure_cache(max_bytes: int = DEFAULT_MAX_BYTES, max_workers: int = 2) -> FigureCache:
+    """The shared cache for this process (one per distinct configuration)."""
+    return FigureCache(max_bytes=max_bytes, max_workers=max_workers)
@@ -0,0 +1,206 @@
+# src/filters.py
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from src.diagnostics import timed
+from src.partitions import CellKey, PartitionedDataset, _gather_readonly
+from src.silhouette import compute_cell_scores, needs_silhouette, use_approximate
+
+RANGE_COLS = ("SEASON", "EPISODE")
+SHOW_COL = "SHOW_LABEL"
+
+
+@dataclass(frozen=True)
+class FilterSpec:
+    """Season/episode ranges (inclusive) and a show subset; None means unfiltered."""
+    seasons: tuple[float, float] | None = None
+    episodes: tuple[float, float] | None = None
+    shows: tuple[str, ...] | None = None
+
+    @property
+    def active(self) -> bool:
+        return any(v is not None for v in (self.seasons, self.episodes, self.shows))
+
+    @property
+    def key(self) -> str:
+        """Stable text form, used in dataset versions."""
+        parts = []
+        for name, rng in (("s", self.seasons), ("e", self.episodes)):
+            if rng is not None:
+                parts.append(f"{name}{rng[0]:g}-{rng[1]:g}")
+        if self.shows is not None:
+            parts.append("shows=" + ",".join(sorted(self.shows)))
+        return ";".join(parts)
+
+    def describe(self) -> str:
+        parts = [f"{name} {rng[0]:g}–{rng[1]:g}"
+                 for name, rng in (("Seasons", self.seasons), ("Episodes", self.episodes)) if rng is not None]
+        if self.shows is not None:
+            parts.append(", ".join(self.shows))
+        return " · ".join(parts)
+
+    def ranges(self) -> dict[str, tuple[float, float]]:
+        return {c: r for c, r in zip(RANGE_COLS, (self.seasons, self.episodes)) if r is not None}
+
+
+class CellFilterIndex:
+    """
+    Per-cell filter index: a sorted copy (plus the sorting permutation) of each range
+    column, so a range is two binary searches and a slice, and one packed bitmap per
+    show. A filter is the AND of its parts' bitmaps, never a boolean scan of the
+    table's columns.
+    """
+
+    def __init__(self, ranges: dict[str, np.ndarray], show_codes: np.ndarray | None, n_shows: int):
+        self.n = len(show_codes) if show_codes is not None else len(next(iter(ranges.values()), []))
+        self._order = {c: np.argsort(v, kind="stable") for c, v in ranges.items()}
+        self._sorted = {c: v[self._order[c]] for c, v in ranges.items()}  # NaNs sort last
+        self._shows = ([np.packbits(show_codes == k) for k in range(n_shows)]
+                       if show_codes is not None else None)
+
+    def _range_bits(self, col: str, lo: float, hi: float) -> np.ndarray:
+        v = self._sorted[col]
+        a, b = np.searchsorted(v, lo, side="left"), np.searchsorted(v, hi, side="right")
+        mask = np.zeros(self.n, dtype=bool)
+        mask[self._order[col][a:b]] = True
+        return np.packbits(mask)
+
+    def bits(self, spec: FilterSpec, show_codes: list[int] | None) -> np.ndarray | None:
+        """Packed bitmap of the rows passing `spec` (None: no condition applies)."""
+        out = None
+        for col, (lo, hi) in spec.ranges().items():
+            if col in self._sorted:
+                b = self._range_bits(col, lo, hi)
+                out = b if out is None else out & b
+        if show_codes is not None and self._shows is not None:
+            b = np.zeros((self.n + 7) // 8, dtype=np.uint8)
+            for k in show_codes:
+                b |= self._shows[k]
+            out = b if out is None else out & b
+        return out
+
+    def rows(self, spec: FilterSpec, show_codes: list[int] | None) -> np.ndarray | None:
+        """Cell-relative ids (ascending) passing `spec`, or None when all rows pass."""
+        bits = self.bits(spec, show_codes)
+        return None if bits is None else np.flatnonzero(np.unpackbits(bits, count=self.n))
+
+
+@dataclass(frozen=True)
+class FilterIndex:
+    cells: dict[CellKey, CellFilterIndex]
+    shows: tuple[str, ...]                               # SHOW_LABEL categories (code order)
+    bounds: dict[str, tuple[float, float]]               # min/max of each range column
+
+    def show_codes(self, shows: tuple[str, ...] | None) -> list[int] | None:
+        if shows is None:
+            return None
+        where = {s: i for i, s in enumerate(self.shows)}
+        return [where[s] for s in shows if s in where]
+
+
+@timed("filter_index")
+def build_filter_index(parts: PartitionedDataset) -> FilterIndex:
+    frame = parts.frame
+    range_cols = [c for c in RANGE_COLS if c in frame.columns]
+    values = {c: frame[c].to_numpy() for c in range_cols}
+    show = frame[SHOW_COL] if SHOW_COL in frame.columns else None
+    codes = show.cat.codes.to_numpy() if show is not None else None
+    n_shows = len(show.cat.categories) if show is not None else 0
+
+    cells = {}
+    for cell in parts.cells:
+        start, stop = parts.cell_range(*cell)
+        cells[cell] = CellFilterIndex({c: v[start:stop] for c, v in values.items()},
+                                      codes[start:stop] if codes is not None else None, n_shows)
+    bounds = {}
+    for c, v in values.items():
+        finite = v[np.isfinite(v)] if np.issubdtype(v.dtype, np.floating) else v
+        if len(finite):
+            bounds[c] = (float(finite.min()), float(finite.max()))
+    return FilterIndex(cells=cells, shows=tuple(str(s) for s in show.cat.categories) if show is not None else (),
+                       bounds=bounds)
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def filter_index(data_version: str, _parts: PartitionedDataset) -> FilterIndex:
+    """Shared filter index, built once per dataset version."""
+    return build_filter_index(_parts)
+
+
+@timed("apply_filter")
+def apply_filter(parts: PartitionedDataset, index: FilterIndex, spec: FilterSpec) -> tuple[PartitionedDataset, list[CellKey]]:
+    """
+    (`parts` restricted to the rows passing `spec`, cells whose rows changed). The
+    result is partitioned like `parts` (one gather of the kept rows); unchanged cells
+    keep their cell versions, so their cached figures and indexes are reused. Kept
+    rows stay in order, so placed rows (`parts.placed`) are still each cell's last.
+    """
+    show_codes = index.show_codes(spec.shows)
+    version = f"{parts.version}|{spec.key}"
+    keep, changed, offsets, cell_versions, placed = [], [], {}, {}, {}
+    n = 0
+    for cell in parts.cells:
+        start, stop = parts.cell_range(*cell)
+        ids = index.cells[cell].rows(spec, show_codes)
+        n_placed = parts.placed.get(cell, 0)
+        if ids is None or len(ids) == stop - start:
+            keep.append(np.arange(start, stop))
+            cell_versions[cell] = parts.cell_version(*cell)
+        else:
+            keep.append(start + ids)
+            changed.append(cell)
+            cell_versions[cell] = version
+            # kept ids ascend, so the placed ones are those past the cell's unplaced rows
+            n_placed = len(ids) - int(np.searchsorted(ids, stop - start - n_placed))
+        if n_placed:
+            placed[cell] = n_placed
+        offsets[cell] = (n, n + len(keep[-1]))
+        n += len(keep[-1])
+    rows = np.concatenate(keep) if keep else np.empty(0, dtype=np.intp)
+    frame = pd.DataFrame({c: _gather_readonly(parts.frame[c], rows) for c in parts.frame.columns}, copy=False)
+    return replace(parts, frame=frame, offsets=offsets, version=version, cell_versions=cell_versions,
+                   placed=placed), changed
+
+
+def rescore_filtered(filtered: PartitionedDataset, changed: list[CellKey], *, mode: str = "auto",
+                     max_workers: int | None = None) -> PartitionedDataset:
+    """
+    `filtered` with SIL_SCORE made consistent for the `changed` cells, by the engine
+    that scored the rest of the dataset (as in refresh.rescore_appended):
+
+    - scored in-app (sil_source "app"): the changed cells are re-scored exactly, or,
+      when `mode` calls for estimates (use_approximate), the column is cleared so the
+      app's refiner estimates the filtered dataset like any unscored load.
+    - scored by the pipeline ("file"): the in-app engine computes a different metric,
+      so scores are kept and the changed cells are marked stale.
+    - not scored yet: left to the app's silhouette fill / sampled estimates.
+    """
+    if not changed or "SIL_SCORE" not in filtered.frame.columns or needs_silhouette(filtered):
+        return filtered
+    if filtered.sil_source != "app":
+        return replace(filtered, stale_cells=filtered.stale_cells | frozenset(changed))
+    if use_approximate(filtered, mode):
+        col = np.full(len(filtered), np.nan, dtype=np.float32)
+    else:
+        scores = compute_cell_scores(filtered, max_workers=max_workers, cells=changed)
+        col = filtered.frame["SIL_SCORE"].to_numpy().astype(np.float32)
+        for cell in changed:
+            start, stop = filtered.cell_range(*cell)
+            col[start:stop] = scores.get(cell, np.nan)
+    col.flags.writeable = False
+    cols = {c: filtered.frame[c] for c in filtered.frame.columns}
+    cols["SIL_SCORE"] = pd.Series(col, copy=False)
+    return replace(filtered, frame=pd.DataFrame(cols, copy=False))
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def filtered_dataset(data_version: str, spec: FilterSpec, _parts: PartitionedDataset,
+                     max_workers: int | None = None, mode: str = "auto") -> PartitionedDataset:
+    """Shared filtered dataset per (dataset version, filter, silhouette mode); see rescore_filtered."""
+    filtered, changed = apply_filter(_parts, filter_index(data_version, _parts), spec)
+    return rescore_filtered(filtered, changed, mode=mode, max_workers=max_workers)
@@ -0,0 +1,155 @@
+# src/partitions.py
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from src.diagnostics import timed
+
+CellKey = tuple[str, str]  # (subset_key, disruption_key)
+
+
+@dataclass(frozen=True)
+class PartitionedDataset:
+    """
+    Rows filtered to the known (SUBSET, DISRUPTION) cells and sorted by
+    (subset_order, disruption_order), plus a [start, stop) row range per cell.
+
+    Selecting a cell is a positional slice of `frame` (a view, no copy), so the
+    cost doesn't depend on the total row count. Every column of `frame` is backed by
+    a read-only array (categorical codes for labels), so one instance can be shared
+    by all sessions; in-place writes raise instead of leaking between viewers.
+    """
+
+    frame: pd.DataFrame
+    offsets: dict[CellKey, tuple[int, int]]
+    subset_order: tuple[str, ...]
+    disruption_order: tuple[str, ...]
+    version: str = ""
+    # per-cell versions after an incremental append (src/refresh.py); cells missing
+    # here changed with the dataset as a whole
+    cell_versions: dict[CellKey, str] = field(default_factory=dict)
+    # where SIL_SCORE came from: "file" (the pipeline's own scores) or "app" (the in-app
+    # 2-D silhouette, src/silhouette.py). They are different metrics, so a dataset's
+    # cells are only ever (re)scored by the engine that scored the rest.
+    sil_source: str = "file"
+    # cells whose file SIL_SCORE predates rows added since (the app can't redo those)
+    stale_cells: frozenset[CellKey] = frozenset()
+    # rows placed out-of-sample (src/placement.py) per cell: always the cell's last rows,
+    # so the count is relative to whichever dataset is being shown, never a frame offset
+    placed: dict[CellKey, int] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @property
+    def cells(self) -> list[CellKey]:
+        return list(self.offsets)
+
+    def cell_version(self, subset_key: str, disruption_key: str) -> str:
+        """Version of one cell's rows: unchanged by appends that only touched other cells."""
+        return self.cell_versions.get((subset_key, disruption_key), self.version)
+
+    def cell_range(self, subset_key: str, disruption_key: str) -> tuple[int, int]:
+        return self.offsets.get((subset_key, disruption_key), (0, 0))
+
+    def cell_size(self, subset_key: str, disruption_key: str) -> int:
+        start, stop = self.cell_range(subset_key, disruption_key)
+        return stop - start
+
+    def cell(self, subset_key: str, disruption_key: str) -> pd.DataFrame:
+        start, stop = self.cell_range(subset_key, disruption_key)
+        return self.frame.iloc[start:stop]
+
+    def placed_rows(self, subset_key: str, disruption_key: str) -> pd.DataFrame:
+        """The cell's out-of-sample placed rows (see `placed`)."""
+        start, stop = self.cell_range(subset_key, disruption_key)
+        return self.frame.iloc[stop - self.placed.get((subset_key, disruption_key), 0):stop]
+
+    @property
+    def nbytes(self) -> int:
+        return frame_nbytes(self.frame)
+
+    def cell_frame(self, col: str = "SIL_SCORE") -> pd.DataFrame:
+        """
+        One row per non-empty cell: SUBSET, DISRUPTION and `col` taken from the cell's
+        first row (for per-cell values such as SIL_SCORE). A pivot over this is O(cells).
+        """
+        cells = [c for c in self.cells if self.cell_size(*c) > 0]
+        firsts = np.array([self.offsets[c][0] for c in cells], dtype=np.intp)
+        return pd.DataFrame({
+            "SUBSET": pd.Categorical([c[0] for c in cells], categories=self.subset_order),
+            "DISRUPTION": pd.Categorical([c[1] for c in cells], categories=self.disruption_order),
+            col: self.frame[col].to_numpy()[firsts],
+        })
+
+    def cell_arrays(self, subset_key: str, disruption_key: str, cols: list[str]) -> dict[str, np.ndarray]:
+        """Contiguous NumPy views of `cols` for one cell."""
+        start, stop = self.cell_range(subset_key, disruption_key)
+        return {c: self.frame[c].to_numpy()[start:stop] for c in cols}
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    """Bytes held by `df`'s columns (categorical categories included)."""
+    return int(df.memory_usage(index=False, deep=True).sum())
+
+
+def _readonly(a: np.ndarray) -> np.ndarray:
+    a.flags.writeable = False
+    return a
+
+
+def _gather_readonly(s: pd.Series, rows: np.ndarray) -> pd.Series:
+    # one fresh array per column (not a consolidated block), so the flag sticks
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes = _readonly(s.cat.codes.to_numpy()[rows])
+        return pd.Series(pd.Categorical.from_codes(codes, dtype=s.dtype), name=s.name, copy=False)
+    return pd.Series(_readonly(s.to_numpy()[rows]), name=s.name, copy=False)
+
+
+def _codes(s: pd.Series, order: tuple[str, ...]) -> np.ndarray:
+    # -1 for anything not in `order`
+    return pd.Categorical(s, categories=list(order)).codes.astype(np.int32)
+
+
+@timed("partition")
+def build_partitions(
+    df: pd.DataFrame,
+    subset_order: tuple[str, ...],
+    disruption_order: tuple[str, ...],
+    *,
+    version: str = "",
+) -> PartitionedDataset:
+    """One pass: drop unknown cells, coerce SIL_SCORE, sort by cell, record offsets."""
+    if "SIL_SCORE" in df.columns and not pd.api.types.is_float_dtype(df["SIL_SCORE"]):
+        df = df.assign(SIL_SCORE=pd.to_numeric(df["SIL_SCORE"], errors="coerce"))
+
+    s_codes = _codes(df["SUBSET"], subset_order)
+    d_codes = _codes(df["DISRUPTION"], disruption_order)
+
+    keep = (s_codes >= 0) & (d_codes >= 0)
+    cell_id = s_codes[keep] * len(disruption_order) + d_codes[keep]
+    order = np.argsort(cell_id, kind="stable")  # stable => original row order within a cell
+
+    rows = np.flatnonzero(keep)[order]
+    frame = pd.DataFrame({c: _gather_readonly(df[c], rows) for c in df.columns}, copy=False)
+
+    counts = np.bincount(cell_id, minlength=len(subset_order) * len(disruption_order))
+    ends = np.cumsum(counts)
+    starts = ends - counts
+
+    offsets = {}
+    for i, s in enumerate(subset_order):
+        for j, d in enumerate(disruption_order):
+            k = i * len(disruption_order) + j
+            offsets[(s, d)] = (int(starts[k]), int(ends[k]))
+
+    return PartitionedDataset(
+        frame=frame,
+        offsets=offsets,
+        subset_order=tuple(subset_order),
+        disruption_order=tuple(disruption_order),
+        version=version,
+    )
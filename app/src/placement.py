@@ -0,0 +1,172 @@
+# src/placement.py
+"""
+Out-of-sample placement: new episodes (or a new show) with high-dimensional
+embeddings are dropped into an existing cell's UMAP1/UMAP2 layout by k-nearest-
+neighbour interpolation against the cell's stored points, without rerunning the
+projection.
+
+The dataset must carry the embedding columns (EMB_0, EMB_1, ...; see
+data_io.EMBEDDING_PREFIX) for its stored points; the upload needs SUBSET,
+DISRUPTION, SHOW_LABEL and the same embedding columns.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from src.data_io import EMBEDDING_PREFIX, IngestError, embedding_columns, ingest_upload
+from src.diagnostics import timed
+from src.partitions import CellKey, PartitionedDataset, _codes
+from src.refresh import append_rows, rescore_appended
+from src.silhouette import BLOCK_ELEMS
+
+# UMAP's own transform() interpolates from its n_neighbors (default 15)
+DEFAULT_K = 15
+METRICS = ("euclidean", "cosine")
+PLACEMENT_REQUIRED_COLS = ("DISRUPTION", "SHOW_LABEL", "SUBSET")
+
+
+class EmbeddingIndex:
+    """
+    Exact kNN over one cell's embedding vectors: vectorized brute force, a block of
+    queries at a time (|q|^2 + |p|^2 - 2 q.p with one matmul per block), so scratch
+    memory is bounded by BLOCK_ELEMS. 'cosine' normalizes vectors up front, after
+    which euclidean order is cosine order.
+    """
+
+    def __init__(self, vectors: np.ndarray, *, metric: str = "euclidean"):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}; expected one of {METRICS}")
+        self.metric = metric
+        self.vectors = self._prepare(vectors)
+        self.sq = np.einsum("ij,ij->i", self.vectors, self.vectors)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def _prepare(self, v: np.ndarray) -> np.ndarray:
+        v = np.ascontiguousarray(v, dtype=np.float32)
+        if self.metric == "cosine":
+            v = v / np.maximum(np.linalg.norm(v, axis=1, keepdims=True), np.finfo(np.float32).tiny)
+        return v
+
+    def knn(self, queries: np.ndarray, k: int, block_rows: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """(ids, distances), each (len(queries), k), nearest first."""
+        q = self._prepare(np.atleast_2d(queries))
+        k = min(int(k), len(self))
+        ids = np.empty((len(q), k), dtype=np.int64)
+        dist = np.empty((len(q), k), dtype=np.float32)
+        if k <= 0:
+            return ids, dist
+        block_rows = block_rows or max(1, BLOCK_ELEMS // max(len(self), 1))
+        q_sq = np.einsum("ij,ij->i", q, q)
+        for start in range(0, len(q), block_rows):
+            stop = min(start + block_rows, len(q))
+            d2 = q[start:stop] @ self.vectors.T
+            d2 *= -2.0
+            d2 += self.sq[None, :]
+            d2 += q_sq[start:stop, None]
+            np.maximum(d2, 0.0, out=d2)
+            part = np.argpartition(d2, k - 1, axis=1)[:, :k] if k < len(self) else \
+                np.broadcast_to(np.arange(k), (stop - start, k))
+            part_d2 = np.take_along_axis(d2, part, axis=1)
+            order = np.argsort(part_d2, axis=1, kind="stable")
+            ids[start:stop] = np.take_along_axis(part, order, axis=1)
+            dist[start:stop] = np.sqrt(np.take_along_axis(part_d2, order, axis=1))
+        return ids, dist
+
+
+@timed("embedding_index")
+def build_embedding_index(parts: PartitionedDataset, subset_key: str, disruption_key: str,
+                          cols: tuple[str, ...], metric: str = "euclidean") -> EmbeddingIndex:
+    arrs = parts.cell_arrays(subset_key, disruption_key, list(cols))
+    return EmbeddingIndex(np.column_stack([arrs[c] for c in cols]), metric=metric)
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def embedding_index(cell_version: str, subset_key: str, disruption_key: str, cols: tuple[str, ...],
+                    metric: str, _parts: PartitionedDataset) -> EmbeddingIndex:
+    """Neighbour index for one cell, built once per (cell version, columns, metric) and shared."""
+    return build_embedding_index(_parts, subset_key, disruption_key, cols, metric)
+
+
+def interpolate(ids: np.ndarray, dist: np.ndarray, x: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Inverse-distance weighted mean of the neighbours' coordinates (an exact match lands on it)."""
+    w = 1.0 / np.maximum(dist.astype(np.float64), np.finfo(np.float32).eps)
+    w /= w.sum(axis=1, keepdims=True)
+    return (w * x[ids]).sum(axis=1), (w * y[ids]).sum(axis=1)
+
+
+# -----------------------------
+# Placing an upload into a dataset
+# -----------------------------
+@dataclass(frozen=True)
+class Placement:
+    parts: PartitionedDataset   # the dataset with the placed rows appended to their cells
+    placed: dict[CellKey, int]  # rows placed per cell (`parts.placed`; the last rows of each cell)
+    skipped: int                # rows that couldn't be placed (empty cell, missing embedding)
+
+
+@timed("place_rows")
+def place_rows(parts: PartitionedDataset, new_df: pd.DataFrame, *, k: int = DEFAULT_K,
+               metric: str = "euclidean") -> tuple[pd.DataFrame, int]:
+    """
+    (`new_df` rows with UMAP1/UMAP2 interpolated from their k nearest stored points
+    in the same cell, number of rows skipped: unknown or empty cell, or a non-finite embedding).
+    Columns the dataset doesn't have are dropped.
+    """
+    cols = tuple(embedding_columns(parts.frame.columns))
+    if not cols:
+        raise IngestError(f"This dataset has no embedding columns ({EMBEDDING_PREFIX}*) to place episodes against.")
+    missing = set(cols) - set(new_df.columns)
+    if missing:
+        raise IngestError(f"Upload is missing embedding columns: {sorted(missing)[:5]}"
+                          + (f" and {len(missing) - 5} more" if len(missing) > 5 else ""))
+    nd = len(parts.disruption_order)
+    s_codes = _codes(new_df["SUBSET"], parts.subset_order)
+    d_codes = _codes(new_df["DISRUPTION"], parts.disruption_order)
+    queries = np.column_stack([new_df[c].to_numpy(dtype=np.float32) for c in cols])
+    known = (s_codes >= 0) & (d_codes >= 0) & np.isfinite(queries).all(axis=1)
+    cell_of = np.where(known, s_codes * nd + d_codes, -1)
+    ux, uy = np.full(len(new_df), np.nan, dtype=np.float32), np.full(len(new_df), np.nan, dtype=np.float32)
+    keep = np.zeros(len(new_df), dtype=bool)
+    for cell_id in np.unique(cell_of[cell_of >= 0]):
+        s, d = parts.subset_order[cell_id // nd], parts.disruption_order[cell_id % nd]
+        if parts.cell_size(s, d) == 0:
+            continue
+        rows = np.flatnonzero(cell_of == cell_id)
+        index = embedding_index(parts.cell_version(s, d), s, d, cols, metric, parts)
+        ids, dist = index.knn(queries[rows], k)
+        arrs = parts.cell_arrays(s, d, ["UMAP1", "UMAP2"])
+        ux[rows], uy[rows] = interpolate(ids, dist, arrs["UMAP1"], arrs["UMAP2"])
+        keep[rows] = True
+
+    # the file's SIL_SCORE belongs to the stored layout; placed cells are re-scored.
+    # Columns the dataset doesn't have (notes, extra metadata) have nowhere to go.
+    schema = [c for c in new_df.columns if c in parts.frame.columns and c != "SIL_SCORE"]
+    placed = new_df[schema].assign(UMAP1=ux, UMAP2=uy)[keep]
+    return placed.reset_index(drop=True), int((~keep).sum())
+
+
+def place_into(parts: PartitionedDataset, new_df: pd.DataFrame, version: str, *, k: int = DEFAULT_K,
+               metric: str = "euclidean") -> Placement:
+    """`parts` plus `new_df` placed into their cells, re-scored as in refresh.rescore_appended."""
+    placed_df, skipped = place_rows(parts, new_df, k=k, metric=metric)
+    merged, affected = append_rows(parts, placed_df, version)
+    new_counts = {c: merged.cell_size(*c) - parts.cell_size(*c) for c in affected}
+    if affected and "SIL_SCORE" in merged.frame.columns:
+        merged = rescore_appended(parts, merged, affected, {})
+    return Placement(parts=replace(merged, placed=new_counts), placed=new_counts, skipped=skipped)
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def placed_dataset(version: str, upload_key: str, _parts: PartitionedDataset, _uploaded_file,
+                   k: int = DEFAULT_K, metric: str = "euclidean") -> Placement:
+    """Shared placement of one upload into one dataset version (new version: `<version>+placed:<upload>`)."""
+    cols = embedding_columns(_parts.frame.columns)
+    new_df = ingest_upload(_uploaded_file, set(PLACEMENT_REQUIRED_COLS) | set(cols),
+                           list(_parts.subset_order), list(_parts.disruption_order))
+    return place_into(_parts, new_df, f"{version}+placed:{upload_key}", k=k, metric=metric)
@@ -0,0 +1,274 @@
+# src/refresh.py
+"""
+Incremental refresh for data files that only grow (a pipeline appending rows).
+
+After a full load, `track` remembers how many bytes of the file it covered plus
+the header line and the bytes just before that offset. When the file's (mtime,
+size) changes and those still match, `refresh_appended` parses only the new byte
+range, merges the rows into the existing partitions and re-scores only the cells
+that received rows; anything else (truncation, rewritten header or tail, changed
+columns) returns None and the caller does a full load.
+"""
+from __future__ import annotations
+
+import io
+import logging
+import threading
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+import pandas as pd
+
+from src.catalog import CatalogEntry
+from src.data_io import as_category, compact_dtypes, file_signature, path_sep
+from src.diagnostics import span, timed
+from src.partitions import CellKey, PartitionedDataset, _readonly, build_partitions
+from src.silhouette import IncrementalSilhouette, needs_silhouette
+
+log = logging.getLogger(__name__)
+
+# bytes just before the covered offset that must be unchanged for an append to be trusted
+TAIL_CHECK_BYTES = 4096
+
+
+@dataclass
+class TailState:
+    """What the in-memory dataset for `path` was built from."""
+    path: str
+    version: str                # catalog key of the dataset covering bytes [0, offset)
+    offset: int
+    header: bytes
+    tail: bytes                 # bytes [offset - TAIL_CHECK_BYTES, offset)
+    sil: dict[CellKey, IncrementalSilhouette] = field(default_factory=dict)
+    appends: int = 0
+    # held for a whole refresh of this file; `_lock` only guards the `_tails` dict, so
+    # re-scoring one file never blocks refreshes of another
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+
+_tails: dict[str, TailState] = {}
+_lock = threading.Lock()
+
+
+def _read_tail_window(f, offset: int) -> bytes:
+    start = max(0, offset - TAIL_CHECK_BYTES)
+    f.seek(start)
+    return f.read(offset - start)
+
+
+def track(entry: CatalogEntry) -> None:
+    """Record the file behind a freshly (fully) loaded dataset for later appends."""
+    try:
+        with open(entry.path, "rb") as f:
+            header = f.readline()
+            tail = _read_tail_window(f, entry.size)
+        if file_signature(entry.path) != (entry.mtime_ns, entry.size):
+            raise OSError("file changed while loading")
+    except OSError as e:
+        log.info("Not tracking %s for appends: %s", entry.path, e)
+        with _lock:
+            _tails.pop(entry.path, None)
+        return
+    if not header.endswith(b"\n") or not tail.endswith(b"\n"):
+        # a partial last line may have been parsed as a row; appends can't continue it
+        with _lock:
+            _tails.pop(entry.path, None)
+        return
+    with _lock:
+        _tails[entry.path] = TailState(entry.path, entry.key, entry.size, header, tail)
+
+
+def tail_state(path: str) -> TailState | None:
+    with _lock:
+        return _tails.get(path)
+
+
+def read_appended(state: TailState, entry: CatalogEntry) -> tuple[pd.DataFrame, bytes] | None:
+    """
+    (rows appended after `state.offset`, the bytes they were parsed from) up to
+    `entry.size`, or None if the file was not just appended to. A trailing partial
+    line is left for next time.
+    """
+    if entry.size < state.offset:
+        return None
+    with open(entry.path, "rb") as f:
+        if f.read(len(state.header)) != state.header or _read_tail_window(f, state.offset) != state.tail:
+            return None
+        f.seek(state.offset)
+        chunk = f.read(entry.size - state.offset)
+    chunk = chunk[:chunk.rfind(b"\n") + 1]
+    if not chunk:
+        return pd.DataFrame(), chunk
+    with span("parse_tail"):
+        df = pd.read_csv(io.BytesIO(state.header + chunk), sep=path_sep(entry.path))
+    return compact_dtypes(df), chunk
+
+
+# -----------------------------
+# Merge
+# -----------------------------
+def _codes_dtype(n_categories: int) -> np.dtype:
+    for dt in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dt).max:
+            return np.dtype(dt)
+    return np.dtype(np.int64)
+
+
+def _merge_column(old: pd.Series, new: pd.Series, at: np.ndarray) -> pd.Series:
+    # `new` rows inserted before positions `at` of `old`; existing categorical codes keep
+    # their meaning (new categories are appended after the old ones)
+    if isinstance(old.dtype, pd.CategoricalDtype):
+        cats = old.cat.categories
+        values = new if isinstance(new.dtype, pd.CategoricalDtype) else as_category(new)
+        extra = pd.Index(values.cat.categories).difference(cats)
+        cats = cats.append(extra) if len(extra) else cats
+        dtype = pd.CategoricalDtype(cats, ordered=old.cat.ordered)
+        codes_dtype = _codes_dtype(len(cats))
+        new_codes = pd.Categorical(values, dtype=dtype).codes.astype(codes_dtype)
+        codes = _readonly(np.insert(old.cat.codes.to_numpy().astype(codes_dtype, copy=False), at, new_codes))
+        return pd.Series(pd.Categorical.from_codes(codes, dtype=dtype), name=old.name, copy=False)
+    dtype = np.result_type(old.dtype, new.dtype)
+    values = np.insert(old.to_numpy().astype(dtype, copy=False), at, new.to_numpy().astype(dtype, copy=False))
+    return pd.Series(_readonly(values), name=old.name, copy=False)
+
+
+@timed("append_rows")
+def append_rows(
+    parts: PartitionedDataset,
+    new_df: pd.DataFrame,
+    version: str,
+) -> tuple[PartitionedDataset, list[CellKey]]:
+    """
+    `parts` with `new_df`'s rows appended at the end of their cells, plus the cells
+    that received rows. Those cells get `version`; every other cell keeps its own
+    version, so caches keyed by cell version stay valid. Raises ValueError when
+    `new_df` has columns `parts` doesn't.
+    """
+    if new_df.empty:
+        return replace(parts, version=version, cell_versions={c: parts.cell_version(*c) for c in parts.cells}), []
+    extra = set(new_df.columns) - set(parts.frame.columns)
+    if extra:
+        raise ValueError(f"Appended rows have unknown columns: {sorted(extra)}")
+    # columns added in-app (SIL_SCORE) are absent from the file's rows
+    new_df = new_df.reindex(columns=parts.frame.columns)
+    new = build_partitions(new_df, parts.subset_order, parts.disruption_order)
+
+    cells = parts.cells
+    new_counts = np.array([new.cell_size(*c) for c in cells], dtype=np.int64)
+    old_ends = np.array([parts.offsets[c][1] for c in cells], dtype=np.int64)
+    at = np.repeat(old_ends, new_counts)  # np.insert keeps equal positions in order
+
+    frame = pd.DataFrame({c: _merge_column(parts.frame[c], new.frame[c], at) for c in parts.frame.columns},
+                         copy=False)
+    shift = np.cumsum(new_counts)
+    offsets = {c: (parts.offsets[c][0] + int(shift[i] - new_counts[i]), parts.offsets[c][1] + int(shift[i]))
+               for i, c in enumerate(cells)}
+
+    affected = [c for c, n in zip(cells, new_counts) if n]
+    cell_versions = {c: parts.cell_version(*c) for c in cells}
+    cell_versions.update({c: version for c in affected})
+    merged = replace(parts, frame=frame, offsets=offsets, version=version, cell_versions=cell_versions)
+    return merged, affected
+
+
+# -----------------------------
+# Silhouette for appended cells
+# -----------------------------
+def rescore_appended(prev: PartitionedDataset, parts: PartitionedDataset, affected: list[CellKey],
+                     sil: dict[CellKey, IncrementalSilhouette]) -> PartitionedDataset:
+    """
+    `parts` (`prev` plus rows appended at the end of the `affected` cells) with those
+    cells' SIL_SCORE redone by the engine that scored the rest of the dataset, so the
+    grid never mixes metrics:
+
+    - scored in-app (sil_source "app"): each cell is updated from its running distance
+      sums in `sil` (created on a cell's first append), O(new rows x cell rows);
+      scores on the appended rows are ignored.
+    - scored by the pipeline ("file"): a score on the appended rows wins (the pipeline
+      re-scored the cell); otherwise the cell keeps its previous score and is marked
+      stale, since the in-app engine computes a different metric.
+    - not scored yet (needs_silhouette): scores on the appended rows are dropped too;
+      the app fills or estimates the whole dataset.
+    """
+    col = parts.frame["SIL_SCORE"].to_numpy().astype(np.float32)
+    stale = set(parts.stale_cells)
+    if needs_silhouette(prev):
+        col[:] = np.nan
+        affected = []
+    codes = parts.frame["SHOW_LABEL"].cat.codes.to_numpy()
+    ux, uy = parts.frame["UMAP1"].to_numpy(), parts.frame["UMAP2"].to_numpy()
+    for cell in affected:
+        start, stop = parts.cell_range(*cell)
+        first_new = start + prev.cell_size(*cell)
+        if parts.sil_source == "app":
+            inc = sil.get(cell)
+            if inc is None:
+                # first append to this cell: one full pass, then appends are incremental
+                inc = sil[cell] = IncrementalSilhouette(
+                    np.column_stack([ux[start:stop], uy[start:stop]]), codes[start:stop])
+            else:
+                inc.append(np.column_stack([ux[first_new:stop], uy[first_new:stop]]), codes[first_new:stop])
+            col[start:stop] = inc.score()
+            continue
+        provided = col[first_new:stop][~np.isnan(col[first_new:stop])]
+        if len(provided):
+            col[start:stop] = provided[-1]
+            stale.discard(cell)
+        else:
+            col[start:stop] = col[start] if first_new > start else np.nan
+            stale.add(cell)
+    col.flags.writeable = False
+    cols = {c: parts.frame[c] for c in parts.frame.columns}
+    cols["SIL_SCORE"] = pd.Series(col, copy=False)
+    return replace(parts, frame=pd.DataFrame(cols, copy=False), stale_cells=frozenset(stale))
+
+
+@timed("refresh_appended")
+def refresh_appended(entry: CatalogEntry, prev_key: str, prev: PartitionedDataset) -> PartitionedDataset | None:
+    """
+    `prev` (the resident dataset for an earlier version of `entry.path`) extended with
+    the rows appended since, under `entry`'s version; None when a full load is needed.
+    """
+    with _lock:
+        state = _tails.get(entry.path)
+    if state is None:
+        return None
+
+    def forget() -> None:
+        with _lock:
+            if _tails.get(entry.path) is state:
+                _tails.pop(entry.path)
+
+    with state.lock:
+        if state.version != prev_key:
+            return None
+        try:
+            appended = read_appended(state, entry)
+        except (OSError, pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+            log.info("Full reload of %s: appended rows unreadable (%s)", entry.name, e)
+            appended = None
+        if appended is None:
+            forget()
+            return None
+        new_df, chunk = appended
+
+        # datasets scored in-app keep the "+sil" suffix (approximate ones are re-estimated
+        # by a fresh refiner for the new version)
+        version = f"{entry.key}+sil" if prev.version.endswith("+sil") else entry.key
+        try:
+            parts, affected = append_rows(prev, new_df, version)
+        except ValueError as e:
+            log.info("Full reload of %s: %s", entry.name, e)
+            forget()
+            return None
+        if affected and "SIL_SCORE" in parts.frame.columns:
+            with span("silhouette_append"):
+                parts = rescore_appended(prev, parts, affected, state.sil)
+
+        state.tail = (state.tail + chunk)[-TAIL_CHECK_BYTES:]
+        state.offset += len(chunk)
+        state.version = entry.key
+        state.appends += 1
+    log.info("Appended %d rows to %s (%d cells changed, %d bytes parsed)",
+             len(new_df), entry.name, len(affected), len(chunk))
+    return parts
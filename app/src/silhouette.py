@@ -0,0 +1,450 @@
+# src/silhouette.py
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from src.diagnostics import timed
+from src.partitions import CellKey, PartitionedDataset
+
+log = logging.getLogger(__name__)
+
+# distance entries per block (x8 bytes of scratch); rows per block = this // n
+BLOCK_ELEMS = 2 ** 21
+# below this many pairwise distances in total, a process pool costs more than it saves
+POOL_MIN_PAIRS = 50_000_000
+
+
+# -----------------------------
+# Kernel (pure NumPy, picklable for worker processes)
+# -----------------------------
+def _cluster_sums(
+    xy: np.ndarray,
+    sq: np.ndarray,
+    onehot: np.ndarray,
+    rows: np.ndarray,
+    block_rows: int | None = None,
+    *,
+    against: np.ndarray | None = None,
+    against_sq: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    (len(rows), k) sums of distances from each point in `rows` to the points of each
+    cluster (`onehot` columns) of `against` (default: all of `xy`), `block_rows` at a time.
+    """
+    if against is None:
+        against, against_sq = xy, sq
+    block_rows = block_rows or max(1, BLOCK_ELEMS // max(len(against), 1))
+    out = np.empty((len(rows), onehot.shape[1]), dtype=np.float64)
+    for start in range(0, len(rows), block_rows):
+        r = rows[start:start + block_rows]
+        # |p|^2 + |q|^2 - 2 p.q, in place: the block is the only n-sized temporary
+        d2 = xy[r] @ against.T
+        d2 *= -2.0
+        d2 += against_sq[None, :]
+        d2 += sq[r, None]
+        np.maximum(d2, 0.0, out=d2)
+        out[start:start + len(r)] = np.sqrt(d2, out=d2) @ onehot
+    return out
+
+
+def _from_sums(sums: np.ndarray, own: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    """Silhouette values from per-cluster distance sums (own cluster includes the point)."""
+    rows = np.arange(len(own))
+    own_size = sizes[own]
+    a = sums[rows, own] / np.maximum(own_size - 1, 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = sums / sizes
+    means[:, sizes == 0] = np.inf
+    means[rows, own] = np.inf
+    b = means.min(axis=1)
+    s = (b - a) / np.maximum(np.maximum(a, b), np.finfo(np.float64).tiny)
+    return np.where((own_size > 1) & np.isfinite(b), s, 0.0)
+
+
+def _prepare(xy: np.ndarray, labels: np.ndarray):
+    xy = np.asarray(xy, dtype=np.float64)
+    _, lab = np.unique(np.asarray(labels), return_inverse=True)
+    k = int(lab.max()) + 1 if len(lab) else 0
+    onehot = np.zeros((len(xy), k), dtype=np.float64)
+    onehot[np.arange(len(xy)), lab] = 1.0
+    return xy, lab, onehot, onehot.sum(axis=0), np.einsum("ij,ij->i", xy, xy)
+
+
+def silhouette_samples(
+    xy: np.ndarray,
+    labels: np.ndarray,
+    *,
+    block_rows: int | None = None,
+) -> np.ndarray:
+    """
+    Per-point silhouette values for 2-D points `xy` (n, 2) and integer `labels` (n,).
+
+    Distances are computed a block of rows at a time against all n points and
+    summed per cluster with one matmul, so scratch memory is bounded by BLOCK_ELEMS
+    rather than O(n^2). Matches sklearn's definition: points in singleton clusters score 0.
+    """
+    xy, lab, onehot, sizes, sq = _prepare(xy, labels)
+    if len(xy) == 0 or len(sizes) < 2:
+        return np.zeros(len(xy), dtype=np.float64)
+    sums = _cluster_sums(xy, sq, onehot, np.arange(len(xy)), block_rows)
+    return _from_sums(sums, lab, sizes)
+
+
+def silhouette_score(xy: np.ndarray, labels: np.ndarray, *, block_rows: int | None = None) -> float:
+    """Mean silhouette; NaN when fewer than two clusters are present."""
+    if len(np.unique(labels)) < 2:
+        return float("nan")
+    return float(silhouette_samples(xy, labels, block_rows=block_rows).mean())
+
+
+def _cell_score(args: tuple[CellKey, np.ndarray, np.ndarray, int]) -> tuple[CellKey, float]:
+    cell, xy, labels, block_rows = args
+    return cell, silhouette_score(xy, labels, block_rows=block_rows)
+
+
+# -----------------------------
+# All cells of a dataset
+# -----------------------------
+def _cell_inputs(parts: PartitionedDataset, cell: CellKey) -> tuple[np.ndarray, np.ndarray]:
+    arrs = parts.cell_arrays(*cell, ["UMAP1", "UMAP2"])
+    start, stop = parts.cell_range(*cell)
+    labels = parts.frame["SHOW_LABEL"].cat.codes.to_numpy()[start:stop]
+    return np.column_stack([arrs["UMAP1"], arrs["UMAP2"]]), labels
+
+
+@timed("silhouette")
+def compute_cell_scores(
+    parts: PartitionedDataset,
+    *,
+    max_workers: int | None = None,
+    block_rows: int | None = None,
+    cells: list[CellKey] | None = None,
+) -> dict[CellKey, float]:
+    """
+    Silhouette of UMAP1/UMAP2 with SHOW_LABEL as clusters, for every non-empty cell
+    (or just `cells`). Cells fan out over a process pool when there is enough work to
+    pay for it.
+    """
+    jobs = [(cell, *_cell_inputs(parts, cell), block_rows)
+            for cell in (parts.cells if cells is None else cells) if parts.cell_size(*cell) > 0]
+    workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+    workers = min(workers, len(jobs))
+    total_pairs = sum(len(j[1]) ** 2 for j in jobs)
+
+    if workers <= 1 or total_pairs < POOL_MIN_PAIRS:
+        return dict(map(_cell_score, jobs))
+
+    # spawn, not fork: the Streamlit server is multi-threaded
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+        # largest cells first so one big cell doesn't finish last on its own
+        jobs.sort(key=lambda j: -len(j[1]))
+        return dict(pool.map(_cell_score, jobs))
+
+
+def dataset_fingerprint(parts: PartitionedDataset) -> str:
+    """Content hash of the inputs to the silhouette (coordinates, labels, cell layout)."""
+    h = hashlib.blake2b(digest_size=16)
+    for c in ("UMAP1", "UMAP2"):
+        h.update(np.ascontiguousarray(parts.frame[c].to_numpy()).tobytes())
+    labels = parts.frame["SHOW_LABEL"]
+    h.update(np.ascontiguousarray(labels.cat.codes.to_numpy()).tobytes())
+    h.update(repr(list(labels.cat.categories)).encode())
+    h.update(repr(sorted(parts.offsets.items())).encode())
+    return h.hexdigest()
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def cached_cell_scores(fingerprint: str, _parts: PartitionedDataset, max_workers: int | None = None) -> dict[CellKey, float]:
+    return compute_cell_scores(_parts, max_workers=max_workers)
+
+
+def needs_silhouette(parts: PartitionedDataset) -> bool:
+    return "SIL_SCORE" not in parts.frame.columns or bool(parts.frame["SIL_SCORE"].isna().all())
+
+
+def fill_silhouette(parts: PartitionedDataset, max_workers: int | None = None) -> PartitionedDataset:
+    """
+    `parts` with SIL_SCORE filled in from the in-app engine (one value per cell,
+    repeated on its rows like a precomputed column). Shared read-only, like `parts`;
+    uncached itself (the dataset catalog holds the result), but the scores are
+    cached by content, so reloading an evicted dataset doesn't recompute them.
+    """
+    with st.spinner("Computing silhouette scores…"):
+        scores = cached_cell_scores(dataset_fingerprint(parts), parts, max_workers)
+    col = np.full(len(parts), np.nan, dtype=np.float32)
+    for cell, score in scores.items():
+        start, stop = parts.cell_range(*cell)
+        col[start:stop] = score
+    col.flags.writeable = False
+    # reuse the existing read-only columns; only SIL_SCORE is new
+    cols = {c: parts.frame[c] for c in parts.frame.columns}
+    cols["SIL_SCORE"] = pd.Series(col, copy=False)
+    frame = pd.DataFrame(cols, copy=False)
+    log.info("Computed silhouette for %d cells of %s", len(scores), parts.version)
+    return replace(parts, frame=frame, version=f"{parts.version}+sil", sil_source="app",
+                   stale_cells=frozenset())
+
+
+# -----------------------------
+# Approximate (stratified sampling) + progressive refinement
+# -----------------------------
+# cells larger than this get sampled estimates in "auto" mode instead of the exact O(n^2) pass
+APPROX_MIN_CELL_ROWS = 20_000
+DEFAULT_START_PER_LABEL = 64
+DEFAULT_TOLERANCE = 0.005  # stop refining a cell once its 95% CI half-width is below this
+Z_95 = 1.96
+
+
+@dataclass(frozen=True)
+class SilhouetteEstimate:
+    mean: float
+    lo: float
+    hi: float
+    n_sampled: int
+    n_total: int
+
+    @property
+    def exact(self) -> bool:
+        return self.n_sampled >= self.n_total
+
+    @property
+    def half_width(self) -> float:
+        return (self.hi - self.lo) / 2
+
+
+class CellEstimator:
+    """
+    Stratified (per show) sample estimate of one cell's silhouette.
+
+    Each sampled point's silhouette is exact (distances to all n points); only the
+    mean is estimated. Strata are permuted once, so every `refine` extends the same
+    sample and reuses the values already computed.
+    """
+
+    def __init__(self, xy: np.ndarray, labels: np.ndarray, *, seed: int = 0,
+                 block_rows: int | None = None):
+        self.xy, self.lab, self.onehot, self.sizes, self.sq = _prepare(xy, labels)
+        self.block_rows = block_rows
+        rng = np.random.default_rng(seed)
+        self._perm = [rng.permutation(np.flatnonzero(self.lab == h)) for h in range(len(self.sizes))]
+        self._values: list[np.ndarray] = [np.empty(0) for _ in self._perm]
+
+    def refine(self, per_label: int) -> SilhouetteEstimate:
+        """Grow each stratum's sample to `per_label` points (or all of it) and re-estimate."""
+        n = len(self.xy)
+        if n == 0 or len(self.sizes) < 2:
+            return SilhouetteEstimate(float("nan"), float("nan"), float("nan"), 0, n)
+
+        new_rows = [p[len(v):per_label] for p, v in zip(self._perm, self._values)]
+        rows = np.concatenate(new_rows)
+        if len(rows):
+            sums = _cluster_sums(self.xy, self.sq, self.onehot, rows, self.block_rows)
+            vals = _from_sums(sums, self.lab[rows], self.sizes)
+            for h, part in enumerate(np.split(vals, np.cumsum([len(r) for r in new_rows])[:-1])):
+                self._values[h] = np.concatenate([self._values[h], part])
+
+        mean, var, sampled = 0.0, 0.0, 0
+        for h, v in enumerate(self._values):
+            N_h, n_h = self.sizes[h], len(v)
+            w = N_h / n
+            mean += w * v.mean()
+            if 1 < n_h < N_h:
+                var += w * w * (1 - n_h / N_h) * v.var(ddof=1) / n_h
+            sampled += n_h
+        half = Z_95 * float(np.sqrt(var))
+        return SilhouetteEstimate(float(mean), float(mean - half), float(mean + half), sampled, n)
+
+
+# a refiner nobody has read for this long pauses (its viewers closed the page or moved
+# to another dataset version); the next read resumes it
+REFINE_IDLE_SECONDS = 10.0
+
+
+def _refine_loop(ref: weakref.ReferenceType[SilhouetteRefiner], stop: threading.Event) -> None:
+    # holds the refiner for one cell at a time, so an evicted one can be collected
+    while not stop.is_set():
+        refiner = ref()
+        if refiner is None or not refiner._step():
+            return
+        del refiner
+
+
+class SilhouetteRefiner:
+    """
+    Background thread that estimates every cell's silhouette and keeps tightening the
+    estimates (doubling the per-show sample each round) until each cell's CI
+    half-width is under `tolerance` or the cell has been scored exactly.
+
+    `estimates` and `revision` may be read from any thread; `revision` increments
+    whenever any estimate changes. The thread checks a stop event between cells:
+    `stop()` sets it, and so does the refiner being garbage collected (evicted from
+    `get_refiner`'s cache and no longer used by any session). It also pauses after
+    `idle_seconds` without a read, and picks up where it left off on the next one.
+    """
+
+    def __init__(self, parts: PartitionedDataset, *, start_per_label: int = DEFAULT_START_PER_LABEL,
+                 tolerance: float = DEFAULT_TOLERANCE, idle_seconds: float = REFINE_IDLE_SECONDS):
+        self.subset_order = parts.subset_order
+        self.disruption_order = parts.disruption_order
+        self.tolerance = tolerance
+        self.idle_seconds = idle_seconds
+        self._cells = {cell: CellEstimator(*_cell_inputs(parts, cell))
+                       for cell in parts.cells if parts.cell_size(*cell) > 0}
+        self._per_label = start_per_label
+        self._pending = set(self._cells)
+        self._queue = sorted(self._pending)  # cells left in this round
+        self._lock = threading.Lock()
+        self.estimates: dict[CellKey, SilhouetteEstimate] = {}
+        self.revision = 0
+        self.done = False
+        self._last_read = time.monotonic()
+        self._stop = threading.Event()
+        weakref.finalize(self, self._stop.set)
+        self._start()
+
+    def _start(self) -> None:
+        self._thread = threading.Thread(target=_refine_loop, args=(weakref.ref(self), self._stop),
+                                        name="silhouette-refine", daemon=True)
+        self._thread.start()
+
+    def _step(self) -> bool:
+        """Refine the next cell; False once done, or idle."""
+        if time.monotonic() - self._last_read > self.idle_seconds:
+            return False
+        if not self._queue:
+            self._per_label *= 2
+            self._queue = sorted(self._pending)
+            if not self._queue:
+                self.done = True
+                return False
+        cell = self._queue.pop(0)
+        try:
+            est = self._cells[cell].refine(self._per_label)
+        except Exception as e:  # leave the last good estimates in place
+            log.warning("Silhouette refinement stopped: %s", e)
+            self.done = True
+            return False
+        with self._lock:
+            self.estimates[cell] = est
+            self.revision += 1
+        if est.exact or est.half_width <= self.tolerance:
+            self._pending.discard(cell)
+        return True
+
+    def stop(self) -> None:
+        """Stop refining for good (the thread exits after the cell in progress)."""
+        self._stop.set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def snapshot(self) -> tuple[int, dict[CellKey, SilhouetteEstimate]]:
+        with self._lock:
+            self._last_read = time.monotonic()
+            if not self.done and not self._stop.is_set() and not self._thread.is_alive():
+                self._start()  # paused while idle
+            return self.revision, dict(self.estimates)
+
+    def frame(self) -> pd.DataFrame:
+        """Current estimates as SUBSET / DISRUPTION / SIL_SCORE rows (grid input)."""
+        _, est = self.snapshot()
+        return pd.DataFrame({
+            "SUBSET": pd.Categorical([c[0] for c in est], categories=self.subset_order),
+            "DISRUPTION": pd.Categorical([c[1] for c in est], categories=self.disruption_order),
+            "SIL_SCORE": [e.mean for e in est.values()],
+        })
+
+    def max_half_width(self) -> float:
+        _, est = self.snapshot()
+        widths = [e.half_width for e in est.values() if np.isfinite(e.half_width)]
+        return max(widths, default=0.0)
+
+
+def use_approximate(parts: PartitionedDataset, mode: str = "auto") -> bool:
+    """mode: 'exact', 'approx' or 'auto' (approx once any cell exceeds APPROX_MIN_CELL_ROWS)."""
+    if mode in ("exact", "approx"):
+        return mode == "approx"
+    return max((parts.cell_size(*c) for c in parts.cells), default=0) > APPROX_MIN_CELL_ROWS
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def get_refiner(version: str, _parts: PartitionedDataset) -> SilhouetteRefiner:
+    """One refiner per dataset version, shared by every session."""
+    return SilhouetteRefiner(_parts)
+
+
+# -----------------------------
+# Incremental updates for appended rows
+# -----------------------------
+class IncrementalSilhouette:
+    """
+    Exact silhouette of one cell that can absorb appended points.
+
+    Keeps each point's distance sums to every cluster (n x k). Appending m points
+    costs O(m * n): the new points' sums are computed against everything, and the
+    existing sums only gain the distances to the new points. No O(n^2) recompute.
+    """
+
+    def __init__(self, xy: np.ndarray, labels: np.ndarray, *, block_rows: int | None = None):
+        self.block_rows = block_rows
+        self._label_index: dict = {}
+        self.xy = np.empty((0, 2), dtype=np.float64)
+        self.lab = np.empty(0, dtype=np.intp)
+        self.sums = np.empty((0, 0), dtype=np.float64)
+        self.append(xy, labels)
+
+    @property
+    def sizes(self) -> np.ndarray:
+        return np.bincount(self.lab, minlength=len(self._label_index)).astype(np.float64)
+
+    def append(self, xy: np.ndarray, labels: np.ndarray) -> None:
+        new_xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        if not len(new_xy):
+            return
+        for v in pd.unique(np.asarray(labels)):
+            self._label_index.setdefault(v, len(self._label_index))
+        new_lab = np.array([self._label_index[v] for v in labels], dtype=np.intp)
+        k = len(self._label_index)
+
+        old_n = len(self.xy)
+        sums = np.zeros((old_n, k))
+        sums[:, :self.sums.shape[1]] = self.sums
+
+        all_xy = np.vstack([self.xy, new_xy])
+        all_lab = np.concatenate([self.lab, new_lab])
+        all_sq = np.einsum("ij,ij->i", all_xy, all_xy)
+        new_sq = all_sq[old_n:]
+        onehot_new = np.zeros((len(new_xy), k))
+        onehot_new[np.arange(len(new_xy)), new_lab] = 1.0
+        onehot_all = np.zeros((len(all_xy), k))
+        onehot_all[np.arange(len(all_xy)), all_lab] = 1.0
+
+        if old_n:
+            sums += _cluster_sums(self.xy, all_sq[:old_n], onehot_new, np.arange(old_n),
+                                  self.block_rows, against=new_xy, against_sq=new_sq)
+        new_sums = _cluster_sums(new_xy, new_sq, onehot_all, np.arange(len(new_xy)),
+                                 self.block_rows, against=all_xy, against_sq=all_sq)
+
+        self.xy, self.lab = all_xy, all_lab
+        self.sums = np.vstack([sums, new_sums])
+
+    def samples(self) -> np.ndarray:
+        return _from_sums(self.sums, self.lab, self.sizes)
+
+    def score(self) -> float:
+        if len(self._label_index) < 2 or len(np.unique(self.lab)) < 2:
+            return float("nan")
+        return float(self.samples().mean())
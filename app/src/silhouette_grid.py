@@ -2,10 +2,27 @@
 
 from __future__ import annotations
 
+import copy
+import json
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
 import pandas as pd
-from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
-from st_aggrid.shared import JsCode
-from st_aggrid import ColumnsAutoSizeMode
+import streamlit as st
+
+from src.diagnostics import count, span
+
+# st_aggrid is imported where the grid is built/rendered, not at module import:
+# it's one of the slower imports on a cold start
+if TYPE_CHECKING:
+    from st_aggrid.shared import JsCode
+
+HEADER_H = 46
+ROW_H = 32
+
+# Hidden per-row field carrying the selected column key (OG) on the selected row, "" elsewhere.
+# Selection travels as row data so the grid options stay identical across clicks.
+SELECTED_FIELD = "__selected"
 
 
 def _label(meta: dict[str, dict], key: str, kind: str) -> str:
@@ -17,7 +34,7 @@ def _label(meta: dict[str, dict], key: str, kind: str) -> str:
         return key
 
 
-def render_silhouette_grid(
+def build_silhouette_pivot(
     df_filtered: pd.DataFrame,
     subset_order: list[str],
     disruption_order: list[str],
@@ -25,23 +42,11 @@ def render_silhouette_grid(
     disruption_meta: dict[str, dict],
     *,
     transpose: bool = True,
-    display: str = "abbr",  # 'abbr' or 'full'
-    grid_height: int = 1,   # autoHeight will handle real height; keep >=1
-    max_width_px: int = 0,  # 0 => 100% of container
-    # (subset_key, disruption_key)
-    selected_cell: tuple[str, str] | None = None,
-):
+    display: str = "abbr",
+) -> dict:
     """
-    Silhouette grid with:
-      - Optional transpose (default True): rows=subsets, cols=disruptions (fits better)
-      - Label meta system: {og: {'full':..., 'abbr':...}}
-      - Display abbreviations in grid (or full) without changing underlying keys
-      - True cell click: stores OG keys into __clicked_subset/__clicked_disruption
-      - Rounded values to 3 decimals
-      - Gradient cell backgrounds
-      - Centered/wrapped headers
-      - Filter/sort/menu disabled
-      - Auto height to data length (no dead space)
+    Pivot of SIL_SCORE in OG keys, rounded to 3 decimals, plus the field names /
+    header labels the grid needs and the gradient bounds.
     """
 
     # -----------------------------
@@ -62,12 +67,14 @@ def render_silhouette_grid(
                 columns="DISRUPTION",
                 values="SIL_SCORE",
                 aggfunc="first",
+                observed=False,
             )
             .reindex(subset_order)
             .reindex(columns=disruption_order)
             .reset_index()
         )
         # keep OG subset key, but display label in a separate column
+        pivot["SUBSET"] = pivot["SUBSET"].astype(str)
         pivot["__subset_key"] = pivot["SUBSET"]
         pivot["SUBSET"] = pivot["SUBSET"].map(
             subset_disp).fillna(pivot["SUBSET"])
@@ -85,11 +92,13 @@ def render_silhouette_grid(
                 columns="SUBSET",
                 values="SIL_SCORE",
                 aggfunc="first",
+                observed=False,
             )
             .reindex(disruption_order)
             .reindex(columns=subset_order)
             .reset_index()
         )
+        pivot["DISRUPTION"] = pivot["DISRUPTION"].astype(str)
         pivot["__disruption_key"] = pivot["DISRUPTION"]
         pivot["DISRUPTION"] = pivot["DISRUPTION"].map(
             disruption_disp).fillna(pivot["DISRUPTION"])
@@ -99,14 +108,12 @@ def render_silhouette_grid(
         col_key_order = subset_order
         col_header_map = subset_disp
 
+    pivot.columns = [str(c) for c in pivot.columns]
+
     # round numeric columns to 3 decimals
     for c in col_key_order:
         if c in pivot.columns:
-            pivot[c] = pd.to_numeric(pivot[c], errors="coerce").round(3)
-
-    # click markers (OG keys)
-    pivot["__clicked_subset"] = ""
-    pivot["__clicked_disruption"] = ""
+            pivot[c] = pd.to_numeric(pivot[c], errors="coerce").astype("float64").round(3)
 
     # -----------------------------
     # Gradient bounds
@@ -115,16 +122,42 @@ def render_silhouette_grid(
     vmin = float(vals.min()) if len(vals) else 0.0
     vmax = float(vals.max()) if len(vals) else 1.0
 
-    selected_subset_key = selected_cell[0] if selected_cell else None
-    selected_disruption_key = selected_cell[1] if selected_cell else None
+    return {
+        "pivot": pivot,
+        "row_label_field": row_label_field,
+        "row_key_field": row_key_field,
+        "col_key_order": list(col_key_order),
+        "col_header_map": col_header_map,
+        "vmin": vmin,
+        "vmax": vmax,
+        "transpose": transpose,
+    }
+
+
+def build_grid_options(model: dict) -> dict:
+    """
+    AgGrid options for a pivot model. Contains nothing selection-dependent, so the
+    dict is identical across clicks and the frontend never rebuilds the grid.
+    JsCode is pre-serialized so the result can be shared read-only.
+    """
+    from st_aggrid import GridOptionsBuilder
+    from st_aggrid.shared import JsCode, walk_gridOptions
+
+    pivot = model["pivot"]
+    row_label_field = model["row_label_field"]
+    row_key_field = model["row_key_field"]
+    col_key_order = model["col_key_order"]
+    col_header_map = model["col_header_map"]
+    vmin, vmax = model["vmin"], model["vmax"]
+    col_keys_js = json.dumps([k for k in col_key_order if k in pivot.columns])
 
     # -----------------------------
-    # Cell renderer captures click -> writes OG keys to hidden columns
+    # Cell renderer (display only; clicks are handled by the grid's cellClicked event)
     # We keep column field = OG key always, even if header shows abbreviation.
     # -----------------------------
-    ClickCaptureRenderer = JsCode(
+    ValueRenderer = JsCode(
         f"""
-        class ClickCaptureRenderer {{
+        class ValueRenderer {{
           init(params) {{
             this.params = params;
             this.eGui = document.createElement('div');
@@ -148,22 +181,6 @@ def render_silhouette_grid(
               this.eGui.textContent = String(v);
             }}
 
-            this.eGui.onclick = () => {{
-              const transpose = {str(transpose).lower()};
-
-              // column field is ALWAYS OG key (subset or disruption depending on orientation)
-              const colKey = params.colDef.field;
-
-              // rowKey is stored in hidden field on the row
-              const rowKey = params.data["{row_key_field}"];
-
-              const subsetKey = transpose ? rowKey : colKey;
-              const disruptionKey = transpose ? colKey : rowKey;
-
-              params.node.setDataValue("__clicked_subset", subsetKey);
-              params.node.setDataValue("__clicked_disruption", disruptionKey);
-            }};
-
             return true;
           }}
         }}
@@ -180,7 +197,7 @@ def render_silhouette_grid(
           const col = params.colDef.field;
 
           // hide internal cols (if they ever render)
-          if (col === "{row_key_field}" || col === "__clicked_subset" || col === "__clicked_disruption") {{
+          if (col === "{row_key_field}" || col === "{SELECTED_FIELD}") {{
             return {{ display: "none" }};
           }}
 
@@ -213,25 +230,15 @@ def render_silhouette_grid(
             fontWeight: "600",
             textAlign: "center",
             borderRadius: "6px",
+            boxShadow: "none",
+            filter: "none",
           }};
 
-          // selected outline (compare OG keys)
-          const transpose = {str(transpose).lower()};
-          const selSubset = {("null" if selected_subset_key is None else repr(selected_subset_key))};
-          const selDisruption = {("null" if selected_disruption_key is None else repr(selected_disruption_key))};
-
-          if (selSubset !== null && selDisruption !== null) {{
-            const colKey = params.colDef.field;          // OG column key
-            const rowKey = params.data["{row_key_field}"]; // OG row key
-
-            const subsetKey = transpose ? rowKey : colKey;
-            const disruptionKey = transpose ? colKey : rowKey;
-
-            if (subsetKey === selSubset && disruptionKey === selDisruption) {{
-              style.boxShadow = "inset 0 0 0 3px rgba(0,0,0,0.55), 0 0 0 1px rgba(255,255,255,0.55)";
-              style.filter = "brightness(0.92) saturate(1.05)";
-              style.borderRadius = "8px";
-            }}
+          // selected outline: the selected row carries the selected OG column key
+          if (params.data["{SELECTED_FIELD}"] === col) {{
+            style.boxShadow = "inset 0 0 0 3px rgba(0,0,0,0.55), 0 0 0 1px rgba(255,255,255,0.55)";
+            style.filter = "brightness(0.92) saturate(1.05)";
+            style.borderRadius = "8px";
           }}
 
           return style;
@@ -239,10 +246,34 @@ def render_silhouette_grid(
         """
     )
 
+    # -----------------------------
+    # Click -> instant in-place highlight; the server echoes the same
+    # selection back as row data on the next run
+    # -----------------------------
+    on_cell_clicked = JsCode(
+        f"""
+        function(params) {{
+          const colKey = params.colDef.field;
+          if (!{col_keys_js}.includes(colKey)) return;
+          params.api.forEachNode((n) => {{
+            n.data["{SELECTED_FIELD}"] = (n === params.node) ? colKey : "";
+          }});
+          params.api.refreshCells({{ force: true }});
+        }}
+        """
+    )
+
+    # stable row ids => row data updates are applied as in-place deltas
+    get_row_id = JsCode(
+        f"""
+        function(params) {{ return String(params.data["{row_key_field}"]); }}
+        """
+    )
+
     # -----------------------------
     # Grid options (no filters/menus/sorting)
     # -----------------------------
-    gb = GridOptionsBuilder.from_dataframe(pivot)
+    gb = GridOptionsBuilder.from_dataframe(pivot.assign(**{SELECTED_FIELD: ""}))
 
     gb.configure_default_column(
         resizable=True,
@@ -254,8 +285,6 @@ def render_silhouette_grid(
         wrapText=True,
         autoHeight=False,
     )
-    HEADER_H = 46
-    ROW_H = 32
     gb.configure_grid_options(
         headerHeight=HEADER_H,
         rowHeight=ROW_H,
@@ -264,6 +293,9 @@ def render_silhouette_grid(
         suppressContextMenu=True,
         suppressMenuHide=True,
         sideBar=False,
+        getRowId=get_row_id,
+        onCellClicked=on_cell_clicked,
+        autoSizeStrategy={"type": "fitGridWidth"},
     )
 
     # Row label column (display)
@@ -271,8 +303,7 @@ def render_silhouette_grid(
 
     # Internal key column (hidden)
     gb.configure_column(row_key_field, hide=True)
-    gb.configure_column("__clicked_subset", hide=True)
-    gb.configure_column("__clicked_disruption", hide=True)
+    gb.configure_column(SELECTED_FIELD, hide=True)
 
     # Data columns: field stays OG key, headerName is display label
     for k in col_key_order:
@@ -290,20 +321,172 @@ def render_silhouette_grid(
                 autoHeaderHeight=True,
                 valueFormatter="(value == null || isNaN(value)) ? '' : value.toFixed(3)",
                 cellStyle=cell_style,
-                cellRenderer=ClickCaptureRenderer,
+                cellRenderer=ValueRenderer,
             )
 
     grid_options = gb.build()
+    walk_gridOptions(
+        grid_options, lambda v: v.js_code if isinstance(v, JsCode) else v)
+    return grid_options
+
+
+def build_click_channel(model: dict) -> tuple[JsCode, JsCode]:
+    """
+    (should_grid_return, custom_jscode_for_grid_return) for the `cellClicked` event:
+    only data-cell clicks are sent, and the payload is just the clicked OG keys.
+    """
+    from st_aggrid.shared import JsCode
+
+    row_key_field = model["row_key_field"]
+    col_keys_js = json.dumps(
+        [k for k in model["col_key_order"] if k in model["pivot"].columns])
+
+    should_return = JsCode(
+        f"""
+        function({{ eventData }}) {{
+          return {col_keys_js}.includes(eventData.colDef.field);
+        }}
+        """
+    )
+    click_payload = JsCode(
+        f"""
+        function({{ eventData }}) {{
+          const transpose = {str(model["transpose"]).lower()};
+          const colKey = eventData.colDef.field;
+          const rowKey = eventData.data["{row_key_field}"];
+          return {{
+            subset: transpose ? rowKey : colKey,
+            disruption: transpose ? colKey : rowKey,
+          }};
+        }}
+        """
+    )
+    return should_return, click_payload
+
+
+def _build_grid_model(
+    df_filtered: pd.DataFrame,
+    subset_order: tuple[str, ...],
+    disruption_order: tuple[str, ...],
+    subset_meta: dict[str, dict],
+    disruption_meta: dict[str, dict],
+    transpose: bool,
+    display: str,
+) -> dict:
+    with span("pivot"):
+        model = build_silhouette_pivot(
+            df_filtered,
+            list(subset_order),
+            list(disruption_order),
+            subset_meta,
+            disruption_meta,
+            transpose=transpose,
+            display=display,
+        )
+    model["grid_options"] = build_grid_options(model)
+    model["click_channel"] = build_click_channel(model)
+    return model
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def _cached_grid_model(
+    data_version: str,
+    _df_filtered: pd.DataFrame,
+    subset_order: tuple[str, ...],
+    disruption_order: tuple[str, ...],
+    subset_meta: dict[str, dict],
+    disruption_meta: dict[str, dict],
+    transpose: bool,
+    display: str,
+) -> dict:
+    # one pivot + options per dataset version/layout, shared read-only across reruns
+    return _build_grid_model(
+        _df_filtered, subset_order, disruption_order, subset_meta, disruption_meta, transpose, display)
+
+
+def grid_row_data(model: dict, selected_cell: tuple[str, str] | None) -> pd.DataFrame:
+    """Per-rerun row data: the cached pivot plus the selection marker (a 7-row copy)."""
+    pivot = model["pivot"].copy()
+    pivot[SELECTED_FIELD] = ""
+    if selected_cell:
+        subset_key, disruption_key = selected_cell
+        row_sel, col_sel = (subset_key, disruption_key) if model["transpose"] else (
+            disruption_key, subset_key)
+        pivot.loc[pivot[model["row_key_field"]] == row_sel, SELECTED_FIELD] = col_sel
+    return pivot
+
+
+def render_silhouette_grid(
+    df_filtered: pd.DataFrame,
+    subset_order: list[str],
+    disruption_order: list[str],
+    subset_meta: dict[str, dict],
+    disruption_meta: dict[str, dict],
+    *,
+    transpose: bool = True,
+    display: str = "abbr",  # 'abbr' or 'full'
+    grid_height: int = 1,   # autoHeight will handle real height; keep >=1
+    max_width_px: int = 0,  # 0 => 100% of container
+    # (subset_key, disruption_key)
+    selected_cell: tuple[str, str] | None = None,
+    data_version: str | None = None,  # caches pivot + options per dataset version
+    key: str = "silhouette_grid",     # stable component identity across reruns
+    on_select: Callable[[tuple[str, str]], None] | None = None,
+):
+    """
+    Silhouette grid with:
+      - Optional transpose (default True): rows=subsets, cols=disruptions (fits better)
+      - Label meta system: {og: {'full':..., 'abbr':...}}
+      - Display abbreviations in grid (or full) without changing underlying keys
+      - True cell click: a single cellClicked event sends only the clicked OG keys;
+        on_select((subset_key, disruption_key)) runs as the widget callback, before
+        the rerun, and only when the clicked cell changes
+      - Rounded values to 3 decimals
+      - Gradient cell backgrounds
+      - Centered/wrapped headers
+      - Filter/sort/menu disabled
+      - Auto height to data length (no dead space)
+      - Pivot + grid options built once per data_version; the selection is sent as
+        row data, so a click updates the highlight in place instead of remounting
+    """
+    from st_aggrid import AgGrid, DataReturnMode
+
+    args = (
+        tuple(subset_order),
+        tuple(disruption_order),
+        subset_meta,
+        disruption_meta,
+        transpose,
+        display,
+    )
+    if data_version is None:
+        model = _build_grid_model(df_filtered, *args)
+    else:
+        model = _cached_grid_model(data_version, df_filtered, *args)
+
+    pivot = grid_row_data(model, selected_cell)
+    count("grid_rows_bytes", len(pivot.to_json(orient="records")))
+    should_return, click_payload = model["click_channel"]
+
+    def _on_click(resp):
+        subset_key, disruption_key = resp.get("subset"), resp.get("disruption")
+        if on_select is not None and subset_key and disruption_key:
+            on_select((subset_key, disruption_key))
 
     n_rows = len(pivot)
     # +2 rows worth of padding to account for borders/header rounding differences across themes
     computed_height = HEADER_H + (n_rows * ROW_H) + 5
     return AgGrid(
         pivot,
-        gridOptions=grid_options,
-        update_mode=GridUpdateMode.MODEL_CHANGED,  # click updates row data
+        # AgGrid mutates the options it's given; keep the cached copy pristine
+        gridOptions=copy.deepcopy(model["grid_options"]),
         height=computed_height,
         allow_unsafe_jscode=True,
         theme="streamlit",
-        fit_columns_on_grid_load=True,
+        key=key,
+        update_on=["cellClicked"],
+        data_return_mode=DataReturnMode.CUSTOM,
+        custom_jscode_for_grid_return=click_payload,
+        should_grid_return=should_return,
+        callback=_on_click,
     )
@@ -0,0 +1,134 @@
+# src/spatial.py
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from src.diagnostics import timed
+from src.partitions import PartitionedDataset
+
+# ~this many points per grid bucket; queries touch O(result + boundary buckets) points
+TARGET_PER_BUCKET = 16
+EPISODE_COLS = ["SHOW_LABEL", "SHOW", "SEASON", "EPISODE", "UMAP1", "UMAP2"]
+
+
+class GridIndex:
+    """
+    Uniform grid over (x, y) for one cell: point ids sorted by bucket (row-major),
+    with CSR offsets, so a run of buckets along one grid row is one contiguous slice.
+
+    Box and polygon queries read only the bucket rows they overlap; kNN grows a
+    square of buckets around the query until the k-th distance is provably inside
+    it. Ids are positions within the cell (0..n-1), in ascending order for
+    box/polygon results.
+    """
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, *, target_per_bucket: int = TARGET_PER_BUCKET):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        n = len(x)
+        side = max(1, int(np.ceil(np.sqrt(n / target_per_bucket))))
+        self.nx = self.ny = side
+        self.x0, self.y0 = (float(x.min()), float(y.min())) if n else (0.0, 0.0)
+        x1, y1 = (float(x.max()), float(y.max())) if n else (1.0, 1.0)
+        self.dx = (x1 - self.x0) / side or 1.0
+        self.dy = (y1 - self.y0) / side or 1.0
+
+        bucket = self._by(y) * self.nx + self._bx(x)
+        order = np.argsort(bucket, kind="stable")
+        self.ids = order.astype(np.int64)
+        self.xs, self.ys = x[order], y[order]  # bucket-ordered copies: queries read contiguously
+        self.starts = np.searchsorted(bucket[order], np.arange(self.nx * self.ny + 1))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _bx(self, x) -> np.ndarray:
+        return np.clip(np.floor((np.asarray(x) - self.x0) / self.dx), 0, self.nx - 1).astype(np.int64)
+
+    def _by(self, y) -> np.ndarray:
+        return np.clip(np.floor((np.asarray(y) - self.y0) / self.dy), 0, self.ny - 1).astype(np.int64)
+
+    def _candidates(self, bx0: int, bx1: int, by0: int, by1: int) -> np.ndarray:
+        # positions (into the bucket-ordered arrays) of every point in the bucket rectangle
+        spans = [np.arange(self.starts[r * self.nx + bx0], self.starts[r * self.nx + bx1 + 1])
+                 for r in range(by0, by1 + 1)]
+        return np.concatenate(spans) if spans else np.empty(0, dtype=np.int64)
+
+    def box(self, x_range: tuple[float, float], y_range: tuple[float, float]) -> np.ndarray:
+        """Ids with x in x_range and y in y_range (inclusive)."""
+        (xa, xb), (ya, yb) = sorted(x_range), sorted(y_range)
+        pos = self._candidates(int(self._bx(xa)), int(self._bx(xb)), int(self._by(ya)), int(self._by(yb)))
+        px, py = self.xs[pos], self.ys[pos]
+        pos = pos[(px >= xa) & (px <= xb) & (py >= ya) & (py <= yb)]
+        return np.sort(self.ids[pos])
+
+    def polygon(self, xs, ys) -> np.ndarray:
+        """Ids inside the closed polygon (even-odd rule), e.g. a lasso path."""
+        vx, vy = np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)
+        if len(vx) < 3:
+            return np.empty(0, dtype=np.int64)
+        pos = self._candidates(int(self._bx(vx.min())), int(self._bx(vx.max())),
+                               int(self._by(vy.min())), int(self._by(vy.max())))
+        px, py = self.xs[pos], self.ys[pos]
+        inside = np.zeros(len(pos), dtype=bool)
+        for ax, ay, bx, by in zip(vx, vy, np.roll(vx, -1), np.roll(vy, -1)):
+            crosses = (ay > py) != (by > py)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                x_at = ax + (py - ay) * (bx - ax) / (by - ay)
+            inside ^= crosses & (px < x_at)
+        return np.sort(self.ids[pos[inside]])
+
+    def knn(self, x: float, y: float, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """(ids, distances) of the k nearest points to (x, y), nearest first."""
+        k = min(int(k), len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        cx, cy = int(self._bx(x)), int(self._by(y))
+        w = 0
+        while True:
+            bx0, bx1 = max(cx - w, 0), min(cx + w, self.nx - 1)
+            by0, by1 = max(cy - w, 0), min(cy + w, self.ny - 1)
+            pos = self._candidates(bx0, bx1, by0, by1)
+            full = bx0 == 0 and by0 == 0 and bx1 == self.nx - 1 and by1 == self.ny - 1
+            if len(pos) >= k or full:
+                d = np.hypot(self.xs[pos] - x, self.ys[pos] - y)
+                part = np.argpartition(d, k - 1)[:k] if len(d) > k else np.arange(len(d))
+                kth = d[part].max()
+                # everything closer than `reach` lies inside the searched rectangle
+                reach = min(
+                    x - (self.x0 + bx0 * self.dx) if bx0 > 0 else np.inf,
+                    self.x0 + (bx1 + 1) * self.dx - x if bx1 < self.nx - 1 else np.inf,
+                    y - (self.y0 + by0 * self.dy) if by0 > 0 else np.inf,
+                    self.y0 + (by1 + 1) * self.dy - y if by1 < self.ny - 1 else np.inf,
+                )
+                if kth <= reach or full:
+                    best = part[np.argsort(d[part], kind="stable")]
+                    return self.ids[pos[best]], d[best]
+            w = max(1, w * 2)
+
+
+@timed("spatial_index")
+def build_cell_index(parts: PartitionedDataset, subset_key: str, disruption_key: str) -> GridIndex:
+    arrs = parts.cell_arrays(subset_key, disruption_key, ["UMAP1", "UMAP2"])
+    return GridIndex(arrs["UMAP1"], arrs["UMAP2"])
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def cell_index(data_version: str, subset_key: str, disruption_key: str, _parts: PartitionedDataset) -> GridIndex:
+    """Spatial index for one cell, built once per (dataset version, cell) and shared."""
+    return build_cell_index(_parts, subset_key, disruption_key)
+
+
+def episodes(parts: PartitionedDataset, subset_key: str, disruption_key: str, ids: np.ndarray,
+             distances: np.ndarray | None = None) -> pd.DataFrame:
+    """Episode rows (show, season, episode, coordinates) for cell-relative `ids`."""
+    cell = parts.cell(subset_key, disruption_key)
+    cols = [c for c in EPISODE_COLS if c in cell.columns]
+    out = cell[cols].iloc[ids].reset_index(drop=True)
+    if "SHOW_LABEL" in out.columns:
+        out["SHOW_LABEL"] = out["SHOW_LABEL"].astype(str)
+    if distances is not None:
+        out["DISTANCE"] = np.round(distances, 4)
+    return out
@@ -0,0 +1,244 @@
+# src/static_export.py
+"""
+Static export: every cell pre-rendered into a bundle that any static host can serve
+(no Python backend, no per-click server work).
+
+    python -m src.static_export --out build/static
+    python -m src.static_export data/other.csv --mode density --out build/other
+
+Bundle layout:
+    index.html      grid (server-side colored table), plot pane, client-side switching
+    legend.html     render_legend_iframe_html output
+    plotly.min.js   the plotly.js build shipped with the plotly package
+    manifest.json   cells, labels, sizes and the shared plotly template
+    cells/NN.bin    one figure per cell, fetched on first click (see the template
+                    script for the format)
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import html
+import json
+import os
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import plotly
+import plotly.io as pio
+
+from src.compiled import load_compiled
+from src.data_io import file_signature, load_columnar, path_version
+from src.dataset import validate_columns
+from src.label_meta import (
+    DISRUPTION_LEGEND_META, DISRUPTION_META, DISRUPTION_ORDER, SHOW_COLORS, SUBSET_LEGEND_META,
+    SUBSET_LEGEND_ORDER, SUBSET_META, SUBSET_ORDER, full)
+from src.legend import render_legend_iframe_html
+from src.partitions import PartitionedDataset, build_partitions
+from src.silhouette_grid import ROW_H, build_silhouette_pivot
+from src.umap_plot import DEFAULT_POINT_BUDGET, make_umap_plot
+
+DEFAULT_PATH = "data/umap_df_for_js_plot_120825.csv"
+TITLE = "Semantic Separation Visualization"
+TEMPLATE_PATH = "src/templates/static_index.html"
+LEGEND_TEMPLATE_PATH = "src/templates/legend.html"
+CSS_PATH = "src/styles/app.css"
+REQUIRED_COLS = ("DISRUPTION", "SHOW_LABEL", "SUBSET", "UMAP1", "UMAP2")
+PLOT_HEIGHT = 500
+ALIGN = 8  # typed-array views need offsets aligned to their element size
+
+
+# -----------------------------
+# Data
+# -----------------------------
+def load_export_dataset(path: str) -> tuple[PartitionedDataset, pd.DataFrame]:
+    """Partitioned dataset for `path` plus its per-cell SIL_SCORE frame (computed if missing)."""
+    from src.silhouette import compute_cell_scores, needs_silhouette
+
+    subset_order, disruption_order = tuple(SUBSET_ORDER), tuple(DISRUPTION_ORDER)
+    parts = load_compiled(path, subset_order, disruption_order)
+    if parts is None:
+        parts = build_partitions(load_columnar(path, file_signature(path)), subset_order,
+                                 disruption_order, version=path_version(path))
+    validate_columns(parts.frame, REQUIRED_COLS)
+
+    if not needs_silhouette(parts):
+        return parts, parts.cell_frame("SIL_SCORE")
+    scores = compute_cell_scores(parts)
+    cells = list(scores)
+    return parts, pd.DataFrame({
+        "SUBSET": pd.Categorical([c[0] for c in cells], categories=subset_order),
+        "DISRUPTION": pd.Categorical([c[1] for c in cells], categories=disruption_order),
+        "SIL_SCORE": [scores[c] for c in cells],
+    })
+
+
+# -----------------------------
+# Cell figures -> compact binary
+# -----------------------------
+def _extract_buffers(node, chunks: list[bytes], offset: list[int]):
+    # replace plotly's base64 typed arrays ({dtype, bdata[, shape]}) with offsets into the blob
+    if isinstance(node, list):
+        return [_extract_buffers(v, chunks, offset) for v in node]
+    if not isinstance(node, dict):
+        return node
+    if "bdata" in node and "dtype" in node:
+        raw = base64.b64decode(node["bdata"])
+        pad = -offset[0] % ALIGN
+        chunks.append(b"\0" * pad + raw)
+        offset[0] += pad
+        ref = [offset[0], len(raw), node["dtype"]]
+        if "shape" in node:
+            ref.append([int(s) for s in str(node["shape"]).split(",")])
+        offset[0] += len(raw)
+        return {"$buf": ref}
+    return {k: _extract_buffers(v, chunks, offset) for k, v in node.items()}
+
+
+def encode_figure(fig) -> tuple[bytes, dict]:
+    """
+    (cell file bytes, plotly template). The template is identical for every cell, so
+    it is stripped here and shipped once in the manifest.
+    """
+    spec = json.loads(pio.to_json(fig, validate=False))
+    template = spec["layout"].pop("template", None)
+    meta = spec["layout"].get("meta", {})
+
+    chunks: list[bytes] = []
+    head = json.dumps({
+        "figure": _extract_buffers(spec, chunks, [0]),
+        "meta": meta,
+    }, separators=(",", ":")).encode("utf-8")
+    prefix = len(head).to_bytes(4, "little") + head
+    prefix += b"\0" * (-len(prefix) % ALIGN)
+    return prefix + b"".join(chunks), template
+
+
+# -----------------------------
+# Grid
+# -----------------------------
+def gradient_rgb(v: float, vmin: float, vmax: float) -> str:
+    """Same red -> yellow -> green ramp as the AgGrid cell_style in silhouette_grid."""
+    t = 0.5 if vmax == vmin else (v - vmin) / (vmax - vmin)
+    if t < 0.5:
+        r, g = 255, round(255 * t * 2)
+    else:
+        r, g = round(255 * (1 - (t - 0.5) * 2)), 255
+    return f"rgb({r},{g},0)"
+
+
+def grid_table_html(model: dict, cell_ids: dict[tuple[str, str], str]) -> str:
+    pivot = model["pivot"]
+    cols = [k for k in model["col_key_order"] if k in pivot.columns]
+    head = "".join(f"<th>{html.escape(str(model['col_header_map'].get(k, k)))}</th>" for k in cols)
+    rows = []
+    for _, row in pivot.iterrows():
+        row_key = row[model["row_key_field"]]
+        tds = []
+        for k in cols:
+            cell = (row_key, k) if model["transpose"] else (k, row_key)
+            v = row[k]
+            if cell not in cell_ids:
+                tds.append('<td class="empty"></td>')
+            elif pd.isna(v):
+                tds.append(f'<td class="empty" data-cell="{cell_ids[cell]}"></td>')
+            else:
+                tds.append(f'<td data-cell="{cell_ids[cell]}" '
+                           f'style="background:{gradient_rgb(float(v), model["vmin"], model["vmax"])}">{v:.3f}</td>')
+        rows.append(f'<tr><th class="row-label">{html.escape(str(row[model["row_label_field"]]))}</th>'
+                    + "".join(tds) + "</tr>")
+    return (f'<table class="sil-grid"><thead><tr><th></th>{head}</tr></thead>'
+            f'<tbody>{"".join(rows)}</tbody></table>')
+
+
+# -----------------------------
+# Bundle
+# -----------------------------
+def export_static(
+    path: str,
+    out_dir: str,
+    *,
+    render_mode: str = "auto",
+    point_budget: int = DEFAULT_POINT_BUDGET,
+) -> dict:
+    """Write the static bundle for `path` into `out_dir` (replaced); returns the manifest."""
+    parts, cell_scores = load_export_dataset(path)
+    out = Path(out_dir)
+    tmp = out.with_name(f"{out.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    (tmp / "cells").mkdir(parents=True)
+
+    cell_ids, cells, template = {}, {}, None
+    for i, (s, d) in enumerate(c for c in parts.cells if parts.cell_size(*c) > 0):
+        fig = make_umap_plot(parts.cell(s, d), render_mode=render_mode, point_budget=point_budget)
+        fig.update_layout(height=PLOT_HEIGHT, margin=dict(l=5, r=5, t=30, b=5))
+        blob, template = encode_figure(fig)
+        cell_id = f"{i:02d}"
+        (tmp / "cells" / f"{cell_id}.bin").write_bytes(blob)
+        cell_ids[(s, d)] = cell_id
+        cells[cell_id] = {
+            "subset": s, "disruption": d,
+            "subset_label": full(SUBSET_META, s), "disruption_label": full(DISRUPTION_META, d),
+            "file": f"cells/{cell_id}.bin", "bytes": len(blob),
+        }
+    if not cells:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise ValueError(f"No rows in any (SUBSET, DISRUPTION) cell of {path}")
+
+    model = build_silhouette_pivot(cell_scores, list(SUBSET_ORDER), list(DISRUPTION_ORDER),
+                                   SUBSET_META, DISRUPTION_META, transpose=True, display="abbr")
+    manifest = {
+        "source": Path(path).name,
+        "version": parts.version,
+        "render_mode": render_mode,
+        "point_budget": point_budget,
+        "initial": next(iter(cells)),
+        "cells": cells,
+        "template": template,
+    }
+    (tmp / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+
+    config = json.dumps(manifest, separators=(",", ":")).replace("</", "<\\/")
+    index = (
+        Path(TEMPLATE_PATH).read_text(encoding="utf-8")
+        .replace("{{TITLE}}", html.escape(TITLE))
+        .replace("{{PLOT_HEIGHT}}", str(PLOT_HEIGHT))
+        .replace("{{ROW_H}}", str(ROW_H))
+        .replace("{{GRID_TABLE}}", grid_table_html(model, cell_ids))
+        .replace("{{CONFIG_JSON}}", config)
+    )
+    (tmp / "index.html").write_text(index, encoding="utf-8")
+    (tmp / "legend.html").write_text(render_legend_iframe_html(
+        template_path=LEGEND_TEMPLATE_PATH,
+        css_path=CSS_PATH,
+        show_colors=SHOW_COLORS,
+        disruption_meta=DISRUPTION_LEGEND_META,
+        disruption_order=DISRUPTION_ORDER,
+        subset_meta=SUBSET_LEGEND_META,
+        subset_order=SUBSET_LEGEND_ORDER,
+    ), encoding="utf-8")
+    shutil.copyfile(Path(plotly.__file__).parent / "package_data" / "plotly.min.js", tmp / "plotly.min.js")
+
+    shutil.rmtree(out, ignore_errors=True)
+    os.replace(tmp, out)
+    return manifest
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Export every cell as a static, backend-free bundle.")
+    ap.add_argument("path", nargs="?", default=DEFAULT_PATH, help="source CSV (default: %(default)s)")
+    ap.add_argument("--out", default="build/static", help="output directory (replaced)")
+    ap.add_argument("--mode", default="auto", choices=["auto", "webgl", "density"],
+                    help="render mode per cell, as in the app's View toggle")
+    ap.add_argument("--point-budget", type=int, default=DEFAULT_POINT_BUDGET)
+    args = ap.parse_args(argv)
+
+    manifest = export_static(args.path, args.out, render_mode=args.mode, point_budget=args.point_budget)
+    sizes = [c["bytes"] for c in manifest["cells"].values()]
+    print(f"exported {len(sizes)} cells to {args.out}: "
+          f"{sum(sizes) / 2**20:.2f} MB total, {max(sizes) / 1024:.0f} KB largest cell")
+
+
+if __name__ == "__main__":
+    main()
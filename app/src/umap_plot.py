@@ -1,17 +1,508 @@
-import plotly.express as px
+# src/umap_plot.py
+from __future__ import annotations
 
+import numpy as np
+import pandas as pd
+import plotly.colors
+import plotly.graph_objects as go
+import plotly.io as pio
+import streamlit as st
+
+from src.diagnostics import timed
+from src.label_meta import SHOW_COLORS
+
+# Above this many points per cell the WebGL path switches to a downsampled view
+DEFAULT_POINT_BUDGET = 50_000
+LOD_GRID_BINS = 64  # per-axis bins for density-preserving sampling
+
+# 'auto' switches from points to per-show density layers above this many points per cell
+DENSITY_THRESHOLD = 200_000
+DEFAULT_DENSITY_BINS = 128
+
+# overview (all cells in one figure): total points drawn, split across cells by size
+OVERVIEW_POINT_BUDGET = 40_000
+OVERVIEW_MIN_CELL_POINTS = 200
+OVERVIEW_ROW_HEIGHT = 120
+
+# animation frames are SVG scatters (WebGL traces don't tween between frames)
+ANIMATION_POINT_BUDGET = 5_000
+ANIMATION_FRAME_MS = 900
+TRACK_COLOR = "#111111"
+
+HOVER_COLS = ["SEASON", "EPISODE", "SIL_SCORE", "SUBSET", "DISRUPTION"]
+# WebGL path: per-point hover fields go out as a typed customdata array; fields that
+# are constant within a cell are written once into the hovertemplate instead.
+POINT_HOVER_COLS = ["SEASON", "EPISODE"]
+CELL_HOVER_COLS = ["SIL_SCORE", "SUBSET", "DISRUPTION"]
+
+
+def figure_payload_bytes(fig) -> int:
+    """Size of the JSON spec st.plotly_chart sends over the websocket for `fig`."""
+    return len(pio.to_json(fig, validate=False))
+
+
+def _compact(values: np.ndarray) -> np.ndarray:
+    # int16 when every value is integral and fits, float32 otherwise
+    v = np.asarray(values, dtype=np.float64)
+    if len(v) and np.isfinite(v).all() and (v % 1 == 0).all() and np.abs(v).max() <= np.iinfo(np.int16).max:
+        return v.astype(np.int16)
+    return v.astype(np.float32)
+
+
+def _is_constant(s: pd.Series) -> bool:
+    v = s.cat.codes.to_numpy() if isinstance(s.dtype, pd.CategoricalDtype) else s.to_numpy()
+    return len(v) == 0 or bool((v == v[0]).all())
+
+
+def _fmt(v) -> str:
+    return f"{v:.3f}" if isinstance(v, (float, np.floating)) else str(v)
+
+
+def show_color(label: str, i: int) -> str:
+    palette = plotly.colors.qualitative.Plotly
+    return SHOW_COLORS.get(label, palette[i % len(palette)])
+
+
+def stratified_sample(
+    x: np.ndarray,
+    y: np.ndarray,
+    groups: np.ndarray,
+    budget: int,
+    *,
+    bins: int = LOD_GRID_BINS,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    Indices of a density-preserving subsample of at most ~`budget` points.
+
+    Points are bucketed by (group, grid cell) over the x/y extent; every bucket keeps
+    the same fraction of its points, but at least one, so sparse regions and small
+    groups stay visible. Deterministic for a given seed (stable across reruns).
+    """
+    n = len(x)
+    if n <= budget:
+        return np.arange(n)
+
+    def _bin(v: np.ndarray) -> np.ndarray:
+        lo, hi = float(v.min()), float(v.max())
+        if hi <= lo:
+            return np.zeros(len(v), dtype=np.int64)
+        return np.minimum(((v - lo) / (hi - lo) * bins).astype(np.int64), bins - 1)
+
+    group_codes = pd.factorize(groups)[0].astype(np.int64)
+    stratum = (group_codes * bins + _bin(x)) * bins + _bin(y)
+
+    # random priority within each stratum, then keep the first `quota` of each
+    priority = np.random.default_rng(seed).random(n)
+    order = np.lexsort((priority, stratum))
+    s_sorted = stratum[order]
+
+    starts = np.flatnonzero(np.r_[True, s_sorted[1:] != s_sorted[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    rank = np.arange(n) - np.repeat(starts, counts)
+
+    rate = budget / n
+    quota = np.maximum(1, np.floor(counts * rate)).astype(np.int64)
+    keep = rank < np.repeat(quota, counts)
+    return np.sort(order[keep])
+
+
+def density_grid(
+    x: np.ndarray,
+    y: np.ndarray,
+    groups: np.ndarray,
+    bins: int = DEFAULT_DENSITY_BINS,
+) -> dict:
+    """
+    Per-group 2D histograms over the shared x/y extent, in one bincount pass.
+    Returns {'x_centers', 'y_centers', 'counts': {group: (bins, bins) array [y, x]}}.
+    Size depends on `bins` and the number of groups, not on the row count.
+    """
+    labels, codes = pd.unique(groups), pd.factorize(groups)[0]
+
+    def _edges(v: np.ndarray) -> np.ndarray:
+        lo, hi = (float(v.min()), float(v.max())) if len(v) else (0.0, 1.0)
+        if hi <= lo:
+            lo, hi = lo - 0.5, hi + 0.5
+        return np.linspace(lo, hi, bins + 1)
+
+    x_edges, y_edges = _edges(x), _edges(y)
+    bx = np.clip(np.searchsorted(x_edges, x, side="right") - 1, 0, bins - 1)
+    by = np.clip(np.searchsorted(y_edges, y, side="right") - 1, 0, bins - 1)
+
+    flat = (codes.astype(np.int64) * bins + by) * bins + bx
+    counts = np.bincount(flat, minlength=len(labels) * bins * bins).reshape(len(labels), bins, bins)
+
+    return {
+        "x_centers": (x_edges[:-1] + x_edges[1:]) / 2,
+        "y_centers": (y_edges[:-1] + y_edges[1:]) / 2,
+        "counts": {str(label): counts[i].astype(np.float32) for i, label in enumerate(labels)},
+    }
+
+
+def _cell_density(df_subset, bins: int) -> dict:
+    return density_grid(
+        df_subset["UMAP1"].to_numpy(dtype=np.float64),
+        df_subset["UMAP2"].to_numpy(dtype=np.float64),
+        df_subset["SHOW_LABEL"].astype(str).to_numpy(),
+        bins,
+    )
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def cached_cell_density(
+    data_version: str, subset_key: str, disruption_key: str, bins: int, _df_subset
+) -> dict:
+    """density_grid for one cell, cached per (dataset version, subset, disruption, bins)."""
+    return _cell_density(_df_subset, bins)
+
+
+def _rgba(hex_color: str, alpha: float) -> str:
+    h = hex_color.lstrip("#")
+    r, g, b = (int(h[i:i + 2], 16) for i in (0, 2, 4))
+    return f"rgba({r},{g},{b},{alpha})"
+
+
+def _viewport_mask(x: np.ndarray, y: np.ndarray, x_range, y_range) -> np.ndarray:
+    mask = np.ones(len(x), dtype=bool)
+    if x_range is not None:
+        mask &= (x >= x_range[0]) & (x <= x_range[1])
+    if y_range is not None:
+        mask &= (y >= y_range[0]) & (y <= y_range[1])
+    return mask
+
+
+def _make_svg_plot(df_subset):
+    import plotly.express as px  # ~70 ms to import; only the SVG path needs it
 
-def make_umap_plot(df_subset):
-    # df_subset should already be filtered to the selected (SUBSET, DISRUPTION)
     fig = px.scatter(
         df_subset,
         x="UMAP1",
         y="UMAP2",
         color="SHOW_LABEL",
-        hover_data=["SEASON", "EPISODE",
-                    "SIL_SCORE", "SUBSET", "DISRUPTION"],
+        hover_data=[c for c in HOVER_COLS if c in df_subset.columns],
         title=None
     )
+    fig.update_layout(meta={"n_total": len(df_subset), "n_shown": len(df_subset)})
+    return fig
+
+
+def _make_webgl_plot(df_subset, *, point_budget: int, x_range=None, y_range=None):
+    # float32 coordinates => 4-byte typed arrays on the wire instead of JSON float lists
+    x = df_subset["UMAP1"].to_numpy(dtype=np.float32)
+    y = df_subset["UMAP2"].to_numpy(dtype=np.float32)
+    labels = df_subset["SHOW_LABEL"].astype(str).to_numpy()
+    n_total = len(x)
+
+    # zoomed in: only points in the viewport count against the budget => more detail
+    idx = np.flatnonzero(_viewport_mask(x, y, x_range, y_range))
+    sample = stratified_sample(x[idx], y[idx], labels[idx], point_budget)
+    idx = idx[sample]
+
+    # cell-constant fields are sent once, as text; anything that does vary per point
+    # (e.g. per-point silhouette values) falls back to customdata
+    const_cols = [c for c in CELL_HOVER_COLS
+                  if c in df_subset.columns and _is_constant(df_subset[c])]
+    point_cols = [c for c in HOVER_COLS
+                  if c in df_subset.columns and c not in const_cols]
+    const_text = "".join(
+        f"<br>{c}={_fmt(df_subset[c].iloc[0])}" for c in const_cols) if n_total else ""
+
+    custom = None
+    if point_cols:
+        cols = [_compact(df_subset[c].to_numpy()[idx]) for c in point_cols]
+        dtype = np.int16 if all(c.dtype == np.int16 for c in cols) else np.float32
+        custom = np.column_stack(cols).astype(dtype)
+    hovertemplate = "UMAP1=%{x:.3f}<br>UMAP2=%{y:.3f}" + "".join(
+        f"<br>{c}=%{{customdata[{i}]}}" for i, c in enumerate(point_cols)) + const_text
+
+    fig = go.Figure()
+    for i, label in enumerate(pd.unique(labels)):
+        m = labels[idx] == label
+        fig.add_trace(go.Scattergl(
+            x=x[idx][m],
+            y=y[idx][m],
+            mode="markers",
+            name=label,
+            marker=dict(color=show_color(label, i), size=6),
+            customdata=custom[m] if custom is not None else None,
+            hovertemplate=f"SHOW_LABEL={label}<br>" + hovertemplate + "<extra></extra>",
+        ))
+
+    if x_range is not None:
+        fig.update_xaxes(range=list(x_range))
+    if y_range is not None:
+        fig.update_yaxes(range=list(y_range))
+    fig.update_layout(meta={"n_total": n_total, "n_shown": int(len(idx))})
+    return fig
+
+
+def _log_colorscale(color: str, zmax: float, steps: int = 8) -> list:
+    # raw counts in z (exact hover values), colored on a log1p scale via the stop positions
+    # (empty bins sit exactly at 0 and are fully transparent)
+    L = np.log1p(max(zmax, 1.0))
+    t = np.linspace(0.0, 1.0, steps)
+    pos = np.expm1(t * L) / np.expm1(L)
+    pos[0] = 0.5 / max(zmax, 1.0)
+    return [[0.0, _rgba(color, 0.0)]] + [
+        [float(p), _rgba(color, round(0.15 + 0.7 * float(ti), 3))] for p, ti in zip(pos, t)]
+
+
+def _make_density_plot(density: dict, n_total: int):
+    fig = go.Figure()
+    for i, (label, counts) in enumerate(density["counts"].items()):
+        color = show_color(label, i)
+        # empty bins => transparent, so overlapping shows stay readable; zeros rather
+        # than NaN keep the base64 payload small
+        z = counts.astype(np.float32)
+        zmax = float(counts.max()) if counts.size else 1.0
+        fig.add_trace(go.Heatmap(
+            x=density["x_centers"].astype(np.float32),
+            y=density["y_centers"].astype(np.float32),
+            z=z,
+            zmin=0.0,
+            zmax=zmax,
+            name=label,
+            colorscale=_log_colorscale(color, zmax),
+            showscale=False,
+            hovertemplate=f"SHOW_LABEL={label}<br>UMAP1=%{{x:.2f}}<br>UMAP2=%{{y:.2f}}<br>count=%{{z:.0f}}<extra></extra>",
+        ))
+    n_bins = sum(c.size for c in density["counts"].values())
+    fig.update_layout(meta={"n_total": n_total, "n_shown": 0, "n_bins": int(n_bins)})
+    return fig
+
+
+@timed("make_umap_plot")
+def make_umap_plot(
+    df_subset,
+    *,
+    render_mode: str = "webgl",  # 'webgl', 'svg', 'density' or 'auto'
+    point_budget: int = DEFAULT_POINT_BUDGET,
+    x_range: tuple[float, float] | None = None,
+    y_range: tuple[float, float] | None = None,
+    density_bins: int = DEFAULT_DENSITY_BINS,
+    density_threshold: int = DENSITY_THRESHOLD,
+    point_mode: str = "webgl",  # what 'auto' draws below the density threshold
+    # (data_version, subset_key, disruption_key): caches density aggregates per cell
+    cache_key: tuple[str, str, str] | None = None,
+):
+    """
+    df_subset should already be filtered to the selected (SUBSET, DISRUPTION).
+
+    'webgl' builds one Scattergl trace per show straight from NumPy arrays and, above
+    `point_budget`, draws a stratified subsample; passing the current x/y range
+    restricts the budget to the viewport, so zooming in refines the detail.
+    'density' sends per-show 2D histograms (`density_bins` per axis) as heatmap layers
+    instead of points; 'auto' uses it once the cell exceeds `density_threshold`.
+    `fig.layout.meta` holds {'n_total', 'n_shown'}.
+    """
+    if render_mode == "auto":
+        render_mode = "density" if len(df_subset) > density_threshold else point_mode
+
+    if render_mode == "density":
+        if cache_key is not None:
+            density = cached_cell_density(*cache_key, density_bins, df_subset)
+        else:
+            density = _cell_density(df_subset, density_bins)
+        fig = _make_density_plot(density, len(df_subset))
+        if x_range is not None:
+            fig.update_xaxes(range=list(x_range))
+        if y_range is not None:
+            fig.update_yaxes(range=list(y_range))
+    elif render_mode == "svg":
+        fig = _make_svg_plot(df_subset)
+    else:
+        fig = _make_webgl_plot(
+            df_subset, point_budget=point_budget, x_range=x_range, y_range=y_range)
     fig.update_layout(showlegend=False)
     fig.update_layout(height=300, margin=dict(l=10, r=10, t=50, b=10))
     return fig
+
+
+# -----------------------------
+# Overview: every cell as a subplot
+# -----------------------------
+def overview_budgets(sizes: list[int], point_budget: int, min_points: int = OVERVIEW_MIN_CELL_POINTS) -> list[int]:
+    """Per-cell point budgets: proportional to cell size, at least `min_points` (or the whole cell)."""
+    total = sum(sizes)
+    if total <= point_budget:
+        return list(sizes)
+    return [min(n, max(min_points, int(point_budget * n / total))) for n in sizes]
+
+
+@timed("make_overview_plot")
+def make_overview_plot(
+    cell_frames: dict[tuple[str, str], pd.DataFrame],
+    subset_order: list[str],
+    disruption_order: list[str],
+    *,
+    point_budget: int = OVERVIEW_POINT_BUDGET,
+    subset_labels: dict[str, str] | None = None,
+    disruption_labels: dict[str, str] | None = None,
+):
+    """
+    All cells in one figure: rows = subsets, cols = disruptions, shared axes.
+
+    One Scattergl trace per cell (shows are colored per point through small unsigned
+    codes and a stepped colorscale, not one trace per show), each stratified-sampled to
+    its share of `point_budget`. `fig.layout.meta["cells"][curve_number]` is the
+    (subset, disruption) of each trace, for mapping clicks back to cells.
+    """
+    from plotly.subplots import make_subplots
+
+    subset_labels = subset_labels or {}
+    disruption_labels = disruption_labels or {}
+    cells = [(s, d) for s in subset_order for d in disruption_order
+             if (s, d) in cell_frames and len(cell_frames[(s, d)])]
+
+    shows: list[str] = []
+    for c in cells:
+        for label in pd.unique(cell_frames[c]["SHOW_LABEL"].astype(str)):
+            if label not in shows:
+                shows.append(label)
+    code_of = {label: i for i, label in enumerate(shows)}
+    code_dtype = np.min_scalar_type(max(len(shows) - 1, 0))  # uint8 up to 256 shows, then wider
+    colors = [show_color(label, i) for i, label in enumerate(shows)]
+    n = max(len(colors), 1)
+    colorscale = ([[i / (n - 1), c] for i, c in enumerate(colors)] if n > 1
+                  else [[0.0, colors[0] if colors else "#888"], [1.0, colors[0] if colors else "#888"]])
+
+    fig = make_subplots(
+        rows=len(subset_order), cols=len(disruption_order),
+        shared_xaxes="all", shared_yaxes="all",
+        horizontal_spacing=0.01, vertical_spacing=0.012,
+        column_titles=[disruption_labels.get(d, d) for d in disruption_order],
+        row_titles=[subset_labels.get(s, s) for s in subset_order],
+    )
+    budgets = overview_budgets([len(cell_frames[c]) for c in cells], point_budget)
+    n_shown = 0
+    for (s, d), budget in zip(cells, budgets):
+        df = cell_frames[(s, d)]
+        x = df["UMAP1"].to_numpy(dtype=np.float32)
+        y = df["UMAP2"].to_numpy(dtype=np.float32)
+        labels = df["SHOW_LABEL"].astype(str).to_numpy()
+        idx = stratified_sample(x, y, labels, budget)
+        n_shown += len(idx)
+        codes = np.fromiter((code_of[v] for v in labels[idx]), dtype=code_dtype, count=len(idx))
+        fig.add_trace(go.Scattergl(
+            x=x[idx], y=y[idx], mode="markers", name=f"{s} / {d}",
+            marker=dict(size=3, color=codes, colorscale=colorscale, cmin=0, cmax=n - 1),
+            hovertemplate=f"{subset_labels.get(s, s)} / {disruption_labels.get(d, d)}<extra></extra>",
+        ), row=subset_order.index(s) + 1, col=disruption_order.index(d) + 1)
+
+    fig.update_xaxes(showticklabels=False, showgrid=False, zeroline=False)
+    fig.update_yaxes(showticklabels=False, showgrid=False, zeroline=False)
+    fig.update_annotations(font_size=11)
+    fig.update_layout(
+        showlegend=False, height=OVERVIEW_ROW_HEIGHT * len(subset_order), margin=dict(l=5, r=30, t=30, b=5),
+        meta={"n_total": int(sum(len(cell_frames[c]) for c in cells)), "n_shown": int(n_shown),
+              "cells": [list(c) for c in cells]})
+    return fig
+
+
+# -----------------------------
+# Episode tracking overlays / animation
+# -----------------------------
+def with_episode_overlay(
+    fig,
+    xs: np.ndarray,
+    ys: np.ndarray,
+    texts: list[str],
+    *,
+    name: str,
+    current: int,
+    trajectory: bool = False,
+):
+    """
+    Copy of `fig` (cached figures are shared; never mutate them) with one episode on
+    top: a marker at `current`, and with `trajectory` a path through all of
+    (xs, ys) labelled by `texts` (e.g. its position under each disruption).
+    """
+    out = go.Figure(data=list(fig.data), layout=fig.layout)
+    if trajectory and len(xs) > 1:
+        out.add_trace(go.Scatter(
+            x=np.asarray(xs, dtype=np.float32), y=np.asarray(ys, dtype=np.float32),
+            mode="lines+markers+text", text=texts, textposition="top center",
+            line=dict(color=TRACK_COLOR, width=2, dash="dot"),
+            marker=dict(color=TRACK_COLOR, size=7),
+            name=name, hovertemplate=f"{name}<br>%{{text}}<br>UMAP1=%{{x:.3f}}<br>UMAP2=%{{y:.3f}}<extra></extra>",
+        ))
+    out.add_trace(go.Scatter(
+        x=[float(xs[current])], y=[float(ys[current])], mode="markers",
+        marker=dict(symbol="star", size=18, color="#ffd400", line=dict(color=TRACK_COLOR, width=2)),
+        name=name, hovertemplate=f"{name}<br>{texts[current]}<extra></extra>",
+    ))
+    return out
+
+
+def with_placed_overlay(fig, xs: np.ndarray, ys: np.ndarray, texts: list[str]):
+    """Copy of `fig` with rings around out-of-sample placed points (src/placement.py)."""
+    out = go.Figure(data=list(fig.data), layout=fig.layout)
+    out.add_trace(go.Scattergl(
+        x=np.asarray(xs, dtype=np.float32), y=np.asarray(ys, dtype=np.float32), mode="markers",
+        text=texts, name="placed",
+        marker=dict(symbol="circle-open", size=11, color=TRACK_COLOR, line=dict(width=1.5)),
+        hovertemplate="%{text} (placed)<br>UMAP1=%{x:.3f}<br>UMAP2=%{y:.3f}<extra></extra>",
+    ))
+    return out
+
+
+def _extent(v: np.ndarray) -> list[float]:
+    if not v.size:
+        return [-1.0, 1.0]
+    lo, hi = float(v.min()), float(v.max())
+    pad = (hi - lo) * 0.03 or 0.5
+    return [lo - pad, hi + pad]
+
+
+@timed("make_animation")
+def make_disruption_animation(
+    frames_x: np.ndarray,
+    frames_y: np.ndarray,
+    labels: np.ndarray,
+    frame_names: list[str],
+    *,
+    point_budget: int = ANIMATION_POINT_BUDGET,
+    tracked: int | None = None,
+    tracked_name: str = "",
+):
+    """
+    Points moving between projections: row i of the (n, k) `frames_x` / `frames_y`
+    is the same episode under each of the k frames (one gather per frame from the
+    episode join index). Sampling is stratified on the first frame and kept for
+    all frames, so every point keeps its identity. `tracked` (a row) gets a marker.
+    """
+    n_total, k = frames_x.shape
+    idx = stratified_sample(frames_x[:, 0], frames_y[:, 0], labels, point_budget)
+    fx, fy, lab = frames_x[idx].astype(np.float32), frames_y[idx].astype(np.float32), labels[idx]
+    shows = list(pd.unique(lab))
+    masks = [lab == label for label in shows]
+
+    def traces(j: int) -> list:
+        out = [go.Scatter(x=fx[m, j], y=fy[m, j], mode="markers", name=label,
+                          marker=dict(color=show_color(label, i), size=5, opacity=0.75),
+                          hovertemplate=f"SHOW_LABEL={label}<extra></extra>")
+               for i, (label, m) in enumerate(zip(shows, masks))]
+        if tracked is not None:
+            out.append(go.Scatter(
+                x=[float(frames_x[tracked, j])], y=[float(frames_y[tracked, j])], mode="markers",
+                marker=dict(symbol="star", size=18, color="#ffd400", line=dict(color=TRACK_COLOR, width=2)),
+                name=tracked_name, hovertemplate=f"{tracked_name}<extra></extra>"))
+        return out
+
+    frames = [go.Frame(data=traces(j), name=name) for j, name in enumerate(frame_names)]
+    step_args = dict(mode="immediate", frame=dict(duration=ANIMATION_FRAME_MS, redraw=False),
+                     transition=dict(duration=ANIMATION_FRAME_MS * 2 // 3, easing="cubic-in-out"))
+    fig = go.Figure(data=traces(0), frames=frames)
+    fig.update_layout(
+        xaxis=dict(range=_extent(frames_x), autorange=False),
+        yaxis=dict(range=_extent(frames_y), autorange=False),
+        updatemenus=[dict(type="buttons", showactive=False, x=0, y=1.12, xanchor="left", direction="left",
+                          buttons=[dict(label="▶", method="animate", args=[None, {**step_args, "fromcurrent": True}]),
+                                   dict(label="❚❚", method="animate",
+                                        args=[[None], dict(mode="immediate", frame=dict(duration=0, redraw=False))])])],
+        sliders=[dict(active=0, x=0.12, len=0.88, y=1.14, yanchor="bottom", currentvalue=dict(visible=False),
+                      steps=[dict(label=name, method="animate", args=[[name], step_args]) for name in frame_names])],
+        meta={"n_total": int(n_total), "n_shown": int(len(idx)), "frames": k},
+    )
+    return fig
@@ -0,0 +1,85 @@
+# bench/cold_start.py
+"""
+Cold-start time to first paint: start a fresh `streamlit run app.py`, open one
+session and time server health, the first rendered element and the finished run.
+
+    python bench/cold_start.py --repeat 5
+    python bench/cold_start.py --configs compiled csv --out cold.json
+
+Configs: `compiled` (build-time artifact from src/compiled.py, built first if
+missing) and `csv` (USE_COMPILED_ARTIFACT=0: Parquet cache / CSV parse).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from st_client import APP_DIR, Session, free_port, start_server, stop_server, wait_healthy  # noqa: E402
+
+CONFIGS = {
+    "compiled": {"USE_COMPILED_ARTIFACT": "1"},
+    "csv": {"USE_COMPILED_ARTIFACT": "0"},
+}
+
+
+async def _first_session(port: int) -> dict:
+    s = Session(port)
+    await s.connect()
+    try:
+        r = await s.rerun()
+    finally:
+        await s.close()
+    return {"first_paint_s": r.first_delta_s, "first_run_s": r.finished_s, "bytes": r.bytes}
+
+
+def measure(env: dict) -> dict:
+    port = free_port()
+    t0 = time.perf_counter()
+    proc = start_server(port, env=env)
+    try:
+        healthy = wait_healthy(port, proc=proc)
+        run = asyncio.run(_first_session(port))
+    finally:
+        stop_server(proc)
+    # process start -> first paint, as a user hitting a scaled-to-zero instance sees it
+    return {"healthy_s": healthy, **run,
+            "to_first_paint_s": healthy + (run["first_paint_s"] or run["first_run_s"]),
+            "to_first_run_s": healthy + run["first_run_s"],
+            "wall_s": time.perf_counter() - t0}
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--configs", nargs="+", default=list(CONFIGS), choices=list(CONFIGS))
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--out", help="write results JSON here")
+    args = ap.parse_args(argv)
+
+    if "compiled" in args.configs:
+        subprocess.run([sys.executable, "-m", "src.compiled", *map(str, APP_DIR.glob("data/*.csv"))],
+                       cwd=APP_DIR, check=True, stdout=subprocess.DEVNULL)
+
+    results = {}
+    for name in args.configs:
+        runs = [measure(CONFIGS[name]) for _ in range(args.repeat)]
+        summary = {k: statistics.median(r[k] for r in runs)
+                   for k in ("healthy_s", "to_first_paint_s", "to_first_run_s")}
+        results[name] = {"median": summary, "runs": runs}
+        print(f"{name:<9} health {summary['healthy_s'] * 1e3:7.0f} ms · first paint "
+              f"{summary['to_first_paint_s'] * 1e3:7.0f} ms · first run {summary['to_first_run_s'] * 1e3:7.0f} ms")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2))
+        print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# bench/load_test.py
+"""
+Concurrent-session load test: start `streamlit run app.py` locally, open N headless
+websocket sessions and have each one click through grid cells like a viewer would
+(load the page, then cell clicks separated by think time, with the occasional full
+rerun). Reports rerun latency percentiles, throughput and server RSS (process tree,
+sampled) as N scales, per configuration.
+
+    python bench/load_test.py --sessions 1 5 10 25 50
+    python bench/load_test.py --configs default no-figure-cache svg --cpus 1 --out load.json
+    python bench/load_test.py --configs default --set SILHOUETTE_MODE=exact
+
+`--cpus 1` pins the server to one CPU, like a `--cpu 1` Cloud Run instance; RSS is
+checked against `--memory-mb` (2 GiB by default) the same way.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "app"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from src.label_meta import DISRUPTION_ORDER, SUBSET_ORDER  # noqa: E402
+from st_client import (  # noqa: E402
+    Session, free_port, start_server, stop_server, tree_rss_bytes, wait_healthy)
+
+CONFIGS = {
+    "default": {},
+    "no-figure-cache": {"FIGURE_CACHE_MB": "0"},
+    "svg": {"UMAP_RENDERER": "svg"},
+    "csv": {"USE_COMPILED_ARTIFACT": "0"},
+}
+CELLS = [(s, d) for s in SUBSET_ORDER for d in DISRUPTION_ORDER]
+
+
+class RssSampler:
+    """Background sampling of the server's process-tree RSS."""
+
+    def __init__(self, pid: int, interval: float = 0.25):
+        self.pid, self.interval = pid, interval
+        self.samples: list[int] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            rss = tree_rss_bytes(self.pid)
+            if rss is not None:
+                self.samples.append(rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> RssSampler:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+async def _viewer(port: int, clicks: int, think_s: float, full_rerun_p: float, seed: int,
+                  start_at: float, out: dict) -> None:
+    rng = random.Random(seed)
+    await asyncio.sleep(max(0.0, start_at - time.perf_counter()))
+    s = Session(port)
+    try:
+        await s.connect()
+        r = await s.rerun()
+        out["page_load_s"].append(r.finished_s)
+        for _ in range(clicks):
+            # exponential think time: bursts and lulls, not a lockstep
+            await asyncio.sleep(rng.expovariate(1.0 / think_s) if think_s > 0 else 0.0)
+            if rng.random() < full_rerun_p:
+                r = await s.rerun()
+                out["full_rerun_s"].append(r.finished_s)
+            else:
+                r = await s.click_cell(*rng.choice(CELLS))
+                out["click_s"].append(r.finished_s)
+            out["bytes"] += r.bytes
+    except Exception as e:  # a failed session is a data point, not a crash
+        out["errors"].append(f"{type(e).__name__}: {e}")
+    finally:
+        await s.close()
+
+
+async def _level(port: int, n: int, args) -> dict:
+    out = {"page_load_s": [], "click_s": [], "full_rerun_s": [], "errors": [], "bytes": 0}
+    t0 = time.perf_counter()
+    # sessions arrive over --ramp seconds rather than all in the same millisecond
+    await asyncio.gather(*[
+        _viewer(port, args.clicks, args.think, args.full_rerun_p, args.seed * 100_003 + i,
+                t0 + args.ramp * i / max(n - 1, 1), out)
+        for i in range(n)])
+    out["wall_s"] = time.perf_counter() - t0
+    return out
+
+
+def _pct(values: list[float]) -> dict:
+    if not values:
+        return {"n": 0}
+    v = np.asarray(values) * 1e3
+    return {"n": len(v), "p50_ms": float(np.percentile(v, 50)), "p95_ms": float(np.percentile(v, 95)),
+            "p99_ms": float(np.percentile(v, 99)), "max_ms": float(v.max())}
+
+
+def run_config(name: str, env: dict, args) -> list[dict]:
+    port = free_port()
+    proc = start_server(port, env=env, cpus=args.cpus,
+                        log_path=Path(args.log_dir) / f"{name}.log" if args.log_dir else None)
+    levels = []
+    try:
+        wait_healthy(port, proc=proc)
+        asyncio.run(_level(port, 1, argparse.Namespace(**{**vars(args), "clicks": 0})))  # warm-up load
+        for n in args.sessions:
+            with RssSampler(proc.pid) as rss:
+                out = asyncio.run(_level(port, n, args))
+            reruns = len(out["click_s"]) + len(out["full_rerun_s"]) + len(out["page_load_s"])
+            level = {
+                "config": name, "sessions": n,
+                "click": _pct(out["click_s"]), "full_rerun": _pct(out["full_rerun_s"]),
+                "page_load": _pct(out["page_load_s"]),
+                "throughput_rps": reruns / out["wall_s"] if out["wall_s"] else 0.0,
+                "mb_sent": out["bytes"] / 2**20,
+                "rss_peak_mb": max(rss.samples, default=0) / 2**20,
+                "rss_end_mb": (rss.samples[-1] if rss.samples else 0) / 2**20,
+                "errors": len(out["errors"]), "error_samples": out["errors"][:3],
+                "wall_s": out["wall_s"],
+            }
+            levels.append(level)
+            _print_level(level, args)
+    finally:
+        stop_server(proc)
+    return levels
+
+
+def _print_level(level: dict, args) -> None:
+    c = level["click"]
+    lat = (f"click p50 {c['p50_ms']:6.0f} p95 {c['p95_ms']:6.0f} p99 {c['p99_ms']:6.0f} ms"
+           if c["n"] else "click      (none)")
+    over = " OVER MEMORY" if level["rss_peak_mb"] > args.memory_mb else ""
+    print(f"{level['config']:<16} N={level['sessions']:<4} {lat} · page load p50 "
+          f"{level['page_load'].get('p50_ms', 0):6.0f} ms · {level['throughput_rps']:5.1f} reruns/s · "
+          f"RSS peak {level['rss_peak_mb']:6.0f} MB{over} · errors {level['errors']}")
+
+
+def capacity(levels: list[dict], slo_ms: float, memory_mb: float) -> int:
+    """Largest N whose click p95 meets the SLO, without errors or exceeding memory."""
+    ok = [lv["sessions"] for lv in levels
+          if lv["click"]["n"] and lv["click"]["p95_ms"] <= slo_ms and not lv["errors"]
+          and lv["rss_peak_mb"] <= memory_mb]
+    return max(ok, default=0)
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 25])
+    ap.add_argument("--configs", nargs="+", default=["default"], choices=list(CONFIGS))
+    ap.add_argument("--set", nargs="*", default=[], metavar="KEY=VALUE",
+                    help="extra environment for every config (e.g. UMAP_POINT_BUDGET=20000)")
+    ap.add_argument("--clicks", type=int, default=20, help="grid clicks per session")
+    ap.add_argument("--think", type=float, default=1.0, help="mean think time between clicks (s)")
+    ap.add_argument("--full-rerun-p", type=float, default=0.05,
+                    help="probability an interaction is a full rerun instead of a cell click")
+    ap.add_argument("--ramp", type=float, default=2.0, help="seconds over which sessions connect")
+    ap.add_argument("--cpus", type=int, help="pin the server to this many CPUs (Linux)")
+    ap.add_argument("--memory-mb", type=float, default=2048, help="instance memory to check RSS against")
+    ap.add_argument("--slo-ms", type=float, default=1000, help="click p95 target for the capacity line")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--log-dir", help="keep each server's log here")
+    ap.add_argument("--out", help="write results JSON here")
+    args = ap.parse_args(argv)
+    args.sessions = sorted(set(args.sessions))
+    extra = dict(kv.split("=", 1) for kv in args.set)
+    if args.log_dir:
+        Path(args.log_dir).mkdir(parents=True, exist_ok=True)
+
+    results = {}
+    for name in args.configs:
+        results[name] = run_config(name, {**CONFIGS[name], **extra}, args)
+
+    print()
+    for name, levels in results.items():
+        print(f"{name:<16} capacity at click p95 <= {args.slo_ms:.0f} ms: "
+              f"{capacity(levels, args.slo_ms, args.memory_mb)} sessions (of {args.sessions})")
+    if args.out:
+        Path(args.out).write_text(json.dumps({
+            "args": {k: v for k, v in vars(args).items()}, "results": results}, indent=2))
+        print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+# bench/run_bench.py
+"""
+Time each stage of the render path on synthetic datasets and write the results to JSON.
+
+    python bench/run_bench.py --rows 20000 200000 1000000
+    python bench/run_bench.py --rows 20000 --compare bench/results/<earlier>.json
+
+Stages: load (cold CSV -> Parquet, warm Parquet), validate/filter (partitioning),
+pivot (silhouette pivot + grid options), plot (make_umap_plot, WebGL and density, on
+the largest cell), legend (HTML), and - headless through Streamlit's AppTest - the
+first full run of app.py and the grid-click rerun round trip.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_DIR = ROOT / "app"
+sys.path.insert(0, str(APP_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import synth  # noqa: E402
+from src.data_io import artifact_path, file_signature, load_columnar  # noqa: E402
+from src.label_meta import (  # noqa: E402
+    DISRUPTION_LEGEND_META, DISRUPTION_META, DISRUPTION_ORDER, SHOW_COLORS, SUBSET_LEGEND_META,
+    SUBSET_LEGEND_ORDER, SUBSET_META, SUBSET_ORDER)
+from src.legend import render_legend_iframe_html  # noqa: E402
+from src.partitions import build_partitions  # noqa: E402
+from src.silhouette_grid import build_grid_options, build_silhouette_pivot  # noqa: E402
+from src.umap_plot import figure_payload_bytes, make_umap_plot  # noqa: E402
+
+RESULTS_DIR = ROOT / "bench" / "results"
+
+
+def _timed(fn, repeat: int) -> tuple[dict, object]:
+    times, out = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return {"median_s": float(np.median(times)), "min_s": float(min(times)), "runs": repeat}, out
+
+
+@contextmanager
+def _workspace(csv: Path):
+    """A throwaway copy of the app layout with `csv` at app.py's DEFAULT_PATH."""
+    default_path = re.search(r'^DEFAULT_PATH = "(.+)"', (APP_DIR / "app.py").read_text(), re.M).group(1)
+    with tempfile.TemporaryDirectory(prefix="sunny-bench-") as tmp:
+        ws = Path(tmp)
+        shutil.copy(APP_DIR / "app.py", ws / "app.py")
+        (ws / "src").symlink_to(APP_DIR / "src")
+        (ws / default_path).parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(csv, ws / default_path)  # multi-GB inputs: avoid a copy when possible
+        except OSError:
+            shutil.copy(csv, ws / default_path)
+        cwd = os.getcwd()
+        os.chdir(ws)
+        try:
+            yield ws
+        finally:
+            os.chdir(cwd)
+
+
+def bench_app(csv: Path, clicks: int) -> dict:
+    """First full run and grid-click reruns of app.py, headless."""
+    from streamlit.proto.WidgetStates_pb2 import WidgetStates
+    from streamlit.testing.v1 import AppTest
+
+    stages = {}
+    with _workspace(csv):
+        at = AppTest.from_file("app.py", default_timeout=600)
+        stages["app_first_run"], _ = _timed(at.run, 1)
+        if at.exception:
+            raise RuntimeError(f"app.py raised: {at.exception[0].message}")
+
+        grid = next(e for e in at.get("component_instance") if "grid" in e.proto.component_name.lower())
+        cells = [(s, d) for s in SUBSET_ORDER for d in DISRUPTION_ORDER]
+        times = []
+        for i in range(clicks):
+            subset, disruption = cells[(i + 1) % len(cells)]
+            ws = WidgetStates()
+            w = ws.widgets.add()
+            w.id = grid.proto.id
+            w.json_value = json.dumps({"subset": subset, "disruption": disruption})
+            t0 = time.perf_counter()
+            at._run(ws)
+            times.append(time.perf_counter() - t0)
+        if times:
+            stages["click_rerun"] = {
+                "median_s": float(np.median(times)), "min_s": float(min(times)),
+                "p95_s": float(np.percentile(times, 95)), "runs": len(times)}
+    return stages
+
+
+def bench_size(rows: int, args) -> dict:
+    workdir = Path(tempfile.mkdtemp(prefix="sunny-bench-data-"))
+    try:
+        csv = synth.write_dataset(workdir / f"synth_{rows}.csv", rows, seed=args.seed)
+        sig = file_signature(str(csv))
+        stages, payload = {}, {}
+
+        def cold():
+            artifact_path(str(csv)).unlink(missing_ok=True)
+            return load_columnar(str(csv), sig)
+
+        stages["load_cold"], df = _timed(cold, 1)
+        stages["load_warm"], df = _timed(lambda: load_columnar(str(csv), sig), args.repeat)
+        stages["validate_filter"], parts = _timed(
+            lambda: build_partitions(df, tuple(SUBSET_ORDER), tuple(DISRUPTION_ORDER)), args.repeat)
+
+        def pivot():
+            model = build_silhouette_pivot(parts.frame, SUBSET_ORDER, DISRUPTION_ORDER,
+                                           SUBSET_META, DISRUPTION_META, transpose=True, display="abbr")
+            model["grid_options"] = build_grid_options(model)
+            return model
+
+        stages["pivot"], model = _timed(pivot, args.repeat)
+        payload["grid_rows_bytes"] = len(model["pivot"].to_json(orient="records"))
+
+        cell = max(parts.cells, key=lambda c: parts.cell_size(*c))
+        df_cell = parts.cell(*cell)
+        for mode in ("webgl", "density"):
+            stages[f"plot_{mode}"], fig = _timed(lambda: make_umap_plot(df_cell, render_mode=mode), args.repeat)
+            payload[f"plot_{mode}_bytes"] = figure_payload_bytes(fig)
+
+        with _workspace(csv):
+            stages["legend"], html = _timed(lambda: render_legend_iframe_html(
+                template_path="src/templates/legend.html",
+                css_path="src/styles/app.css",
+                show_colors=SHOW_COLORS,
+                disruption_meta=DISRUPTION_LEGEND_META,
+                disruption_order=DISRUPTION_ORDER,
+                subset_meta=SUBSET_LEGEND_META,
+                subset_order=SUBSET_LEGEND_ORDER,
+            ), args.repeat)
+        payload["legend_bytes"] = len(html)
+
+        if not args.skip_app:
+            stages.update(bench_app(csv, args.clicks))
+
+        return {"rows": rows, "largest_cell_rows": parts.cell_size(*cell),
+                "dataset_bytes": parts.nbytes, "stages": stages, "payload": payload}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _meta() -> dict:
+    import pandas as pd
+    import plotly
+    import streamlit as st
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "versions": {"numpy": np.__version__, "pandas": pd.__version__,
+                     "plotly": plotly.__version__, "streamlit": st.__version__},
+    }
+
+
+def compare(current: dict, baseline: dict) -> None:
+    """Print median ratios (current / baseline) per size and stage."""
+    base = {r["rows"]: r["stages"] for r in baseline["results"]}
+    print(f"vs {baseline['meta']['commit']} ({baseline['meta']['timestamp']})")
+    for r in current["results"]:
+        if r["rows"] not in base:
+            continue
+        for stage, t in r["stages"].items():
+            b = base[r["rows"]].get(stage)
+            if b and b["median_s"] > 0:
+                print(f"  {r['rows']:>10,}  {stage:<16} {t['median_s'] * 1e3:9.1f} ms  x{t['median_s'] / b['median_s']:.2f}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, nargs="+", default=[20_000, 200_000])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--clicks", type=int, default=10, help="grid-click reruns per size")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--skip-app", action="store_true", help="only the per-stage timings, no AppTest")
+    ap.add_argument("--out", help="JSON path (default: bench/results/<timestamp>-<commit>.json)")
+    ap.add_argument("--compare", help="earlier results JSON to compare against")
+    args = ap.parse_args(argv)
+
+    results = {"meta": _meta(), "results": []}
+    for rows in args.rows:
+        print(f"{rows:,} rows…", flush=True)
+        r = bench_size(rows, args)
+        results["results"].append(r)
+        for stage, t in r["stages"].items():
+            print(f"  {stage:<16} {t['median_s'] * 1e3:9.1f} ms")
+
+    out = Path(args.out) if args.out else RESULTS_DIR / (
+        f"{results['meta']['timestamp'].replace(':', '')}-{results['meta']['commit']}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2))
+    print(f"wrote {out}")
+
+    if args.compare:
+        compare(results, json.loads(Path(args.compare).read_text()))
+
+
+if __name__ == "__main__":
+    main()
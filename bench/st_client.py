@@ -0,0 +1,175 @@
+# bench/st_client.py
+"""
+Minimal headless Streamlit client: start `streamlit run`, open browser-like websocket
+sessions and time script reruns (no browser needed). Shared by the cold-start and
+load-test tools.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from tornado.websocket import websocket_connect
+
+APP_DIR = Path(__file__).resolve().parents[1] / "app"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, *, env: dict | None = None, app_dir: Path = APP_DIR,
+                 log_path: str | os.PathLike | None = None, cpus: int | None = None) -> subprocess.Popen:
+    """`streamlit run app.py` on `port`; `cpus` pins it (and its workers) to that many CPUs (Linux)."""
+    cmd = [sys.executable, "-m", "streamlit", "run", "app.py",
+           "--server.headless", "true", "--server.port", str(port),
+           "--server.address", "127.0.0.1", "--browser.gatherUsageStats", "false",
+           "--server.fileWatcherType", "none"]
+    out = open(log_path, "w") if log_path else subprocess.DEVNULL
+    pin = None
+    if cpus is not None and hasattr(os, "sched_setaffinity"):
+        allowed = sorted(os.sched_getaffinity(0))[:cpus]
+        pin = lambda: os.sched_setaffinity(0, allowed)  # noqa: E731
+    return subprocess.Popen(cmd, cwd=app_dir, env={**os.environ, **(env or {})},
+                            stdout=out, stderr=subprocess.STDOUT, preexec_fn=pin)
+
+
+def wait_healthy(port: int, timeout: float = 60.0, proc: subprocess.Popen | None = None) -> float:
+    """Block until /_stcore/health answers; returns the time waited (s)."""
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"streamlit exited with {proc.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as r:
+                if r.status == 200:
+                    return time.perf_counter() - t0
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"streamlit on :{port} not healthy after {timeout}s")
+
+
+def stop_server(proc: subprocess.Popen) -> None:
+    proc.terminate()
+    try:
+        proc.wait(10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def tree_rss_bytes(pid: int) -> int | None:
+    """RSS of `pid` plus all its descendants (e.g. silhouette workers); Linux /proc only."""
+    children: dict[int, list[int]] = {}
+    try:
+        for entry in os.scandir("/proc"):
+            if not entry.name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry.name}/stat") as f:
+                    # "pid (comm) state ppid ..."; comm may contain spaces
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry.name))
+    except OSError:
+        return None
+    page = os.sysconf("SC_PAGE_SIZE")
+    total, stack = 0, [pid]
+    while stack:
+        p = stack.pop()
+        try:
+            with open(f"/proc/{p}/statm") as f:
+                total += int(f.read().split()[1]) * page
+        except (OSError, IndexError, ValueError):
+            continue
+        stack.extend(children.get(p, []))
+    return total
+
+
+@dataclass
+class RunResult:
+    first_delta_s: float | None
+    finished_s: float
+    deltas: int
+    bytes: int
+    status: int | None = None
+
+
+@dataclass
+class Session:
+    """One browser tab: a websocket plus the widget/fragment ids seen in its deltas."""
+    port: int
+    query_string: str = ""
+    ws: object = None
+    components: dict[str, dict] = field(default_factory=dict)  # component_name -> {id, fragment_id}
+
+    async def connect(self) -> None:
+        self.ws = await websocket_connect(f"ws://127.0.0.1:{self.port}/_stcore/stream",
+                                          max_message_size=256 * 2**20)
+
+    async def close(self) -> None:
+        if self.ws is not None:
+            self.ws.close()
+
+    async def rerun(self, widgets: list[tuple[str, str]] | None = None,
+                    fragment_id: str = "", timeout: float = 120.0) -> RunResult:
+        """Send a rerun (optionally with (widget_id, json_value) states) and read until it finishes."""
+        msg = BackMsg()
+        msg.rerun_script.query_string = self.query_string
+        msg.rerun_script.page_script_hash = ""
+        msg.rerun_script.fragment_id = fragment_id
+        for wid, value in widgets or []:
+            w = msg.rerun_script.widget_states.widgets.add()
+            w.id = wid
+            w.json_value = value
+
+        t0 = time.perf_counter()
+        await self.ws.write_message(msg.SerializeToString(), binary=True)
+        first, deltas, nbytes = None, 0, 0
+        while True:
+            raw = await asyncio.wait_for(self.ws.read_message(), timeout)
+            if raw is None:
+                raise ConnectionError("websocket closed mid-run")
+            nbytes += len(raw)
+            fwd = ForwardMsg()
+            fwd.ParseFromString(raw)
+            kind = fwd.WhichOneof("type")
+            if kind == "delta":
+                deltas += 1
+                if first is None:
+                    first = time.perf_counter() - t0
+                self._note_component(fwd)
+            elif kind == "script_finished":
+                return RunResult(first, time.perf_counter() - t0, deltas, nbytes, fwd.script_finished)
+
+    def _note_component(self, fwd: ForwardMsg) -> None:
+        delta = fwd.delta
+        if delta.WhichOneof("type") != "new_element":
+            return
+        el = delta.new_element
+        if el.WhichOneof("type") == "component_instance":
+            ci = el.component_instance
+            self.components[ci.component_name] = {"id": ci.id, "fragment_id": delta.fragment_id}
+
+    def component(self, name_contains: str) -> dict | None:
+        return next((v for k, v in self.components.items() if name_contains in k.lower()), None)
+
+    async def click_cell(self, subset: str, disruption: str) -> RunResult:
+        """What the silhouette grid sends on a cell click (a fragment rerun)."""
+        grid = self.component("grid")
+        if grid is None:
+            raise RuntimeError("no grid component seen yet; run the script first")
+        return await self.rerun([(grid["id"], json.dumps({"subset": subset, "disruption": disruption}))],
+                                fragment_id=grid["fragment_id"])
@@ -0,0 +1,110 @@
+# bench/synth.py
+"""
+Synthetic, schema-compatible datasets for benchmarking.
+
+    python bench/synth.py --rows 1000000 --out /tmp/umap_1m.csv
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+APP_DIR = Path(__file__).resolve().parents[1] / "app"
+sys.path.insert(0, str(APP_DIR))
+
+from src.label_meta import DISRUPTION_ORDER, SUBSET_ORDER  # noqa: E402
+
+# (SHOW, SHOW_LABEL) pairs as they appear in the real export
+KNOWN_SHOWS = [("southpark", "South Park"), ("asip", "Always Sunny"), ("office", "The Office")]
+COLUMNS = ["SHOW", "SEASON", "EPISODE", "UMAP1", "UMAP2", "SIL_SCORE", "SUBSET", "DISRUPTION", "SHOW_LABEL"]
+
+
+def _names(known: list, n: int, make) -> list:
+    return list(known[:n]) + [make(i) for i in range(len(known), n)]
+
+
+def make_cell(
+    n: int,
+    subset: str,
+    disruption: str,
+    shows: list[tuple[str, str]],
+    rng: np.random.Generator,
+    *,
+    with_sil: bool = True,
+) -> pd.DataFrame:
+    """One (SUBSET, DISRUPTION) cell: a Gaussian blob per show, with some overlap."""
+    show_idx = rng.integers(0, len(shows), n)
+    centers = rng.normal(scale=3.0, size=(len(shows), 2))
+    xy = centers[show_idx] + rng.normal(size=(n, 2))
+    df = pd.DataFrame({
+        "SHOW": [shows[i][0] for i in range(len(shows))],
+        "SHOW_LABEL": [shows[i][1] for i in range(len(shows))],
+    }).iloc[show_idx].reset_index(drop=True)
+    df["SEASON"] = rng.integers(1, 16, n)
+    df["EPISODE"] = rng.integers(1, 26, n)
+    df["UMAP1"] = xy[:, 0].astype(np.float32)
+    df["UMAP2"] = xy[:, 1].astype(np.float32)
+    df["SIL_SCORE"] = round(float(rng.uniform(-0.1, 0.4)), 6) if with_sil else np.nan
+    df["SUBSET"] = subset
+    df["DISRUPTION"] = disruption
+    cols = COLUMNS if with_sil else [c for c in COLUMNS if c != "SIL_SCORE"]
+    return df[cols]
+
+
+def iter_cells(
+    rows: int,
+    *,
+    n_shows: int = len(KNOWN_SHOWS),
+    n_subsets: int = len(SUBSET_ORDER),
+    n_disruptions: int = len(DISRUPTION_ORDER),
+    seed: int = 0,
+    with_sil: bool = True,
+):
+    """Yield one DataFrame per cell; `rows` are split evenly across cells."""
+    rng = np.random.default_rng(seed)
+    shows = _names(KNOWN_SHOWS, n_shows, lambda i: (f"show{i}", f"Show {i}"))
+    subsets = _names(SUBSET_ORDER, n_subsets, lambda i: f"Subset {i}")
+    disruptions = _names(DISRUPTION_ORDER, n_disruptions, lambda i: f"D{i}")
+    cells = [(s, d) for s in subsets for d in disruptions]
+    per_cell = np.full(len(cells), rows // len(cells))
+    per_cell[: rows % len(cells)] += 1
+    for (s, d), n in zip(cells, per_cell):
+        yield make_cell(int(n), s, d, shows, rng, with_sil=with_sil)
+
+
+def make_dataset(rows: int, **kwargs) -> pd.DataFrame:
+    return pd.concat(iter_cells(rows, **kwargs), ignore_index=True)
+
+
+def write_dataset(path: str | Path, rows: int, **kwargs) -> Path:
+    """Stream cells to a CSV (or TSV for .tsv/.txt), so 10M rows never sit in memory at once."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    sep = "\t" if path.suffix in (".tsv", ".txt") else ","
+    with open(path, "w", newline="") as f:
+        for i, cell in enumerate(iter_cells(rows, **kwargs)):
+            cell.to_csv(f, sep=sep, index=False, header=(i == 0))
+    return path
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=20_000)
+    ap.add_argument("--shows", type=int, default=len(KNOWN_SHOWS))
+    ap.add_argument("--subsets", type=int, default=len(SUBSET_ORDER))
+    ap.add_argument("--disruptions", type=int, default=len(DISRUPTION_ORDER))
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--no-sil", action="store_true", help="omit SIL_SCORE (exercises the in-app engine)")
+    ap.add_argument("--out", required=True)
+    args = ap.parse_args(argv)
+    out = write_dataset(args.out, args.rows, n_shows=args.shows, n_subsets=args.subsets,
+                        n_disruptions=args.disruptions, seed=args.seed, with_sil=not args.no_sil)
+    print(f"wrote {args.rows:,} rows to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# tests/conftest.py
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+APP_DIR = Path(__file__).resolve().parents[1] / "app"
+sys.path.insert(0, str(APP_DIR))
+
+from src.data_io import compact_dtypes  # noqa: E402
+from src.partitions import build_partitions  # noqa: E402
+
+SUBSETS = ("S1", "S2")
+DISRUPTIONS = ("D1", "D2", "D3")
+SHOWS = (("asip", "Always Sunny"), ("southpark", "South Park"), ("office", "The Office"))
+
+
+def synth_frame(
+    n: int,
+    *,
+    seed: int = 0,
+    subsets: tuple[str, ...] = SUBSETS,
+    disruptions: tuple[str, ...] = DISRUPTIONS,
+    with_sil: bool = True,
+    unknown: int = 0,
+) -> pd.DataFrame:
+    """
+    `n` rows spread over subsets x disruptions (one Gaussian blob per show, per-cell
+    SIL_SCORE like the pipeline's export), plus `unknown` rows in a cell the app
+    doesn't know. Compact dtypes, as the loaders produce.
+    """
+    rng = np.random.default_rng(seed)
+    show = rng.integers(0, len(SHOWS), n + unknown)
+    centers = rng.normal(scale=3.0, size=(len(SHOWS), 2))
+    xy = centers[show] + rng.normal(size=(n + unknown, 2))
+    subset = np.array(list(subsets) + ["Other"])[
+        np.r_[rng.integers(0, len(subsets), n), np.full(unknown, len(subsets))]]
+    disruption = np.array(disruptions)[rng.integers(0, len(disruptions), n + unknown)]
+    df = pd.DataFrame({
+        "SHOW": [SHOWS[i][0] for i in show],
+        "SEASON": rng.integers(1, 6, n + unknown),
+        "EPISODE": rng.integers(1, 21, n + unknown),
+        "UMAP1": xy[:, 0],
+        "UMAP2": xy[:, 1],
+        "SUBSET": subset,
+        "DISRUPTION": disruption,
+        "SHOW_LABEL": [SHOWS[i][1] for i in show],
+    })
+    if with_sil:
+        cell_score = {(s, d): round(float(rng.uniform(-0.1, 0.4)), 4)
+                      for s in [*subsets, "Other"] for d in disruptions}
+        df.insert(5, "SIL_SCORE", [cell_score[c] for c in zip(subset, disruption)])
+    return compact_dtypes(df)
+
+
+@pytest.fixture
+def frame() -> pd.DataFrame:
+    return synth_frame(900, unknown=25)
+
+
+@pytest.fixture
+def parts(frame):
+    return build_partitions(frame, SUBSETS, DISRUPTIONS, version="v1")
+
+
+@pytest.fixture
+def in_app_dir(monkeypatch) -> Path:
+    # templates and styles are resolved relative to app/, as under `streamlit run`
+    monkeypatch.chdir(APP_DIR)
+    return APP_DIR
@@ -0,0 +1,44 @@
+# tests/test_compiled.py
+from __future__ import annotations
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DISRUPTIONS, SUBSETS, synth_frame
+from src.compiled import MANIFEST, compile_dataset, load_compiled
+from src.data_io import compact_dtypes
+from src.partitions import build_partitions
+from src.silhouette import compute_cell_scores
+
+
+@pytest.mark.parametrize("with_sil", [True, False])
+def test_compiled_artifact_loads_the_same_dataset(tmp_path, with_sil):
+    path = str(tmp_path / "umap.csv")
+    synth_frame(600, seed=4, with_sil=with_sil).to_csv(path, index=False)
+    out = compile_dataset(path, SUBSETS, DISRUPTIONS)
+    parts = load_compiled(path, SUBSETS, DISRUPTIONS)
+    expected = build_partitions(compact_dtypes(pd.read_csv(path)), SUBSETS, DISRUPTIONS)
+
+    assert parts.offsets == expected.offsets
+    for c in expected.frame.columns:
+        np.testing.assert_array_equal(np.asarray(parts.frame[c]), np.asarray(expected.frame[c]))
+    # a missing SIL_SCORE is filled at build time, one score per cell
+    sil = parts.frame["SIL_SCORE"].to_numpy()
+    if not with_sil:
+        for cell, score in compute_cell_scores(expected, max_workers=1).items():
+            start, stop = parts.cell_range(*cell)
+            assert sil[start:stop] == pytest.approx(np.full(stop - start, score), abs=1e-6)
+    assert "cell_scores" not in json.loads((out / MANIFEST).read_text())
+
+
+def test_stale_artifact_is_ignored(tmp_path):
+    path = str(tmp_path / "umap.csv")
+    df = synth_frame(200, seed=5)
+    df.to_csv(path, index=False)
+    compile_dataset(path, SUBSETS, DISRUPTIONS)
+    df.iloc[:100].to_csv(path, index=False)
+    assert load_compiled(path, SUBSETS, DISRUPTIONS) is None
+    assert load_compiled(str(tmp_path / "missing.csv"), SUBSETS, DISRUPTIONS) is None
@@ -0,0 +1,37 @@
+# tests/test_data_io.py
+from __future__ import annotations
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.data_io import artifact_path, compact_dtypes, file_signature, load_columnar
+
+
+def test_compact_dtypes():
+    df = compact_dtypes(pd.DataFrame({
+        "SHOW_LABEL": ["A", None, "B", np.nan],
+        "UMAP1": [1.0, 2.0, 3.0, 4.0],
+        "SEASON": [1, 2, 3, 4],
+        "EPISODE": [1, 2, None, 4],
+        "EMB_0": ["0.5", "x", "1", "2"],
+        "NOTES": ["a", "b", "c", "d"],
+    }))
+    assert list(df["SHOW_LABEL"].cat.categories) == ["A", "B"]  # missing stays missing
+    assert df["SHOW_LABEL"].isna().sum() == 2
+    assert df["UMAP1"].dtype == np.float32 and df["EMB_0"].dtype == np.float32
+    assert df["SEASON"].dtype == np.int16 and df["EPISODE"].dtype == np.float32
+    assert np.isnan(df["EMB_0"].iloc[1]) and df["NOTES"].dtype == object
+
+
+def test_columnar_artifact_follows_the_source(tmp_path):
+    path = str(tmp_path / "umap.csv")
+    pd.DataFrame({"SHOW_LABEL": ["A", "B"], "UMAP1": [1.0, 2.0]}).to_csv(path, index=False)
+    first = load_columnar(path, file_signature(path))
+    assert artifact_path(path).exists()
+    assert load_columnar(path, file_signature(path)).equals(first)
+
+    pd.DataFrame({"SHOW_LABEL": ["C"], "UMAP1": [3.0]}).to_csv(path, index=False)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+    assert list(load_columnar(path, file_signature(path))["SHOW_LABEL"]) == ["C"]
@@ -0,0 +1,41 @@
+# tests/test_episodes.py
+from __future__ import annotations
+
+import numpy as np
+
+from conftest import DISRUPTIONS, SUBSETS
+from src.episodes import build_episode_index
+from src.partitions import build_partitions
+
+
+def test_rows_follow_each_episode_across_cells(frame):
+    frame = frame.drop_duplicates(["SHOW", "SEASON", "EPISODE", "SUBSET", "DISRUPTION"])
+    parts = build_partitions(frame, SUBSETS, DISRUPTIONS)
+    index = build_episode_index(parts)
+    keys = parts.frame[["SHOW", "SEASON", "EPISODE"]].astype(str).agg("|".join, axis=1).to_numpy()
+    cells = [(SUBSETS[0], d) for d in DISRUPTIONS]
+    for row in range(0, len(parts), 37):
+        episode = index.episode_of(row)
+        rows = index.rows(episode, cells)
+        for cell, r in zip(cells, rows):
+            start, stop = parts.cell_range(*cell)
+            expected = np.flatnonzero(keys[start:stop] == keys[row])
+            assert (r == -1) if not len(expected) else (r == start + expected[0])
+
+
+def test_complete_is_episodes_present_everywhere(parts):
+    index = build_episode_index(parts)
+    cells = [(SUBSETS[1], d) for d in DISRUPTIONS]
+    ids, rows = index.complete(cells)
+    assert rows.shape == (len(ids), len(cells)) and (rows >= 0).all()
+    present = (index.positions[:, index.cell_columns(cells)] >= 0).all(axis=1)
+    np.testing.assert_array_equal(ids, np.flatnonzero(present))
+
+
+def test_search_matches_every_word_ignoring_case(parts):
+    index = build_episode_index(parts)
+    hits = index.search("south  s02", limit=len(index))
+    expected = [e for e, label in enumerate(index.labels) if "South Park S02" in label]
+    assert hits == expected and hits
+    assert index.search("SOUTH s02", limit=3) == expected[:3]
+    assert index.search("   ", limit=10) == [] and index.search("nope", limit=10) == []
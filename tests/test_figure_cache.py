@@ -0,0 +1,49 @@
+# tests/test_figure_cache.py
+from __future__ import annotations
+
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from src.figure_cache import FigureCache
+
+
+def _fig(i: int) -> go.Figure:
+    return go.Figure(go.Scatter(x=[i, i + 1], y=[0, 1]))
+
+
+def _drain(cache: FigureCache) -> None:
+    with cache._lock:
+        pending = list(cache._inflight.values())
+    for f in pending:
+        f.result()
+
+
+def test_each_group_is_prewarmed_once():
+    cache = FigureCache()
+    assert cache.prewarm("v1", [(("v1", i), lambda i=i: _fig(i)) for i in range(3)]) == 3
+    _drain(cache)
+    assert cache.prewarm("v1", [(("v1", i), lambda i=i: _fig(i)) for i in range(3)]) == 0
+    assert all(cache.get(("v1", i)) is not None for i in range(3))
+
+
+def test_groups_are_forgotten_once_their_figures_are_evicted():
+    one = len(pio.to_json(_fig(0), validate=False))
+    cache = FigureCache(max_bytes=int(one * 1.5))  # room for a single figure
+    for v in range(20):
+        cache.prewarm(f"v{v}", [((f"v{v}", 0), lambda v=v: _fig(v))])
+        _drain(cache)
+    assert set(cache._prewarmed) == {"v19"}
+
+    # an evicted group is prewarmed again instead of being skipped forever
+    assert cache.prewarm("v0", [(("v0", 0), lambda: _fig(0))]) == 1
+
+
+def test_failed_builds_do_not_pin_their_group():
+    cache = FigureCache()
+
+    def fail() -> go.Figure:
+        raise RuntimeError("boom")
+
+    cache.prewarm("v1", [(("v1", 0), fail)])
+    _drain(cache)
+    assert "v1" not in cache._prewarmed
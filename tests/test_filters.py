@@ -0,0 +1,117 @@
+# tests/test_filters.py
+from __future__ import annotations
+
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.filters import FilterSpec, apply_filter, build_filter_index, rescore_filtered
+from src.silhouette import compute_cell_scores, fill_silhouette, needs_silhouette
+
+SPECS = [
+    FilterSpec(seasons=(2, 4)),
+    FilterSpec(episodes=(5, 5)),
+    FilterSpec(shows=("South Park",)),
+    FilterSpec(seasons=(1, 3), episodes=(10, 20), shows=("The Office", "Always Sunny")),
+    FilterSpec(seasons=(9, 12)),          # nothing matches
+    FilterSpec(shows=("Not A Show",)),
+]
+
+
+def pandas_mask(df: pd.DataFrame, spec: FilterSpec) -> np.ndarray:
+    mask = np.ones(len(df), dtype=bool)
+    for col, (lo, hi) in spec.ranges().items():
+        mask &= df[col].between(lo, hi).to_numpy()
+    if spec.shows is not None:
+        mask &= df["SHOW_LABEL"].isin(spec.shows).to_numpy()
+    return mask
+
+
+@pytest.mark.parametrize("spec", SPECS, ids=lambda s: s.key)
+def test_cell_bitmaps_match_a_pandas_mask(parts, spec):
+    index = build_filter_index(parts)
+    codes = index.show_codes(spec.shows)
+    for cell in parts.cells:
+        ids = index.cells[cell].rows(spec, codes)
+        np.testing.assert_array_equal(ids, np.flatnonzero(pandas_mask(parts.cell(*cell), spec)))
+
+
+@pytest.mark.parametrize("spec", SPECS, ids=lambda s: s.key)
+def test_apply_filter_matches_a_pandas_scan(parts, spec):
+    filtered, changed = apply_filter(parts, build_filter_index(parts), spec)
+    for cell in parts.cells:
+        cell_df = parts.cell(*cell)
+        expected = cell_df[pandas_mask(cell_df, spec)].reset_index(drop=True)
+        pd.testing.assert_frame_equal(filtered.cell(*cell).reset_index(drop=True), expected)
+        if len(expected) == len(cell_df):
+            assert cell not in changed and filtered.cell_version(*cell) == parts.cell_version(*cell)
+        else:
+            assert cell in changed and filtered.cell_version(*cell) == filtered.version
+
+
+def test_inactive_spec_selects_everything(parts):
+    spec = FilterSpec()
+    assert not spec.active
+    index = build_filter_index(parts)
+    assert all(index.cells[c].rows(spec, None) is None for c in parts.cells)
+
+
+def test_index_bounds_and_shows(frame, parts):
+    index = build_filter_index(parts)
+    assert index.shows == tuple(parts.frame["SHOW_LABEL"].cat.categories)
+    assert index.bounds["SEASON"] == (parts.frame["SEASON"].min(), parts.frame["SEASON"].max())
+
+
+def test_spec_key_is_order_independent():
+    a = FilterSpec(seasons=(1, 2), shows=("b", "a"))
+    b = FilterSpec(seasons=(1, 2), shows=("a", "b"))
+    assert a.key == b.key == "s1-2;shows=a,b"
+
+
+# -----------------------------
+# SIL_SCORE of filtered cells
+# -----------------------------
+SHOW_FILTER = FilterSpec(shows=("South Park", "The Office"))
+
+
+def _scores(parts, cells):
+    col = parts.frame["SIL_SCORE"].to_numpy()
+    return {c: col[parts.cell_range(*c)[0]] for c in cells if parts.cell_size(*c)}
+
+
+def test_file_scores_are_kept_and_marked_stale(parts):
+    filtered, changed = apply_filter(parts, build_filter_index(parts), SHOW_FILTER)
+    rescored = rescore_filtered(filtered, changed, mode="exact", max_workers=1)
+    assert changed and rescored.stale_cells == frozenset(changed)
+    np.testing.assert_array_equal(rescored.frame["SIL_SCORE"].to_numpy(), filtered.frame["SIL_SCORE"].to_numpy())
+
+
+def test_app_scores_are_recomputed_for_changed_cells(parts):
+    scored = fill_silhouette(parts, max_workers=1)
+    filtered, changed = apply_filter(scored, build_filter_index(scored), SHOW_FILTER)
+    rescored = rescore_filtered(filtered, changed, mode="exact", max_workers=1)
+    exact = compute_cell_scores(rescored, max_workers=1)
+    got = _scores(rescored, rescored.cells)
+    for cell, score in got.items():
+        expected = exact[cell] if cell in changed else _scores(scored, [cell])[cell]
+        assert score == pytest.approx(expected, abs=1e-5)
+    assert not rescored.stale_cells
+
+
+def test_approximate_mode_leaves_filtered_cells_to_the_refiner(parts):
+    scored = fill_silhouette(parts, max_workers=1)
+    filtered, changed = apply_filter(scored, build_filter_index(scored), SHOW_FILTER)
+    assert needs_silhouette(rescore_filtered(filtered, changed, mode="approx"))
+
+
+@pytest.mark.parametrize("spec", SPECS, ids=lambda s: s.key)
+def test_placed_rows_follow_the_filter(parts, spec):
+    placed = replace(parts, placed={c: min(5, parts.cell_size(*c)) for c in parts.cells})
+    filtered, _ = apply_filter(placed, build_filter_index(placed), spec)
+    for cell in parts.cells:
+        tail = placed.placed_rows(*cell)
+        expected = tail[pandas_mask(tail, spec)].reset_index(drop=True)
+        assert filtered.placed.get(cell, 0) == len(expected)
+        pd.testing.assert_frame_equal(filtered.placed_rows(*cell).reset_index(drop=True), expected)
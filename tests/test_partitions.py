@@ -0,0 +1,50 @@
+# tests/test_partitions.py
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DISRUPTIONS, SUBSETS
+
+
+def test_offsets_tile_the_frame_in_cell_order(parts):
+    ranges = [parts.offsets[(s, d)] for s in SUBSETS for d in DISRUPTIONS]
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(parts)
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+
+
+def test_cells_hold_exactly_their_rows_in_file_order(frame, parts):
+    known = frame[frame["SUBSET"].isin(SUBSETS)]
+    assert len(parts) == len(known)  # rows in unknown cells are dropped
+    for s, d in parts.cells:
+        expected = known[(known["SUBSET"] == s) & (known["DISRUPTION"] == d)].reset_index(drop=True)
+        got = parts.cell(s, d).reset_index(drop=True)
+        pd.testing.assert_frame_equal(got, expected, check_categorical=False)
+
+
+def test_cell_arrays_and_frame(parts):
+    s, d = SUBSETS[1], DISRUPTIONS[2]
+    start, stop = parts.cell_range(s, d)
+    np.testing.assert_array_equal(parts.cell_arrays(s, d, ["UMAP1"])["UMAP1"],
+                                  parts.frame["UMAP1"].to_numpy()[start:stop])
+    cf = parts.cell_frame("SIL_SCORE")
+    assert len(cf) == sum(parts.cell_size(*c) > 0 for c in parts.cells)
+    row = cf[(cf["SUBSET"] == s) & (cf["DISRUPTION"] == d)]
+    assert row["SIL_SCORE"].item() == parts.frame["SIL_SCORE"].iloc[start]
+
+
+def test_unknown_cell_is_empty(parts):
+    assert parts.cell_range("nope", DISRUPTIONS[0]) == (0, 0)
+    assert parts.cell_size("nope", DISRUPTIONS[0]) == 0
+
+
+def test_columns_are_read_only(parts):
+    with pytest.raises(ValueError):
+        parts.frame["UMAP1"].to_numpy()[0] = 1.0
+    with pytest.raises(ValueError):
+        parts.frame["SHOW_LABEL"].cat.codes.to_numpy()[0] = 0
+
+
+def test_cell_versions_default_to_the_dataset_version(parts):
+    assert parts.cell_version(*parts.cells[0]) == "v1"
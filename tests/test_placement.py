@@ -0,0 +1,96 @@
+# tests/test_placement.py
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DISRUPTIONS, SUBSETS
+from src.data_io import IngestError, compact_dtypes
+from src.partitions import build_partitions
+from src.placement import EmbeddingIndex, interpolate, place_into, place_rows
+
+DIM = 12
+
+
+@pytest.fixture
+def embedded(frame):
+    # embeddings whose first two dimensions are the layout, so placement has a right answer
+    rng = np.random.default_rng(5)
+    emb = np.column_stack([frame["UMAP1"], frame["UMAP2"], rng.normal(scale=0.01, size=(len(frame), DIM - 2))])
+    df = frame.assign(**{f"EMB_{i}": emb[:, i] for i in range(DIM)})
+    return compact_dtypes(df)
+
+
+@pytest.mark.parametrize("metric", ["euclidean", "cosine"])
+def test_knn_matches_brute_force(metric):
+    rng = np.random.default_rng(0)
+    vectors, queries = rng.normal(size=(500, DIM)), rng.normal(size=(40, DIM))
+    if metric == "cosine":
+        unit = lambda v: v / np.linalg.norm(v, axis=1, keepdims=True)  # noqa: E731
+        d = 1 - unit(queries) @ unit(vectors).T
+    else:
+        d = np.linalg.norm(queries[:, None, :] - vectors[None, :, :], axis=-1)
+    ids, dist = EmbeddingIndex(vectors, metric=metric).knn(queries, 7, block_rows=9)
+    np.testing.assert_array_equal(ids, np.argsort(d, axis=1, kind="stable")[:, :7])
+    assert (np.diff(dist, axis=1) >= 0).all()
+
+
+def test_k_larger_than_the_index():
+    ids, dist = EmbeddingIndex(np.eye(3)).knn(np.eye(3)[:1], 10)
+    assert ids.shape == (1, 3) and ids[0, 0] == 0 and dist[0, 0] == 0
+
+
+def test_exact_match_lands_on_its_neighbour():
+    ids, dist = np.array([[2, 0]]), np.array([[0.0, 1.0]])
+    x, y = interpolate(ids, dist, np.array([0.0, 1.0, 5.0]), np.array([0.0, 1.0, -5.0]))
+    assert (x[0], y[0]) == pytest.approx((5.0, -5.0))
+
+
+def test_placed_rows_land_near_their_true_position(embedded):
+    parts = build_partitions(embedded.iloc[:800], SUBSETS, DISRUPTIONS, version="v1")
+    new = embedded.iloc[800:]
+    new = new[new["SUBSET"].isin(SUBSETS)]
+    placed, skipped = place_rows(parts, new, k=5)
+    assert skipped == 0
+    err = np.hypot(placed["UMAP1"].to_numpy() - new["UMAP1"].to_numpy(),
+                   placed["UMAP2"].to_numpy() - new["UMAP2"].to_numpy())
+    assert np.median(err) < 0.5
+
+
+def test_place_into_appends_to_the_right_cells(embedded):
+    parts = build_partitions(embedded.iloc[:800], SUBSETS, DISRUPTIONS, version="v1")
+    new = embedded.iloc[800:].reset_index(drop=True)
+    placement = place_into(parts, new, "v1+placed", k=5)
+    known = new[new["SUBSET"].isin(SUBSETS)]
+    assert sum(placement.placed.values()) == len(known)
+    assert placement.skipped == len(new) - len(known)  # rows in a cell the dataset doesn't have
+    assert placement.parts.placed == placement.placed
+    for (s, d), n in placement.placed.items():
+        rows = placement.parts.placed_rows(s, d)
+        expected = known[(known["SUBSET"] == s) & (known["DISRUPTION"] == d)]
+        assert len(rows) == n
+        np.testing.assert_array_equal(rows["SHOW_LABEL"].astype(str), expected["SHOW_LABEL"].astype(str))
+
+
+def test_rows_without_a_usable_embedding_are_skipped(embedded):
+    parts = build_partitions(embedded.iloc[:800], SUBSETS, DISRUPTIONS, version="v1")
+    new = embedded.iloc[800:810].copy()
+    new["SUBSET"] = pd.Categorical([SUBSETS[0]] * 10)
+    new.loc[new.index[:3], "EMB_4"] = np.nan
+    placed, skipped = place_rows(parts, new)
+    assert (len(placed), skipped) == (7, 3)
+
+
+def test_dataset_without_embeddings(frame):
+    parts = build_partitions(frame, SUBSETS, DISRUPTIONS)
+    with pytest.raises(IngestError, match="no embedding columns"):
+        place_rows(parts, frame.iloc[:5])
+
+
+def test_upload_columns_outside_the_dataset_are_dropped(embedded):
+    parts = build_partitions(embedded.iloc[:800], SUBSETS, DISRUPTIONS, version="v1")
+    new = embedded.iloc[800:].assign(NOTES="rewatch").reset_index(drop=True)
+    placement = place_into(parts, new, "v1+placed", k=5)
+    assert list(placement.parts.frame.columns) == list(parts.frame.columns)
+    assert sum(placement.placed.values()) == len(new) - placement.skipped
@@ -0,0 +1,203 @@
+# tests/test_refresh.py
+from __future__ import annotations
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DISRUPTIONS, SUBSETS, synth_frame
+from src.catalog import entry_for_path
+from src.data_io import compact_dtypes
+from src.dataset import read_path_dataset
+from src.partitions import build_partitions
+from src.refresh import append_rows, refresh_appended, rescore_appended, track
+
+REQUIRED = ("DISRUPTION", "SHOW_LABEL", "SUBSET", "UMAP1", "UMAP2")
+
+
+def _write(path, df, *, append=False):
+    with open(path, "a" if append else "w", newline="") as f:
+        df.to_csv(f, index=False, header=not append)
+    st = os.stat(path)
+    # appends within one mtime tick must still look like a new version
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+
+def _assert_same_dataset(got, expected):
+    assert got.offsets == expected.offsets
+    for cell in expected.cells:
+        pd.testing.assert_frame_equal(got.cell(*cell).reset_index(drop=True),
+                                      expected.cell(*cell).reset_index(drop=True), check_categorical=False)
+
+
+def test_append_rows_matches_a_full_build(frame):
+    old, new = frame.iloc[:600], frame.iloc[600:]
+    parts = build_partitions(old, SUBSETS, DISRUPTIONS, version="v1")
+    merged, affected = append_rows(parts, new, "v2")
+    _assert_same_dataset(merged, build_partitions(frame, SUBSETS, DISRUPTIONS))
+    assert set(affected) == {c for c in parts.cells if merged.cell_size(*c) > parts.cell_size(*c)}
+    for cell in parts.cells:
+        assert merged.cell_version(*cell) == ("v2" if cell in affected else "v1")
+
+
+def test_append_keeps_existing_codes_and_adds_new_labels(frame):
+    parts = build_partitions(frame, SUBSETS, DISRUPTIONS)
+    new = frame.iloc[:3].copy()
+    new["SHOW_LABEL"] = pd.Categorical(["New Show", None, "South Park"])
+    merged, _ = append_rows(parts, compact_dtypes(new), "v2")
+    cats = list(merged.frame["SHOW_LABEL"].cat.categories)
+    assert cats[:len(parts.frame["SHOW_LABEL"].cat.categories)] == list(parts.frame["SHOW_LABEL"].cat.categories)
+    assert "New Show" in cats and "nan" not in cats
+
+
+def test_refresh_appended_matches_a_full_reload(tmp_path):
+    path = str(tmp_path / "umap.csv")
+    df = synth_frame(700, seed=1, with_sil=False)
+    _write(path, df.iloc[:500])
+    parts = read_path_dataset(path, REQUIRED, SUBSETS, DISRUPTIONS)
+    entry = entry_for_path(path)
+    track(entry)
+
+    key = entry.key
+    for chunk in (df.iloc[500:650], df.iloc[650:]):
+        _write(path, chunk, append=True)
+        entry = entry_for_path(path)
+        parts = refresh_appended(entry, key, parts)
+        assert parts is not None and parts.version == entry.key
+        key = entry.key
+
+    full = build_partitions(compact_dtypes(pd.read_csv(path)), SUBSETS, DISRUPTIONS)
+    _assert_same_dataset(parts, full)
+
+
+def test_partial_last_line_waits_for_its_newline(tmp_path):
+    path = str(tmp_path / "umap.csv")
+    df = synth_frame(300, seed=2, with_sil=False)
+    _write(path, df.iloc[:200])
+    parts = read_path_dataset(path, REQUIRED, SUBSETS, DISRUPTIONS)
+    entry = entry_for_path(path)
+    track(entry)
+
+    text = df.iloc[200:].to_csv(index=False, header=False)
+    cut = text.index("\n", len(text) // 2) + 5
+    with open(path, "a") as f:
+        f.write(text[:cut])
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+    entry2 = entry_for_path(path)
+    parts2 = refresh_appended(entry2, entry.key, parts)
+    assert len(parts2) == len(parts) + text[:cut].count("\n")
+
+    with open(path, "a") as f:
+        f.write(text[cut:])
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+    entry3 = entry_for_path(path)
+    parts3 = refresh_appended(entry3, entry2.key, parts2)
+    _assert_same_dataset(parts3, build_partitions(compact_dtypes(pd.read_csv(path)), SUBSETS, DISRUPTIONS))
+
+
+def test_rewritten_file_needs_a_full_load(tmp_path):
+    path = str(tmp_path / "umap.csv")
+    df = synth_frame(300, seed=3, with_sil=False)
+    _write(path, df.iloc[:200])
+    parts = read_path_dataset(path, REQUIRED, SUBSETS, DISRUPTIONS)
+    entry = entry_for_path(path)
+    track(entry)
+
+    shuffled = df.sample(frac=1.0, random_state=0)
+    _write(path, shuffled)
+    assert refresh_appended(entry_for_path(path), entry.key, parts) is None
+
+
+def test_unknown_columns_are_rejected(frame):
+    parts = build_partitions(frame.iloc[:100], SUBSETS, DISRUPTIONS)
+    with pytest.raises(ValueError, match="unknown columns"):
+        append_rows(parts, frame.iloc[100:110].assign(NOTES="x"), "v2")
+
+
+def test_empty_append_keeps_every_cell(frame):
+    parts = build_partitions(frame, SUBSETS, DISRUPTIONS, version="v1")
+    merged, affected = append_rows(parts, frame.iloc[:0], "v2")
+    assert affected == [] and merged.version == "v2"
+    assert all(merged.cell_version(*c) == "v1" for c in parts.cells)
+    np.testing.assert_array_equal(merged.frame["UMAP1"].to_numpy(), parts.frame["UMAP1"].to_numpy())
+
+
+# -----------------------------
+# SIL_SCORE after an append: one metric per dataset
+# -----------------------------
+def _split(frame):
+    old = frame.iloc[:600]
+    new = frame.iloc[600:][frame["SUBSET"].iloc[600:].isin(SUBSETS)]
+    return old, new
+
+
+def _cell_score(parts, cell):
+    start, stop = parts.cell_range(*cell)
+    values = parts.frame["SIL_SCORE"].to_numpy()[start:stop]
+    assert len(set(values.tolist())) <= 1 or np.isnan(values).all()  # one score per cell
+    return float(values[0]) if len(values) else np.nan
+
+
+def test_app_scores_are_updated_in_app(frame):
+    from src.silhouette import compute_cell_scores, fill_silhouette
+
+    old, new = _split(frame.drop(columns="SIL_SCORE"))
+    prev = fill_silhouette(build_partitions(old, SUBSETS, DISRUPTIONS, version="v1"), max_workers=1)
+    merged, affected = append_rows(prev, new.assign(SIL_SCORE=9.0), "v2+sil")
+    state = {}
+    rescored = rescore_appended(prev, merged, affected, state)
+    exact = compute_cell_scores(rescored, max_workers=1)
+    for cell in rescored.cells:
+        expected = exact[cell] if cell in affected else _cell_score(prev, cell)
+        assert _cell_score(rescored, cell) == pytest.approx(expected, abs=1e-5)
+    assert rescored.sil_source == "app" and not rescored.stale_cells and set(state) == set(affected)
+
+
+def test_file_scores_are_kept_and_marked_stale(frame):
+    old, new = _split(frame)
+    prev = build_partitions(old, SUBSETS, DISRUPTIONS, version="v1")
+    rescored_cell = new["SUBSET"].iloc[0], new["DISRUPTION"].iloc[0]
+    same_cell = (new["SUBSET"] == rescored_cell[0]) & (new["DISRUPTION"] == rescored_cell[1])
+    new = new.assign(SIL_SCORE=np.where(same_cell, 0.777, np.nan).astype(np.float32))
+    merged, affected = append_rows(prev, new, "v2")
+    rescored = rescore_appended(prev, merged, affected, {})
+
+    assert rescored.stale_cells == frozenset(set(affected) - {rescored_cell})
+    assert _cell_score(rescored, rescored_cell) == pytest.approx(0.777)
+    for cell in set(affected) - {rescored_cell}:
+        assert _cell_score(rescored, cell) == _cell_score(prev, cell)  # the file's score, not the app's
+
+
+def test_unscored_dataset_stays_unscored(frame):
+    from src.silhouette import needs_silhouette
+
+    old, new = _split(frame)
+    prev = build_partitions(old.assign(SIL_SCORE=np.nan), SUBSETS, DISRUPTIONS, version="v1")
+    merged, affected = append_rows(prev, new, "v2")
+    assert needs_silhouette(rescore_appended(prev, merged, affected, {}))
+
+
+def test_rescoring_does_not_hold_the_global_lock(tmp_path, monkeypatch):
+    import src.refresh as refresh
+    from src.silhouette import IncrementalSilhouette, fill_silhouette
+
+    path = str(tmp_path / "umap.csv")
+    df = synth_frame(500, seed=6, with_sil=False)
+    _write(path, df.iloc[:400])
+    parts = fill_silhouette(read_path_dataset(path, REQUIRED, SUBSETS, DISRUPTIONS), max_workers=1)
+    entry = entry_for_path(path)
+    track(entry)
+    _write(path, df.iloc[400:], append=True)
+
+    held = []
+
+    class Probe(IncrementalSilhouette):
+        def __init__(self, *args, **kwargs):
+            held.append(refresh._lock.locked())
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(refresh, "IncrementalSilhouette", Probe)
+    merged = refresh_appended(entry_for_path(path), entry.key, parts)
+    assert merged is not None and held and not any(held)
@@ -0,0 +1,94 @@
+# tests/test_silhouette.py
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from src.silhouette import (
+    CellEstimator, IncrementalSilhouette, compute_cell_scores, silhouette_samples, silhouette_score)
+
+
+def brute_force_samples(xy: np.ndarray, labels: np.ndarray) -> np.ndarray:
+    """The textbook definition, one point at a time."""
+    d = np.sqrt(((xy[:, None, :] - xy[None, :, :]) ** 2).sum(axis=-1))
+    out = np.zeros(len(xy))
+    for i in range(len(xy)):
+        own = labels == labels[i]
+        if own.sum() == 1:
+            continue  # singleton cluster: 0
+        a = d[i, own].sum() / (own.sum() - 1)
+        b = min(d[i, labels == other].mean() for other in np.unique(labels) if other != labels[i])
+        out[i] = (b - a) / max(a, b)
+    return out
+
+
+@pytest.fixture
+def points():
+    rng = np.random.default_rng(7)
+    labels = rng.integers(0, 4, 300)
+    xy = rng.normal(size=(4, 2))[labels] * 2 + rng.normal(size=(300, 2))
+    return xy, labels
+
+
+def test_samples_match_brute_force(points):
+    xy, labels = points
+    np.testing.assert_allclose(silhouette_samples(xy, labels), brute_force_samples(xy, labels), atol=1e-10)
+
+
+@pytest.mark.parametrize("block_rows", [1, 7, 64, 10_000])
+def test_blocking_does_not_change_the_result(points, block_rows):
+    xy, labels = points
+    np.testing.assert_allclose(silhouette_samples(xy, labels, block_rows=block_rows),
+                               silhouette_samples(xy, labels), atol=1e-12)
+
+
+def test_singletons_score_zero_and_one_cluster_is_nan():
+    xy = np.array([[0.0, 0.0], [0.1, 0.0], [5.0, 5.0]])
+    labels = np.array([0, 0, 1])
+    assert silhouette_samples(xy, labels)[2] == 0.0
+    np.testing.assert_allclose(silhouette_samples(xy, labels), brute_force_samples(xy, labels))
+    assert np.isnan(silhouette_score(xy, np.zeros(3)))
+
+
+def test_string_labels(points):
+    xy, labels = points
+    names = np.array(["a", "b", "c", "d"])[labels]
+    assert silhouette_score(xy, names) == pytest.approx(brute_force_samples(xy, labels).mean())
+
+
+def test_incremental_appends_match_a_full_pass(points):
+    xy, labels = points
+    inc = IncrementalSilhouette(xy[:120], labels[:120])
+    inc.append(xy[120:121], labels[120:121])
+    inc.append(xy[121:], labels[121:])
+    np.testing.assert_allclose(inc.samples(), brute_force_samples(xy, labels), atol=1e-10)
+    assert inc.score() == pytest.approx(silhouette_score(xy, labels))
+
+
+def test_incremental_new_label_on_append(points):
+    xy, labels = points
+    inc = IncrementalSilhouette(xy[labels < 3], labels[labels < 3])
+    inc.append(xy[labels == 3], labels[labels == 3])
+    order = np.r_[np.flatnonzero(labels < 3), np.flatnonzero(labels == 3)]
+    assert inc.score() == pytest.approx(silhouette_score(xy[order], labels[order]))
+
+
+def test_estimator_is_exact_once_every_point_is_sampled(points):
+    xy, labels = points
+    est = CellEstimator(xy, labels, seed=3)
+    rough = est.refine(8)
+    assert rough.n_sampled == 32 and not rough.exact and rough.lo <= rough.mean <= rough.hi
+    full = est.refine(len(xy))
+    assert full.exact and full.half_width == 0.0
+    assert full.mean == pytest.approx(silhouette_score(xy, labels))
+
+
+def test_cell_scores_match_each_cell(parts):
+    scores = compute_cell_scores(parts, max_workers=1)
+    assert set(scores) == {c for c in parts.cells if parts.cell_size(*c) > 0}
+    for cell, score in scores.items():
+        cell_df = parts.cell(*cell)
+        xy = cell_df[["UMAP1", "UMAP2"]].to_numpy(dtype=np.float64)
+        assert score == pytest.approx(silhouette_score(xy, cell_df["SHOW_LABEL"].astype(str).to_numpy()))
+    some = parts.cells[:2]
+    assert compute_cell_scores(parts, max_workers=1, cells=some) == {c: scores[c] for c in some}
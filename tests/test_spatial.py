@@ -0,0 +1,63 @@
+# tests/test_spatial.py
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from src.spatial import GridIndex
+
+
+@pytest.fixture
+def cloud():
+    rng = np.random.default_rng(11)
+    # clustered, with duplicates, so buckets are uneven
+    xy = np.vstack([rng.normal(size=(1500, 2)), rng.normal(loc=6, scale=0.2, size=(400, 2)),
+                    np.repeat([[1.0, 1.0]], 30, axis=0)])
+    return xy[:, 0], xy[:, 1]
+
+
+def test_box_matches_brute_force(cloud):
+    x, y = cloud
+    index = GridIndex(x, y)
+    for xr, yr in [((-1, 1), (-0.5, 2)), ((5.5, 6.5), (5.5, 6.5)), ((1, 1), (1, 1)), ((50, 60), (0, 1))]:
+        expected = np.flatnonzero((x >= xr[0]) & (x <= xr[1]) & (y >= yr[0]) & (y <= yr[1]))
+        np.testing.assert_array_equal(index.box(xr, yr), expected)
+
+
+def _inside(px: float, py: float, xs: list[float], ys: list[float]) -> bool:
+    # even-odd rule, one point at a time
+    inside = False
+    for i in range(len(xs)):
+        ax, ay, bx, by = xs[i], ys[i], xs[i - 1], ys[i - 1]
+        if (ay > py) != (by > py) and px < ax + (py - ay) * (bx - ax) / (by - ay):
+            inside = not inside
+    return inside
+
+
+@pytest.mark.parametrize("xs, ys", [
+    ([-2.0, 2.0, 0.5, -1.0], [-2.0, -1.0, 2.5, 1.0]),                      # convex
+    ([-3.0, 3.0, 3.0, 0.0, -3.0], [-3.0, -3.0, 3.0, -1.0, 3.0]),           # concave
+    ([5.0, 7.0, 5.0, 7.0], [5.0, 7.0, 7.0, 5.0]),                          # self-intersecting
+])
+def test_polygon_matches_brute_force(cloud, xs, ys):
+    x, y = cloud
+    expected = [i for i in range(len(x)) if _inside(x[i], y[i], xs, ys)]
+    np.testing.assert_array_equal(GridIndex(x, y).polygon(xs, ys), expected)
+
+
+@pytest.mark.parametrize("k", [1, 10, 200])
+def test_knn_matches_brute_force(cloud, k):
+    x, y = cloud
+    index = GridIndex(x, y)
+    for qx, qy in [(0.0, 0.0), (6.0, 6.0), (20.0, -20.0), (1.0, 1.0)]:
+        ids, dist = index.knn(qx, qy, k)
+        d = np.hypot(x - qx, y - qy)
+        np.testing.assert_allclose(dist, np.sort(d)[:k])
+        np.testing.assert_allclose(d[ids], dist)
+
+
+def test_knn_more_than_the_cell_has():
+    index = GridIndex(np.array([0.0, 1.0]), np.array([0.0, 1.0]))
+    ids, _ = index.knn(0.0, 0.0, 5)
+    assert list(ids) == [0, 1]
+    assert len(GridIndex(np.empty(0), np.empty(0)).knn(0.0, 0.0, 3)[0]) == 0
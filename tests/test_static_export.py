@@ -0,0 +1,57 @@
+# tests/test_static_export.py
+from __future__ import annotations
+
+import json
+
+import numpy as np
+import plotly.graph_objects as go
+
+from conftest import synth_frame
+from src.label_meta import DISRUPTION_ORDER, SUBSET_ORDER
+from src.static_export import encode_figure, export_static
+
+
+def _decode(blob: bytes) -> dict:
+    # the bundle's cell format: u32 header length, JSON header, aligned typed-array buffers
+    n = int.from_bytes(blob[:4], "little")
+    head = json.loads(blob[4:4 + n])
+
+    def resolve(node):
+        if isinstance(node, list):
+            return [resolve(v) for v in node]
+        if isinstance(node, dict):
+            if "$buf" in node:
+                offset, length, dtype = node["$buf"][:3]
+                start = 4 + n + (-(4 + n) % 8)
+                return np.frombuffer(blob[start + offset:start + offset + length], dtype=dtype)
+            return {k: resolve(v) for k, v in node.items()}
+        return node
+
+    return resolve(head["figure"])
+
+
+def test_encoded_figure_round_trips():
+    x, y = np.linspace(0, 1, 50, dtype=np.float32), np.arange(50, dtype=np.float64)
+    blob, template = encode_figure(go.Figure(go.Scattergl(x=x, y=y)))
+    assert template is not None
+    trace = _decode(blob)["data"][0]
+    np.testing.assert_array_equal(trace["x"], x)
+    np.testing.assert_array_equal(trace["y"], y)
+
+
+def test_export_writes_every_cell(tmp_path, in_app_dir):
+    df = synth_frame(2000, subsets=tuple(SUBSET_ORDER[:2]), disruptions=tuple(DISRUPTION_ORDER))
+    path = tmp_path / "umap.csv"
+    df.to_csv(path, index=False)
+    out = tmp_path / "bundle"
+
+    manifest = export_static(str(path), str(out))
+    assert len(manifest["cells"]) == 2 * len(DISRUPTION_ORDER)
+    for cell in manifest["cells"].values():
+        blob = (out / cell["file"]).read_bytes()
+        assert len(blob) == cell["bytes"]
+        n_points = sum(len(t.get("x", [])) for t in _decode(blob)["data"])
+        assert n_points == ((df["SUBSET"] == cell["subset"]) & (df["DISRUPTION"] == cell["disruption"])).sum()
+    index = (out / "index.html").read_text()
+    assert 'class="sil-grid"' in index and "{{" not in index
+    assert (out / "legend.html").exists() and (out / "plotly.min.js").exists()
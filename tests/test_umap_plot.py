@@ -0,0 +1,37 @@
+# tests/test_umap_plot.py
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from src.umap_plot import make_disruption_animation, make_overview_plot
+
+
+def test_animation_keeps_episodes_across_frames():
+    rng = np.random.default_rng(0)
+    fx, fy = rng.normal(size=(40, 3)), rng.normal(size=(40, 3))
+    labels = np.array(["A", "B"] * 20, dtype=object)
+    fig = make_disruption_animation(fx, fy, labels, ["C", "CS", "RAW"], tracked=3, tracked_name="A #3")
+    assert [f.name for f in fig.frames] == ["C", "CS", "RAW"]
+    assert fig.layout.meta["n_shown"] == 40
+    star = fig.frames[2].data[-1]
+    assert (star.x[0], star.y[0]) == (fx[3, 2], fy[3, 2])
+    assert fig.layout.xaxis.range[0] < fx.min() and fig.layout.xaxis.range[1] > fx.max()
+
+
+def test_animation_without_complete_episodes():
+    # no episode under every disruption (e.g. a filter emptied one): an empty figure, not a crash
+    fig = make_disruption_animation(np.empty((0, 5)), np.empty((0, 5)), np.empty(0, dtype=object), list("abcde"))
+    assert fig.layout.meta["n_total"] == 0 and len(fig.frames) == 5
+    assert list(fig.layout.xaxis.range) == [-1.0, 1.0]
+
+
+def test_overview_codes_do_not_wrap_past_255_shows():
+    labels = np.array([f"Show {i:03d}" for i in range(300)], dtype=object)
+    df = pd.DataFrame({"UMAP1": np.arange(300, dtype=np.float32), "UMAP2": np.zeros(300, dtype=np.float32),
+                       "SHOW_LABEL": labels})
+    fig = make_overview_plot({("S", "D"): df}, ["S"], ["D"], point_budget=1000)
+    trace = fig.data[0]
+    codes = np.asarray(trace.marker.color)
+    assert codes.max() == 299 and trace.marker.cmax == 299
+    np.testing.assert_array_equal(codes, np.asarray(trace.x).astype(int))  # show i sits at x == i